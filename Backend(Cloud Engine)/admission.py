@@ -0,0 +1,179 @@
+# admission.py
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+
+from logs import get_logger
+from metrics import REGISTRY, Counter, Histogram
+
+log = get_logger("admission")
+
+MAX_CONCURRENT_TURNS = int(os.environ.get("COSMOS_MAX_TURNS", 8))      # turns running at once, all users
+MAX_TURNS_PER_USER = int(os.environ.get("COSMOS_MAX_TURNS_PER_USER", 1))
+MAX_QUEUED_TURNS = int(os.environ.get("COSMOS_MAX_QUEUED_TURNS", 32))  # beyond this a turn is shed at once
+ADMISSION_SLA = float(os.environ.get("COSMOS_ADMISSION_SLA", 3.0))     # seconds a turn may wait for a slot
+DEGRADE_AT = 0.75  # share of the turn slots in use from which turns run without video emotion
+
+PRIORITY_SESSION = 0  # follow-up turn of an open session: the user is mid-conversation
+PRIORITY_NEW = 1      # first turn of a connection
+
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "cosmos_admission_wait_seconds", "Time /process turns waited for a turn slot.", ("priority",)
+))
+ADMISSIONS = REGISTRY.register(Counter(
+    "cosmos_admissions_total", "/process turns by admission result.", ("result",)
+))
+
+
+class TurnRejected(Exception):
+    """Raised when a turn is shed instead of admitted; `retry_after` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, user_id, priority, deadline, future):
+        self.user_id = user_id
+        self.priority = priority
+        self.deadline = deadline
+        self.future = future
+
+
+class TurnAdmission:
+    """
+    Bounds how many /process turns run at once, overall and per user.
+    Turns beyond the caps wait in a priority queue (session follow-ups
+    first, then first-come) until a slot frees or their deadline passes;
+    a turn that cannot start within the SLA, or finds the queue full, is
+    rejected with TurnRejected so the client hears "busy" right away
+    instead of every turn slowing down together. `pressured` tells a turn
+    to drop optional work while the server is near its cap.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_TURNS, per_user: int = MAX_TURNS_PER_USER,
+                 max_queued: int = MAX_QUEUED_TURNS, sla: float = ADMISSION_SLA, degrade_at: float = DEGRADE_AT):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.max_queued = max_queued
+        self.sla = sla
+        self.degrade_at = degrade_at
+        self.running = 0
+        self._per_user = {}
+        self._queue = []  # (priority, sequence, waiter)
+        self._sequence = itertools.count()
+        self._admitted = 0
+        self._shed = {}
+        self._degraded = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._queue if not waiter.future.done())
+
+    @property
+    def pressured(self) -> bool:
+        return self.running >= self.max_concurrent * self.degrade_at or self.queued > 0
+
+    def _has_room(self, user_id) -> bool:
+        return self.running < self.max_concurrent and self._per_user.get(user_id, 0) < self.per_user
+
+    def _take(self, user_id):
+        self.running += 1
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+    def _give_back(self, user_id):
+        self.running -= 1
+        left = self._per_user.get(user_id, 1) - 1
+        if left:
+            self._per_user[user_id] = left
+        else:
+            self._per_user.pop(user_id, None)
+        self._wake()
+
+    def _wake(self):
+        """Hand freed slots to the best waiters whose user is under the per-user cap."""
+        now = time.monotonic()
+        kept = []
+        while self._queue and self.running < self.max_concurrent:
+            entry = heapq.heappop(self._queue)
+            waiter = entry[2]
+            if waiter.future.done() or waiter.deadline <= now:
+                # Gave up, or about to: its own timeout sheds it
+                continue
+            if self._has_room(waiter.user_id):
+                self._take(waiter.user_id)
+                waiter.future.set_result(None)
+            else:
+                kept.append(entry)
+        for entry in kept:
+            heapq.heappush(self._queue, entry)
+
+    def _reject(self, reason: str):
+        self._shed[reason] = self._shed.get(reason, 0) + 1
+        ADMISSIONS.inc(result=reason)
+        log.debug("Turn shed", reason=reason, running=self.running, queued=self.queued)
+        # A rough guess at when a slot frees: one SLA per full round of turns ahead
+        return TurnRejected(reason, round(self.sla * (1 + self.queued / max(1, self.max_concurrent)), 1))
+
+    async def acquire(self, user_id: str, priority: int = PRIORITY_NEW, deadline: float = None):
+        """Wait for a turn slot; raises TurnRejected if the turn should be shed."""
+        queued_at = time.monotonic()
+        if not self.queued and self._has_room(user_id):
+            self._take(user_id)
+        else:
+            if self.queued >= self.max_queued:
+                raise self._reject("queue_full")
+            deadline = min(deadline or float("inf"), queued_at + self.sla)
+            waiter = _Waiter(user_id, priority, deadline, asyncio.get_running_loop().create_future())
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            # Waiters ahead may be held only by their own per-user cap
+            self._wake()
+            future = waiter.future
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=max(0.0, deadline - queued_at))
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                # Cancelled while queued (barge-in, disconnect): give back a slot granted meanwhile
+                if future.done() and not future.cancelled():
+                    self._give_back(user_id)
+                future.cancel()
+                raise
+            if not future.done() or future.cancelled():
+                future.cancel()
+                raise self._reject("sla")
+        self._admitted += 1
+        ADMISSIONS.inc(result="admitted")
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - queued_at, priority=str(priority))
+
+    def release(self, user_id: str):
+        self._give_back(user_id)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, priority: int = PRIORITY_NEW):
+        """Hold a turn slot for the body of the `async with`."""
+        await self.acquire(user_id, priority)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    def note_degraded(self):
+        self._degraded += 1
+        ADMISSIONS.inc(result="degraded")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "per_user": self.per_user,
+            "admitted": self._admitted,
+            "shed": dict(self._shed),
+            "degraded": self._degraded,
+        }
@@ -0,0 +1,239 @@
+# audio_pipeline.py
+import asyncio
+import os
+
+import numpy as np
+
+from logs import get_logger
+
+log = get_logger("audio_pipeline")
+
+# Google STT takes 16 kHz LINEAR16 and emotion2vec works at 16 kHz, so decode
+# straight to that instead of moving 3x the samples through both paths
+AUDIO_RATE = int(os.environ.get("COSMOS_AUDIO_RATE", 16000))
+FFMPEG_BIN = "ffmpeg"
+PCM_CHUNK_SIZE = 8192        # bytes read from ffmpeg stdout per chunk
+FEED_CHUNK_SIZE = 64 * 1024  # bytes written to ffmpeg stdin per write
+DECODER_POOL_SIZE = 2        # idle ffmpeg processes kept ready to accept input
+
+
+class DecodeError(Exception):
+    """Raised when ffmpeg fails to decode the input stream."""
+
+
+class PcmBuffer:
+    """
+    A turn's decoded mono s16le audio. Every consumer reads the same
+    underlying memory through read-only views instead of its own copy.
+    """
+
+    def __init__(self, data=b"", rate: int = AUDIO_RATE):
+        self._data = memoryview(data).toreadonly()
+        self.rate = rate
+
+    def __len__(self) -> int:
+        return self._data.nbytes
+
+    def __bool__(self) -> bool:
+        return self._data.nbytes > 0
+
+    @property
+    def duration(self) -> float:
+        return self._data.nbytes / (2 * self.rate)
+
+    def view(self) -> memoryview:
+        return self._data
+
+    def samples(self) -> np.ndarray:
+        """int16 samples backed by the shared buffer (no copy)."""
+        return np.frombuffer(self._data, dtype=np.int16)
+
+
+class StreamingDecoder:
+    """
+    Decodes a WebM byte stream to mono s16le PCM by piping it through an
+    ffmpeg process's stdin/stdout. Nothing touches the disk and the event
+    loop never blocks: input is fed as it arrives and decoded PCM is pushed
+    to every subscriber as soon as ffmpeg emits it.
+    """
+
+    def __init__(self, rate: int, chunk_size: int = PCM_CHUNK_SIZE):
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.pcm = bytearray()
+        self._process = None
+        self._pump_task = None
+        self._subscribers = []
+        self._stderr = b""
+
+    @property
+    def started(self) -> bool:
+        return self._process is not None
+
+    async def start(self):
+        """Spawn ffmpeg and begin pumping its output."""
+        command = [
+            FFMPEG_BIN,
+            "-hide_banner", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-ar", str(self.rate),
+            "-ac", "1",
+            "-f", "s16le",
+            "pipe:1",
+        ]
+        self._process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._pump_task = asyncio.create_task(self._pump())
+        return self
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Register a consumer. The returned queue receives every PCM chunk
+        decoded from now on, followed by None once the stream ends.
+        Chunks decoded before subscribing are replayed first.
+        """
+        queue = asyncio.Queue()
+        if self.pcm:
+            queue.put_nowait(bytes(self.pcm))
+        if self._pump_task is not None and self._pump_task.done():
+            queue.put_nowait(None)
+        else:
+            self._subscribers.append(queue)
+        return queue
+
+    async def feed(self, data: bytes):
+        """Write a slice of encoded input to ffmpeg. Raises DecodeError or OSError if ffmpeg has exited."""
+        if not data:
+            return
+        stdin = self._process.stdin
+        view = memoryview(data)
+        for offset in range(0, len(view), FEED_CHUNK_SIZE):
+            if stdin.is_closing():
+                # ffmpeg gave up on the input and exited; writing now would raise RuntimeError
+                raise DecodeError("ffmpeg stopped accepting input")
+            stdin.write(view[offset:offset + FEED_CHUNK_SIZE])
+            await stdin.drain()
+
+    async def finish(self) -> PcmBuffer:
+        """Signal end of input and wait for the remaining PCM."""
+        stdin = self._process.stdin
+        if not stdin.is_closing():
+            stdin.close()
+            try:
+                await stdin.wait_closed()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        await self._pump_task
+        self._stderr = await self._process.stderr.read()
+        returncode = await self._process.wait()
+        if returncode != 0:
+            raise DecodeError(self._stderr.decode(errors="replace").strip())
+        return PcmBuffer(self.pcm, self.rate)
+
+    async def abort(self):
+        """Kill ffmpeg and release subscribers (e.g. on disconnect)."""
+        if self._process and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        if self._pump_task:
+            await asyncio.gather(self._pump_task, return_exceptions=True)
+
+    async def _pump(self):
+        stdout = self._process.stdout
+        try:
+            while True:
+                chunk = await stdout.read(self.chunk_size)
+                if not chunk:
+                    break
+                self.pcm.extend(chunk)
+                for queue in self._subscribers:
+                    queue.put_nowait(chunk)
+        finally:
+            for queue in self._subscribers:
+                queue.put_nowait(None)
+            self._subscribers.clear()
+
+
+async def iter_queue(queue: asyncio.Queue):
+    """Yield PCM chunks from a subscriber queue until the stream ends."""
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            return
+        yield chunk
+
+
+class DecoderPool:
+    """
+    Keeps a few ffmpeg processes spawned and waiting on stdin so a turn can
+    start decoding immediately instead of paying process start-up first.
+    """
+
+    def __init__(self, rate: int, size: int = DECODER_POOL_SIZE):
+        self.rate = rate
+        self.size = size
+        self._idle = []
+        self._refill_task = None
+
+    async def acquire(self) -> StreamingDecoder:
+        """Hand out a started decoder and top the pool back up in the background."""
+        decoder = self._idle.pop() if self._idle else None
+        if decoder is None or decoder._process.returncode is not None:
+            decoder = await StreamingDecoder(self.rate).start()
+        self._schedule_refill()
+        return decoder
+
+    async def close(self):
+        if self._refill_task:
+            self._refill_task.cancel()
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(d.abort() for d in idle), return_exceptions=True)
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while len(self._idle) < self.size:
+            try:
+                self._idle.append(await StreamingDecoder(self.rate).start())
+            except OSError as e:
+                log.warning("Could not pre-spawn ffmpeg decoder", error=str(e))
+                return
+
+
+async def decode_webm(webm_data: bytes, rate: int, pool: DecoderPool = None) -> PcmBuffer:
+    """Decode a complete WebM recording to PCM entirely in memory."""
+    decoder = await pool.acquire() if pool else await StreamingDecoder(rate).start()
+    try:
+        await decoder.feed(webm_data)
+        return await decoder.finish()
+    except BaseException:
+        await decoder.abort()
+        raise
+
+
+class AudioFrontEnd:
+    """Decodes each turn's audio exactly once, at the sample rate all consumers share."""
+
+    def __init__(self, rate: int = AUDIO_RATE, pool_size: int = DECODER_POOL_SIZE):
+        self.rate = rate
+        self.decoders = DecoderPool(rate, pool_size)
+
+    async def open_stream(self) -> StreamingDecoder:
+        """A decoder to feed incrementally as audio chunks arrive."""
+        return await self.decoders.acquire()
+
+    async def finish(self, decoder: StreamingDecoder) -> PcmBuffer:
+        return await decoder.finish()
+
+    async def decode(self, webm_data: bytes) -> PcmBuffer:
+        """Decode a complete recording."""
+        return await decode_webm(webm_data, self.rate, pool=self.decoders)
+
+    async def close(self):
+        await self.decoders.close()
@@ -0,0 +1,113 @@
+# benchmarks/bench_admission.py
+"""
+/process turns under overload: every turn admitted at once (the previous
+behaviour) versus TurnAdmission (global and per-user caps, a short queue,
+"busy" past the SLA). The turn pipeline is simulated as processor sharing:
+the server does `--capacity` turns' worth of work at a time, so beyond
+that every running turn slows down together.
+
+Run from the backend directory:
+    python -m benchmarks.bench_admission --rate 6 --seconds 20 --capacity 4
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from admission import TurnAdmission, TurnRejected
+
+TICK = 0.01
+
+
+class SharedServer:
+    """Processor sharing: n running turns each progress at min(1, capacity / n)."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.active = {}
+        self.peak = 0
+
+    async def run(self, work):
+        done = asyncio.get_running_loop().create_future()
+        self.active[done] = work
+        self.peak = max(self.peak, len(self.active))
+        await done
+
+    async def loop(self):
+        while True:
+            await asyncio.sleep(TICK)
+            rate = min(1.0, self.capacity / max(1, len(self.active)))
+            for future, left in list(self.active.items()):
+                left -= TICK * rate
+                if left <= 0:
+                    del self.active[future]
+                    future.set_result(None)
+                else:
+                    self.active[future] = left
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def scenario(args, admission):
+    rng = random.Random(11)
+    server = SharedServer(args.capacity)
+    ticker = asyncio.create_task(server.loop())
+    latencies, shed = [], 0
+
+    async def turn(user_id):
+        nonlocal shed
+        start = time.perf_counter()
+        try:
+            if admission:
+                await admission.acquire(user_id)
+        except TurnRejected:
+            shed += 1
+            return
+        try:
+            await server.run(rng.uniform(0.5, 1.5) * args.work)
+        finally:
+            if admission:
+                admission.release(user_id)
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    end = time.perf_counter() + args.seconds
+    while time.perf_counter() < end:
+        # A few heavy users send turns back to back; the rest are one-offs
+        user = f"user-{rng.randint(0, 4)}" if rng.random() < 0.2 else f"user-{rng.randint(5, 10 ** 6)}"
+        tasks.append(asyncio.create_task(turn(user)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    ticker.cancel()
+    good = sum(1 for latency in latencies if latency <= args.target)
+    return len(tasks), latencies, shed, good, server.peak
+
+
+async def main(args):
+    print(f"{args.rate:.1f} turns/s for {args.seconds:.0f}s, {args.work:.1f}s of work per turn, "
+          f"capacity {args.capacity} turns (saturates at {args.capacity / args.work:.1f} turns/s)")
+    print(f"{'':<16} {'turns':>6} {'done':>6} {'busy':>6} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'within':>7} {'peak':>5}")
+    admission = TurnAdmission(max_concurrent=args.capacity, per_user=1, max_queued=args.capacity * 4,
+                              sla=args.sla)
+    for name, control in (("unbounded", None), ("admission", admission)):
+        turns, latencies, shed, good, peak = await scenario(args, control)
+        print(f"{name:<16} {turns:>6} {len(latencies):>6} {shed:>6} {percentile(latencies, 0.5):>6.2f}s "
+              f"{percentile(latencies, 0.95):>6.2f}s {percentile(latencies, 0.99):>6.2f}s {good:>7} {peak:>5}")
+    print(f"'within' = answered in under {args.target:.0f}s; admission {admission.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=6.0, help="turn arrivals per second")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--work", type=float, default=1.0, help="mean seconds of work per turn when uncontended")
+    parser.add_argument("--capacity", type=int, default=4, help="turns the server can work on at full speed")
+    parser.add_argument("--sla", type=float, default=3.0, help="seconds a turn may wait for admission")
+    parser.add_argument("--target", type=float, default=5.0, help="answer time that still counts as usable")
+    asyncio.run(main(parser.parse_args()))
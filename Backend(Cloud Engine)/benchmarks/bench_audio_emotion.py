@@ -0,0 +1,77 @@
+# benchmarks/bench_audio_emotion.py
+"""
+Micro-benchmark of the audio emotion step: the original temporary-WAV path,
+in-memory NumPy input, and one batched `generate` call for concurrent turns.
+
+Run from the backend directory:
+    python -m benchmarks.bench_audio_emotion --clips 16 --seconds 4
+    python -m benchmarks.bench_audio_emotion --model emotion2vec   # real model, if installed
+"""
+import argparse
+import os
+import time
+import uuid
+
+import numpy as np
+import soundfile as sf
+
+from benchmarks.fakes import FakeEmotionModel
+from model_workers import audio_emotion_batch_job, audio_emotion_job, pack_clips
+
+RATE = 16000
+
+
+def wav_round_trip(model, pcm: np.ndarray) -> dict:
+    """The pre-change implementation: write a WAV, let the model read it back."""
+    temp_file = f"/tmp/{uuid.uuid4()}.wav"
+    try:
+        sf.write(temp_file, pcm.astype(np.float32) / 32768.0, RATE)
+        rec = model.generate(input=temp_file)
+        return dict(zip(rec[0]["labels"], rec[0]["scores"]))
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def report(name, clips, elapsed, cpu):
+    print(
+        f"{name:<22} {len(clips) / elapsed:8.1f} clips/s  "
+        f"{elapsed / len(clips) * 1000:7.1f}ms/clip  cpu={cpu / len(clips) * 1000:7.1f}ms/clip"
+    )
+
+
+def measure(name, clips, run):
+    cpu, start = time.process_time(), time.perf_counter()
+    run()
+    report(name, clips, time.perf_counter() - start, time.process_time() - cpu)
+
+
+def main(args):
+    if args.model == "emotion2vec":
+        from model_workers import load_audio_model
+        model = load_audio_model()
+    else:
+        model = FakeEmotionModel()
+    rng = np.random.default_rng(0)
+    clips = [
+        (rng.standard_normal(int(args.seconds * RATE)) * 3000).astype(np.int16)
+        for _ in range(args.clips)
+    ]
+    print(f"{args.clips} clips of {args.seconds:.1f}s at {RATE} Hz, model={args.model}")
+
+    measure("temp WAV per clip", clips, lambda: [wav_round_trip(model, c) for c in clips])
+    measure("in-memory per clip", clips, lambda: [audio_emotion_job(model, c, RATE) for c in clips])
+
+    def batched():
+        packed, offsets = pack_clips(clips)
+        audio_emotion_batch_job(model, packed, offsets, RATE)
+
+    measure("in-memory batched", clips, batched)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clips", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=4.0)
+    parser.add_argument("--model", choices=["fake", "emotion2vec"], default="fake")
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+# benchmarks/bench_decode.py
+"""
+Compares the original temp-file + blocking subprocess.run decode path with
+the in-memory streaming decoder, under N concurrent turns.
+
+Run from the backend directory:
+    python -m benchmarks.bench_decode --turns 32 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import time
+import uuid
+
+from audio_pipeline import AUDIO_RATE, FFMPEG_BIN, DecoderPool, decode_webm
+from benchmarks.common import LoopStallMonitor, make_webm, summarize, timed
+
+RATE = AUDIO_RATE
+
+
+async def legacy_convert_webm_to_pcm(webm_data: bytes) -> bytes:
+    """The pre-streaming implementation, kept verbatim for comparison."""
+    input_filename = f"/tmp/{uuid.uuid4()}.webm"
+    output_filename = f"/tmp/{uuid.uuid4()}.raw"
+    with open(input_filename, "wb") as f:
+        f.write(webm_data)
+    try:
+        command = [FFMPEG_BIN, "-i", input_filename, "-ar", str(RATE), "-ac", "1", "-f", "s16le", output_filename]
+        subprocess.run(command, check=True, capture_output=True)
+        with open(output_filename, "rb") as f:
+            return f.read()
+    finally:
+        for name in (input_filename, output_filename):
+            if os.path.exists(name):
+                os.remove(name)
+
+
+async def run_case(name, convert, webm, turns):
+    async with LoopStallMonitor() as monitor:
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(timed(convert(webm), start) for _ in range(turns)))
+    print(summarize(name, latencies) + f"  max-loop-stall={monitor.max_stall_ms:7.1f}ms")
+
+
+async def main(turns: int, seconds: float):
+    webm = make_webm(seconds)
+    print(f"{turns} concurrent turns, {seconds:.1f}s clip ({len(webm)} bytes WebM)")
+
+    await run_case("legacy temp-file", legacy_convert_webm_to_pcm, webm, turns)
+    await run_case("streaming", lambda data: decode_webm(data, RATE), webm, turns)
+
+    pool = DecoderPool(RATE, size=turns)
+    # Taking one decoder starts the pool filling before measuring; that one is not needed
+    await (await pool.acquire()).abort()
+    await asyncio.sleep(0.5)
+    await run_case("streaming + decoder pool", lambda data: decode_webm(data, RATE, pool=pool), webm, turns)
+    await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.seconds))
@@ -0,0 +1,101 @@
+# benchmarks/bench_framing.py
+"""
+Bytes on the wire and peak memory per /process session: the JSON protocol
+(base64 video frames and reply audio, every frame kept for the whole turn)
+versus binary framing (raw JPEG / audio behind a 3-byte header, frames
+thinned by FrameSampler as they arrive). Each protocol runs in a fresh
+process, holding `--sessions` concurrent turns' received state at once.
+
+Run from the backend directory:
+    python -m benchmarks.bench_framing --sessions 20 --seconds 20 --fps 5
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import resource
+import tracemalloc
+
+from benchmarks.bench_video import synthetic_frames
+from framing import FRAME_AUDIO, FRAME_RESPONSE_AUDIO, FRAME_VIDEO, FrameSampler, decode_frame, encode_frame
+
+AUDIO_CHUNK = 4000   # bytes of WebM per 250ms chunk (~128 kbit/s opus)
+REPLY_AUDIO = 60000  # bytes of TTS audio in one reply
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def json_session(frames, chunks):
+    """What the previous handler received and kept: every frame's base64 string."""
+    wire = 0
+    video_frames = []
+    for frame in frames:
+        text = json.dumps({"type": "video", "data": base64.b64encode(frame).decode()})
+        wire += len(text)
+        video_frames.append(json.loads(text)["data"])
+    for chunk in chunks:
+        text = json.dumps({"type": "audio_chunk", "data": base64.b64encode(chunk).decode()})
+        wire += len(text)
+        json.loads(text)
+    reply = json.dumps({"type": "final_response", "text": "", "data": base64.b64encode(bytes(REPLY_AUDIO)).decode()})
+    return wire + len(reply), video_frames
+
+
+def binary_session(frames, chunks):
+    wire = 0
+    sampler = FrameSampler()
+    for sequence, frame in enumerate(frames):
+        data = encode_frame(FRAME_VIDEO, sequence, frame)
+        wire += len(data)
+        _, _, payload = decode_frame(data)
+        sampler.add(payload)
+    for chunk in chunks:
+        wire += len(encode_frame(FRAME_AUDIO, 0, chunk))
+    wire += len(json.dumps({"type": "final_response", "text": ""}))
+    wire += len(encode_frame(FRAME_RESPONSE_AUDIO, 0, bytes(REPLY_AUDIO)))
+    return wire, sampler
+
+
+def run(protocol, args, results):
+    frames = synthetic_frames(args.fps * args.seconds)
+    chunks = [bytes(AUDIO_CHUNK)] * (args.seconds * 4)
+    session = json_session if protocol == "json" else binary_session
+    baseline = rss_mb()
+    tracemalloc.start()
+    held = []
+    wire = 0
+    for _ in range(args.sessions):
+        # Each session receives its own copies, as frames off the network would be
+        sent, state = session([bytes(bytearray(frame)) for frame in frames], chunks)
+        wire += sent
+        held.append(state)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.put((wire / args.sessions, retained / args.sessions / 2 ** 20,
+                 (rss_mb() - baseline) / args.sessions, sum(len(f) for f in frames)))
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.sessions} concurrent sessions, one {args.seconds}s turn each at {args.fps} fps")
+    rows = {}
+    for protocol in ("json", "binary"):
+        results = context.Queue()
+        process = context.Process(target=run, args=(protocol, args, results))
+        process.start()
+        rows[protocol] = results.get()
+        process.join()
+    print(f"raw JPEG per turn {rows['json'][3] / 1024:.0f} KiB")
+    for protocol, (wire, held, rss, _) in rows.items():
+        print(f"{protocol:<7} wire per session {wire / 1024:7.0f} KiB   held per session {held:5.2f} MiB   "
+              f"peak RSS growth per session {rss:5.2f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--seconds", type=int, default=20, help="length of each turn")
+    parser.add_argument("--fps", type=int, default=5, help="video frames the client sends per second")
+    main(parser.parse_args())
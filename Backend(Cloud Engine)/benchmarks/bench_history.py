@@ -0,0 +1,55 @@
+# benchmarks/bench_history.py
+"""
+Counts Firestore reads and measures history latency per conversation turn
+with and without the in-process history cache, using FakeFirestore.
+
+Run from the backend directory:
+    python -m benchmarks.bench_history --users 20 --turns 10 --latency 0.03
+"""
+import argparse
+import time
+
+from benchmarks.common import import_offline, summarize
+from benchmarks.fakes import FakeFirestore
+
+conversation_manager = import_offline("conversation_manager")
+ConversationManager = conversation_manager.ConversationManager
+HistoryCache = conversation_manager.HistoryCache
+
+
+def run(name, cache, users, turns, latency):
+    db = FakeFirestore(latency=latency)
+    conversation_manager.db = db
+    conversation_manager.history_cache = cache
+
+    history_ms = []
+    for turn in range(turns):
+        for user in range(users):
+            # A turn builds a fresh manager, reads recent history, then saves both sides
+            manager = ConversationManager(f"user-{user}")
+            start = time.perf_counter()
+            manager.get_last_messages(limit=8)
+            history_ms.append((time.perf_counter() - start) * 1000)
+            manager.add_message("user", f"message {turn}")
+            manager.add_message("ai", f"reply {turn}")
+
+    total_turns = users * turns
+    print(summarize(f"{name} history fetch", history_ms))
+    print(
+        f"{'':<36} queries/turn={db.queries / total_turns:5.2f}  "
+        f"docs read/turn={db.reads / total_turns:5.2f}  writes/turn={db.writes / total_turns:5.2f}"
+    )
+
+
+def main(args):
+    print(f"{args.users} users x {args.turns} turns, {args.latency * 1000:.0f}ms per Firestore RPC")
+    run("no cache", HistoryCache(ttl=0), args.users, args.turns, args.latency)
+    run("write-through cache", HistoryCache(), args.users, args.turns, args.latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.03)
+    main(parser.parse_args())
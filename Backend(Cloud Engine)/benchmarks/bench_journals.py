@@ -0,0 +1,142 @@
+# benchmarks/bench_journals.py
+"""
+Compares the cost of serving /public_journals as one unbounded response
+against a single cursor page (full content, and title + preview only)
+queried from Firestore or served from the in-memory PublicFeed mirror,
+using FakeFirestore. Also walks every page of both to check that the
+cursors neither skip nor repeat a journal.
+
+Run from the backend directory:
+    python -m benchmarks.bench_journals --users 200 --journals 20 --limit 50
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import summarize
+from benchmarks.fakes import FakeFirestore
+from journal_pages import clamp_limit, page_query, parse_fields, stream_page
+from public_feed import PublicFeed, backfill
+
+CONTENT_WORDS = ("calm", "today", "walk", "breathe", "grateful", "tired", "friends", "sleep", "sun", "rain")
+
+
+def seed(db, users, per_user, content_words):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rng = random.Random(7)
+    for user in range(users):
+        journals = db.collection("users").document(f"user-{user}").collection("journals")
+        for n in range(per_user):
+            journals.document(f"j{user}-{n}").set({
+                "title": f"Entry {n}",
+                "content": " ".join(rng.choice(CONTENT_WORDS) for _ in range(content_words)),
+                "visibility": "public" if rng.random() < 0.7 else "private",
+                # Whole-minute timestamps so plenty of journals tie on timestamp
+                "timestamp": start + timedelta(minutes=rng.randrange(users * per_user // 4)),
+            })
+
+
+def unbounded(db):
+    """The previous endpoint: every public journal, fully materialized, in one body."""
+    query = db.collection_group("journals").where("visibility", "==", "public").order_by("timestamp", direction="DESCENDING")
+    journals = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        data["id"] = doc.id
+        data["user_id"] = doc.reference.parent.parent.id
+        data["timestamp"] = data["timestamp"].isoformat()
+        journals.append(data)
+    yield json.dumps({"success": True, "journals": journals})
+
+
+def paged(db, limit, fields, start_after=None):
+    selected = parse_fields(fields)
+    query = db.collection_group("journals").where("visibility", "==", "public")
+    snapshots = page_query(db, query, clamp_limit(limit), start_after, selected).stream()
+    return stream_page(snapshots, next(snapshots, None), clamp_limit(limit), selected)
+
+
+def from_feed(feed, limit, fields, start_after=None):
+    page = feed.page(clamp_limit(limit), start_after, parse_fields(fields))
+    yield json.dumps(page.body)
+
+
+def measure(name, make_body, repeats):
+    first_ms, total_ms, peak_kb, size = [], [], [], 0
+    for _ in range(repeats):
+        tracemalloc.start()
+        start = time.perf_counter()
+        body = make_body()
+        size = len(next(body))
+        first_ms.append((time.perf_counter() - start) * 1000)
+        size += sum(len(chunk) for chunk in body)
+        total_ms.append((time.perf_counter() - start) * 1000)
+        peak_kb.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    print(summarize(f"{name} first chunk", first_ms))
+    print(summarize(f"{name} full body", total_ms))
+    print(f"{'':<36} body={size / 1024:8.1f}KB  peak traced memory={max(peak_kb):8.1f}KB")
+
+
+def walk_pages(fetch, limit):
+    seen, cursor, pages = [], None, 0
+    while True:
+        body = json.loads("".join(fetch(limit, "id,user_id", cursor)))
+        pages += 1
+        seen.extend((j["user_id"], j["id"]) for j in body["journals"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return seen, pages
+
+
+def main(args):
+    db = FakeFirestore()
+    seed(db, args.users, args.journals, args.words)
+    public = sum(1 for doc in db.docs.values() if doc.get("visibility") == "public")
+    print(f"{public} public journals across {args.users} users, page size {args.limit}")
+
+    measure("unbounded", lambda: unbounded(db), args.repeats)
+    measure("page, full content", lambda: paged(db, args.limit, None), args.repeats)
+    measure("page, title + preview", lambda: paged(db, args.limit, "id,user_id,title,preview,timestamp"), args.repeats)
+
+    backfill(db)
+    feed = PublicFeed(size=public + 1)  # large enough to mirror the whole feed
+    feed.start(db)
+    measure("feed mirror, full content", lambda: from_feed(feed, args.limit, None), args.repeats)
+    measure("feed mirror, title + preview",
+            lambda: from_feed(feed, args.limit, "id,user_id,title,preview,timestamp"), args.repeats)
+    start = time.perf_counter()
+    etag = feed.page(args.limit, fields=parse_fields(None)).etag
+    print(f"{'feed mirror, ETag check':<36} {(time.perf_counter() - start) * 1000:8.3f}ms (a 304 sends no body)")
+
+    walks = {
+        "query": lambda limit, fields, cursor: paged(db, limit, fields, cursor),
+        "feed mirror": lambda limit, fields, cursor: from_feed(feed, limit, fields, cursor),
+    }
+    orders = {}
+    for name, fetch in walks.items():
+        seen, pages = walk_pages(fetch, args.limit)
+        orders[name] = seen
+        status = "ok" if len(seen) == len(set(seen)) == public else "MISMATCH"
+        print(f"{name} cursor walk: {len(seen)} journals in {pages} pages, {len(set(seen))} unique -> {status}")
+    print(f"query and feed mirror agree on order: {orders['query'] == orders['feed mirror']}")
+
+    db.collection("public_feed").document("late_entry").set({
+        "journal_id": "late", "user_id": "user-0", "path": "users/user-0/journals/late", "title": "New",
+        "content": "fresh", "visibility": "public", "timestamp": datetime.now(timezone.utc),
+    })
+    changed = feed.page(args.limit, fields=parse_fields(None))
+    print(f"after a new post: ETag changed={changed.etag != etag}, newest={changed.body['journals'][0]['id']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--journals", type=int, default=20, help="journals per user")
+    parser.add_argument("--words", type=int, default=150, help="words of content per journal")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+# benchmarks/bench_moderation.py
+"""
+Moderation cost of a burst of public journal posts: the old path (one
+Perspective call per post, 0.0 on failure) versus the Moderator pipeline
+(lexicon pre-filter, score cache, shared rate-limited calls), against
+FakePerspective with a quota.
+
+Run from the backend directory:
+    python -m benchmarks.bench_moderation --posts 200 --quota 5 --latency 0.1
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import summarize, timed
+from benchmarks.fakes import FakePerspective, StubHttpServer
+from moderation import TOXICITY_THRESHOLD, Moderator, normalize, prefilter
+from upstream import UpstreamClients
+
+CLEAN = (
+    "Went for a long walk by the river and felt calm for the first time this week.",
+    "Grateful for my friends today. We cooked dinner together and laughed a lot.",
+    "Slept well, drank water, and finished the book I started last month.",
+    "Tried the breathing exercise before my exam and it really helped.",
+    "Feeling good today!",
+    "Had a great walk with my dog this morning.",
+)
+AMBIGUOUS = (
+    "I hate how tired I feel every morning, but I am trying.",
+    "Some days I feel worthless, writing this down helps a little.",
+    "My brother called me stupid again and it hurt more than I expected.",
+)
+TOXIC = (
+    "You are all idiots and I hate you.",
+    "Shut up you fucking bitch, nobody cares.",
+)
+# Short hostile or self-harm texts with one or no strong term: the lexicon must
+# never pass these as clean, only leave them to Perspective
+NOT_CLEAN = (
+    "You are an idiot!",
+    "Just die!",
+    "Go to hell!",
+    "what a prick!",
+    "I want to end my life",
+)
+
+
+def make_posts(count, rng):
+    posts = []
+    for n in range(count):
+        roll = rng.random()
+        if roll < 0.65:
+            posts.append(f"{rng.choice(CLEAN)} Day {n}.")   # unique clean entries
+        elif roll < 0.75:
+            posts.append(rng.choice(CLEAN))                  # reposted text
+        elif roll < 0.93:
+            posts.append(rng.choice(AMBIGUOUS))
+        else:
+            posts.append(rng.choice(TOXIC))
+    return posts
+
+
+async def legacy_check(upstream, url, text):
+    """The previous check_toxicity: one Perspective call per post, fail open."""
+    payload = {"comment": {"text": text}, "languages": ["en"], "requestedAttributes": {"TOXICITY": {}}}
+    try:
+        resj = await upstream.post_json(url, payload, params={"key": "stub"})
+        return resj["attributeScores"]["TOXICITY"]["summaryScore"]["value"]
+    except Exception:
+        return 0.0
+
+
+async def run(name, posts, check, fake, server, spread):
+    fake.scored = fake.throttled = 0
+    requests_before = server.requests
+
+    async def post(delay, text):
+        await asyncio.sleep(delay)
+        return await timed(check(text))
+
+    # Posts arrive spread over `spread` seconds; latency is counted from each arrival
+    latencies = await asyncio.gather(*(post(spread * i / len(posts), text) for i, text in enumerate(posts)))
+    print(summarize(f"{name} publish wait", latencies))
+    print(
+        f"{'':<36} perspective requests={server.requests - requests_before}  "
+        f"throttled={fake.throttled}  scored={fake.scored}"
+    )
+
+
+def check_prefilter():
+    for text in NOT_CLEAN:
+        verdict = prefilter(normalize(text))
+        print(f"prefilter {text!r:<28} {'passed as clean' if verdict == 0.0 else 'not clean':>16}")
+        assert verdict != 0.0, text
+
+
+async def main(args):
+    check_prefilter()
+    rng = random.Random(3)
+    posts = make_posts(args.posts, rng)
+    fake = FakePerspective(latency=args.latency, qps=args.quota)
+    server = await StubHttpServer(fake).start()
+    url = f"{server.url}/v1alpha1/comments:analyze"
+    print(f"{args.posts} posts over {args.spread:.0f}s, quota {args.quota} QPS, {args.latency * 1000:.0f}ms per call")
+
+    clients = UpstreamClients(http2=False)
+    legacy_upstream = clients.register("perspective-legacy", max_concurrency=8, timeout=10)
+    await run("legacy per-post call", posts, lambda t: legacy_check(legacy_upstream, url, t), fake, server, args.spread)
+
+    # Let the stub's quota refill before the second run
+    await asyncio.sleep(2)
+    upstream = clients.register("perspective", max_concurrency=8, timeout=10)
+    moderator = Moderator(upstream, "stub", url, qps=args.quota, burst=1)
+    results = {}
+
+    async def check(text):
+        result = await moderator.score(text)
+        results[text] = result
+        return result
+
+    await run("moderation pipeline", posts, check, fake, server, args.spread)
+    kept_private = sum(1 for r in results.values() if r.toxic(TOXICITY_THRESHOLD))
+    print(f"{'':<36} {moderator.stats()}  distinct texts kept private={kept_private}")
+
+    await clients.aclose()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=10.0, help="seconds over which the posts arrive")
+    parser.add_argument("--quota", type=float, default=5.0, help="Perspective requests per second")
+    parser.add_argument("--latency", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
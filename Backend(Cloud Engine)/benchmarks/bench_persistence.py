@@ -0,0 +1,97 @@
+# benchmarks/bench_persistence.py
+"""
+Measures how long a turn waits on Firestore for the user bootstrap and
+saving both messages: inline get-then-set plus two add_message calls versus
+the cached create-if-absent and batched write-behind queue, using
+FakeFirestore (optionally with injected failures).
+
+Run from the backend directory:
+    python -m benchmarks.bench_persistence --users 20 --turns 5 --latency 0.03 --failure-rate 0.1
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import import_offline, summarize
+from benchmarks.fakes import FakeFirestore
+from persistence import UserBootstrap, WriteBehindQueue
+
+conversation_manager = import_offline("conversation_manager")
+ConversationManager = conversation_manager.ConversationManager
+HistoryCache = conversation_manager.HistoryCache
+
+
+def inline_ensure_user(db, user_id):
+    """The previous bootstrap: read the user document, then write it if missing."""
+    user_ref = db.collection("users").document(user_id)
+    if not user_ref.get().exists:
+        user_ref.set({"user_id": user_id})
+
+
+async def inline_turn(db, user_id, turn):
+    await asyncio.to_thread(inline_ensure_user, db, user_id)
+    manager = ConversationManager(user_id)
+    await asyncio.to_thread(manager.add_message, "user", f"message {turn}")
+    await asyncio.to_thread(manager.add_message, "ai", f"reply {turn}")
+
+
+async def write_behind_turn(db, user_id, turn, writer, users):
+    await users.ensure(user_id, writer)
+    manager = ConversationManager(user_id)
+    staged = manager.stage_turn(f"message {turn}", f"reply {turn}")
+    await writer.submit(f"turn for {user_id}", staged.commit)
+
+
+async def run(name, args, write_behind):
+    db = FakeFirestore(latency=args.latency, failure_rate=args.failure_rate)
+    conversation_manager.db = db
+    conversation_manager.history_cache = HistoryCache()
+    writer = WriteBehindQueue()
+    users = UserBootstrap(db, "users")
+    writer.start()
+
+    waits_ms = []
+    errors = 0
+
+    async def one(user, turn):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            if write_behind:
+                await write_behind_turn(db, f"user-{user}", turn, writer, users)
+            else:
+                await inline_turn(db, f"user-{user}", turn)
+        except Exception:
+            errors += 1
+        waits_ms.append((time.perf_counter() - start) * 1000)
+
+    wall = time.perf_counter()
+    for turn in range(args.turns):
+        await asyncio.gather(*(one(user, turn) for user in range(args.users)))
+    await writer.drain(timeout=60)
+    wall = time.perf_counter() - wall
+
+    messages = sum(1 for path in db.docs if "conversations" in path)
+    print(summarize(f"{name} turn wait", waits_ms))
+    print(
+        f"{'':<36} rpcs/turn={db.rpcs / len(waits_ms):5.2f}  messages saved={messages}/{2 * len(waits_ms)}  "
+        f"turn errors={errors}  wall={wall:.2f}s  {writer.stats()}"
+    )
+
+
+async def main(args):
+    print(
+        f"{args.users} concurrent users x {args.turns} turns, {args.latency * 1000:.0f}ms per RPC, "
+        f"{args.failure_rate:.0%} of RPCs fail"
+    )
+    await run("inline", args, write_behind=False)
+    await run("write-behind", args, write_behind=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
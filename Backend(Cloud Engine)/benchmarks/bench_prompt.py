@@ -0,0 +1,93 @@
+# benchmarks/bench_prompt.py
+"""
+Gemini request size per turn over a long conversation: the previous
+prompt (one f-string with the instructions and the last 8 raw messages)
+versus PromptEngine (systemInstruction, token-budgeted recent window,
+rolling summary), using FakeFirestore and a stub Gemini for summaries.
+
+Run from the backend directory:
+    python -m benchmarks.bench_prompt --turns 60
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from benchmarks.common import import_offline
+from benchmarks.fakes import FakeFirestore, StubHttpServer, StubResponse, gemini_reply
+from prompt_engine import POLARIS_INSTRUCTION, PromptEngine, build_payload, current_input_text, estimate_tokens
+from upstream import UpstreamClients
+
+conversation_manager = import_offline("conversation_manager")
+
+SENTENCES = (
+    "Work has been overwhelming this week and I keep bringing it home.",
+    "I talked to my sister about it and she listened, which helped.",
+    "I have not been sleeping well, I wake up at three and my mind races.",
+    "Today was better, I went for a walk at lunch and felt lighter.",
+    "My manager asked me to lead the new project and I am nervous about it.",
+    "I think I need to set clearer boundaries with my evenings.",
+)
+
+
+def legacy_payload(input_json, messages):
+    """The previous build_gemini_payload: everything in one user part, rebuilt per turn."""
+    history = "\n".join(f"{m['sender'].upper()}: {m['text']}" for m in messages)
+    prompt = f"{POLARIS_INSTRUCTION}\n\nRECENT CONVERSATION CONTEXT:\n{history}\n\n{current_input_text(input_json)}"
+    return {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": {"temperature": 0.8}}
+
+
+def request_tokens(payload, skip_system=False):
+    """Estimated tokens of the request; a static systemInstruction can be excluded to show per-turn text."""
+    body = dict(payload)
+    if skip_system:
+        body.pop("systemInstruction", None)
+    return estimate_tokens(json.dumps(body))
+
+
+async def main(args):
+    rng = random.Random(7)
+    server = await StubHttpServer(
+        lambda method, path, body: StubResponse(json_body=gemini_reply(
+            "The user has been stressed by work, sleeps poorly, and is learning to set boundaries. " * 3
+        ), delay=0.3)
+    ).start()
+    conversation_manager.db = FakeFirestore()
+    conversation_manager.history_cache = conversation_manager.HistoryCache()
+    clients = UpstreamClients(http2=False)
+    engine = PromptEngine(clients.register("gemini", max_concurrency=4), f"{server.url}/gemini")
+    manager = conversation_manager.ConversationManager("user-1")
+
+    rows = []
+    for turn in range(args.turns):
+        # Now and then the user talks for a minute or two
+        length = 20 if turn % 6 == 5 else rng.randint(1, 3)
+        text = " ".join(rng.choice(SENTENCES) for _ in range(length))
+        input_json = {"text_input": text, "audio_emotion": "sad", "video_emotion": "neutral"}
+
+        legacy = legacy_payload(input_json, manager.get_last_messages(limit=8))
+        history = engine.history(manager)
+        current = build_payload(input_json, history)
+        represented = len(history.recent) + (await asyncio.to_thread(engine.store.get, manager))["messages"]
+        rows.append((turn, request_tokens(legacy), request_tokens(current), request_tokens(current, True), represented))
+
+        manager.stage_turn(text, " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 4)))).commit()
+        await engine.refresh(manager)
+
+    print(f"{args.turns} turns; tokens estimated at 4 chars each")
+    print(f"{'turn':>5} {'legacy':>8} {'engine':>8} {'per-turn':>9} {'msgs covered':>13}")
+    for turn, old, new, per_turn, represented in rows[::max(1, args.turns // 12)]:
+        print(f"{turn:>5} {old:>8} {new:>8} {per_turn:>9} {represented:>13}")
+    for label, column in (("legacy", 1), ("engine", 2), ("engine per-turn", 3)):
+        values = [row[column] for row in rows]
+        print(f"{label:<16} mean={sum(values) / len(values):7.0f}  max={max(values):6}")
+    print(f"{'':<16} {engine.stats()}  summary calls={server.requests}")
+
+    await clients.aclose()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+# benchmarks/bench_publish.py
+"""
+Load test for POST /journal under a burst of public posts: the synchronous
+path (moderate, then save, then respond) versus mode=async (save as
+pending, respond 202, finish on the PublishQueue workers). Uses
+FakeFirestore and FakePerspective with its default one-request-per-second
+quota, and mirrors the handler steps in server.py.
+
+Run from the backend directory:
+    python -m benchmarks.bench_publish --posts 100 --latency 0.03 --quota 1
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+from benchmarks.bench_moderation import make_posts
+from benchmarks.common import summarize, timed
+from benchmarks.fakes import FakeFirestore, FakePerspective, StubHttpServer
+from moderation import TOXICITY_THRESHOLD, Moderator
+from persistence import UserBootstrap, WriteBehindQueue
+from publish_queue import PENDING_VISIBILITY, PublishJob, PublishQueue
+from upstream import UpstreamClients
+
+
+class JournalService:
+    """The /journal handler steps from server.py, wired to the fakes."""
+
+    def __init__(self, db, moderator):
+        self.db = db
+        self.moderator = moderator
+        self.writer = WriteBehindQueue()
+        self.users = UserBootstrap(db, "users")
+        self.queue = PublishQueue(self.process)
+        self.finished_at = {}
+
+    def save(self, user_id, title, content, visibility, timestamp):
+        ref = self.db.collection("users").document(user_id).collection("journals").document()
+        ref.set({"title": title, "content": content, "visibility": visibility, "timestamp": timestamp})
+        return ref.id
+
+    async def moderate(self, content):
+        result = await self.moderator.score(content)
+        return "private" if result.score is None or result.score > TOXICITY_THRESHOLD else "public"
+
+    async def process(self, job):
+        visibility = await self.moderate(job.content)
+        ref = self.db.collection("users").document(job.user_id).collection("journals").document(job.journal_id)
+        await asyncio.to_thread(ref.update, {"visibility": visibility})
+        self.finished_at[job.journal_id] = time.perf_counter()
+        return visibility
+
+    async def post_sync(self, user_id, content):
+        await self.users.ensure(user_id, self.writer)
+        visibility = await self.moderate(content)
+        await asyncio.to_thread(self.save, user_id, "Entry", content, visibility, datetime.now(timezone.utc))
+        return visibility
+
+    async def post_async(self, user_id, content):
+        await self.users.ensure(user_id, self.writer)
+        timestamp = datetime.now(timezone.utc)
+        journal_id = await asyncio.to_thread(self.save, user_id, "Entry", content, PENDING_VISIBILITY, timestamp)
+        job = PublishJob(user_id, journal_id, "Entry", content, "public", timestamp)
+        if not self.queue.submit(job):
+            await self.process(job)
+        return journal_id
+
+
+async def burst(name, service, posts, post):
+    start = time.perf_counter()
+    accepted = {}
+
+    async def one(n, content):
+        result = await post(f"user-{n % 25}", content)
+        accepted[result] = time.perf_counter()
+        return result
+
+    latencies = await asyncio.gather(*(timed(one(n, c), start) for n, c in enumerate(posts)))
+    print(summarize(f"{name} /journal response", latencies))
+    return start
+
+
+async def run(name, args, posts, asynchronous):
+    fake = FakePerspective(latency=args.perspective_latency, qps=args.quota)
+    server = await StubHttpServer(fake).start()
+    clients = UpstreamClients(http2=False)
+    upstream = clients.register("perspective", max_concurrency=8, timeout=10)
+    moderator = Moderator(upstream, "stub", f"{server.url}/v1alpha1/comments:analyze", qps=args.quota, burst=1)
+    service = JournalService(FakeFirestore(latency=args.latency), moderator)
+    service.writer.start()
+    service.queue.start()
+
+    start = await burst(name, service, posts, service.post_async if asynchronous else service.post_sync)
+    if asynchronous:
+        while service.queue.stats()["pending"]:
+            await asyncio.sleep(0.05)
+        settled = [(t - start) * 1000 for t in service.finished_at.values()]
+        print(summarize(f"{name} visibility final", settled))
+        print(f"{'':<36} {service.queue.stats()}")
+
+    await service.queue.stop()
+    await service.writer.drain()
+    await clients.aclose()
+    await server.stop()
+
+
+async def main(args):
+    posts = make_posts(args.posts, random.Random(5))
+    print(
+        f"burst of {args.posts} public posts, {args.latency * 1000:.0f}ms per Firestore RPC, "
+        f"Perspective quota {args.quota} QPS"
+    )
+    await run("sync", args, posts, asynchronous=False)
+    await run("async", args, posts, asynchronous=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.03, help="seconds per Firestore RPC")
+    parser.add_argument("--quota", type=float, default=1.0, help="Perspective requests per second")
+    parser.add_argument("--perspective-latency", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+# benchmarks/bench_router.py
+"""
+Turn latency for Gemini replies: the previous sequential walk (Flash with
+three retries, then Pro) versus ModelRouter (p95 hedging, cancelled losers,
+circuit breakers), against a stub Gemini whose Flash endpoint stalls now
+and then and goes down for a stretch in the middle of the run.
+
+Run from the backend directory:
+    python -m benchmarks.bench_router --requests 300 --duration 30 --stall 8
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import summarize, timed
+from benchmarks.fakes import StubHttpServer, StubResponse, gemini_reply
+from model_router import ModelRouter, NoModelAvailable
+from upstream import UpstreamClients
+
+
+class FakeGemini:
+    """Flash: fast with occasional stalls, returning 503 during the outage window. Pro: slower but steady."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(11)
+        self.outage = (0.0, 0.0)
+        self.calls = {"/flash": 0, "/pro": 0}
+
+    def __call__(self, method, path, body):
+        self.calls[path] += 1
+        if path == "/pro":
+            return StubResponse(json_body=gemini_reply("pro"), delay=self.rng.uniform(0.9, 1.4))
+        if self.outage[0] <= time.monotonic() < self.outage[1]:
+            return StubResponse(status=503, json_body={"error": "unavailable"}, delay=0.05)
+        if self.rng.random() < self.args.stall_rate:
+            return StubResponse(json_body=gemini_reply("flash"), delay=self.args.stall)
+        return StubResponse(json_body=gemini_reply("flash"), delay=self.rng.uniform(0.3, 0.6))
+
+
+async def legacy_query(upstream, url):
+    """The previous query_gemini_text: each model in turn, with the upstream's own retries."""
+    for path in ("/flash", "/pro"):
+        try:
+            resj = await upstream.post_json(f"{url}{path}", {"contents": []})
+            return resj["candidates"][0]["content"]["parts"][0]["text"]
+        except Exception:
+            pass
+    return None
+
+
+async def run(name, args, fake, query):
+    fake.calls = {"/flash": 0, "/pro": 0}
+    start = time.monotonic()
+    # Flash is down for the middle fifth of the run
+    fake.outage = (start + args.duration * 0.4, start + args.duration * 0.6)
+    fallbacks = 0
+
+    async def turn():
+        nonlocal fallbacks
+        try:
+            if await query() is None:
+                fallbacks += 1
+        except NoModelAvailable:
+            fallbacks += 1
+
+    async def arrive(delay):
+        # Latency is counted from each turn's arrival
+        await asyncio.sleep(delay)
+        return await timed(turn())
+
+    latencies = await asyncio.gather(*(arrive(args.duration * i / args.requests) for i in range(args.requests)))
+    print(summarize(f"{name} reply", latencies))
+    print(f"{'':<36} flash calls={fake.calls['/flash']}  pro calls={fake.calls['/pro']}  fallback replies={fallbacks}")
+
+
+async def main(args):
+    fake = FakeGemini(args)
+    server = await StubHttpServer(fake).start()
+    clients = UpstreamClients(http2=False)
+    print(
+        f"{args.requests} turns over {args.duration:.0f}s; Flash stalls {args.stall:.0f}s "
+        f"on {args.stall_rate:.0%} of calls and returns 503 for the middle fifth of the run"
+    )
+
+    legacy = clients.register("gemini", max_concurrency=32, timeout=120, base_delay=1)
+    await run("sequential flash -> pro", args, fake, lambda: legacy_query(legacy, server.url))
+
+    routed = clients.register("gemini-routed", max_concurrency=32, timeout=45, max_retries=1)
+    router = ModelRouter(routed, [("flash", f"{server.url}/flash"), ("pro", f"{server.url}/pro")])
+    await run("hedged router", args, fake, lambda: router.generate({"contents": []}))
+    print(f"{'':<36} {router.stats()}")
+
+    # Stalled calls whose hedge won are still sleeping on the stub
+    await asyncio.sleep(args.stall)
+    await clients.aclose()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds over which turns arrive")
+    parser.add_argument("--stall", type=float, default=8.0, help="seconds a stalled Flash call takes")
+    parser.add_argument("--stall-rate", type=float, default=0.05)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+# benchmarks/bench_sessions.py
+"""
+A conversation of several turns over /process: one connection per turn
+(the original protocol: handshake and init before every utterance) versus
+one multi-turn Session, and how long a barge-in takes to stop the reply in
+flight. The network is a fake WebSocket with a fixed round-trip time; the
+turn itself (STT, Gemini, TTS) is a sleep.
+
+Run from the backend directory:
+    python -m benchmarks.bench_sessions --turns 10 --rtt 0.08 --turn 1.5
+"""
+import argparse
+import asyncio
+import time
+
+from sessions import Session
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        pass
+
+
+async def connect(args):
+    # TCP, TLS and the WebSocket upgrade, then init and the user check in Firestore
+    await asyncio.sleep(args.rtt * 3)
+    await asyncio.sleep(args.rtt + args.firestore)
+
+
+async def answer(session, args, stopped):
+    try:
+        await asyncio.sleep(args.turn)
+        await session.send_json({"type": "final_response"})
+    finally:
+        stopped.append(time.perf_counter())
+
+
+async def one_connection_per_turn(args):
+    start = time.perf_counter()
+    for _ in range(args.turns):
+        await connect(args)
+        session = Session(FakeWebSocket())
+        await session.start_turn(answer(session, args, []))
+        await session.close()
+    per_turn = (time.perf_counter() - start) / args.turns - args.turn
+
+    # The user starts talking again mid-reply: the turn runs to completion
+    # (the server only notices the dropped socket when it next sends)
+    stopped = []
+    session = Session(FakeWebSocket())
+    session.start_turn(answer(session, args, stopped))
+    await asyncio.sleep(args.turn / 3)
+    barge = time.perf_counter()
+    await session.wait_turn()
+    return per_turn, stopped[0] - barge
+
+
+async def multi_turn_session(args):
+    start = time.perf_counter()
+    await connect(args)
+    session = Session(FakeWebSocket())
+    session.multi_turn = True
+    session.start_heartbeats()
+    for _ in range(args.turns):
+        await session.start_turn(answer(session, args, []))
+    per_turn = (time.perf_counter() - start) / args.turns - args.turn
+
+    stopped = []
+    session.start_turn(answer(session, args, stopped))
+    await asyncio.sleep(args.turn / 3)
+    barge = time.perf_counter()
+    await session.cancel_turn()
+    await session.close()
+    return per_turn, stopped[0] - barge
+
+
+async def main(args):
+    print(f"{args.turns} turns, rtt {args.rtt * 1000:.0f}ms, {args.turn:.1f}s per turn")
+    for name, run in (("connection per turn", one_connection_per_turn), ("multi-turn session", multi_turn_session)):
+        overhead, barge = await run(args)
+        print(f"{name:<20} overhead per turn {overhead * 1000:7.1f}ms   barge-in stops reply after {barge * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--rtt", type=float, default=0.08, help="client round-trip time in seconds")
+    parser.add_argument("--firestore", type=float, default=0.03, help="seconds per Firestore RPC")
+    parser.add_argument("--turn", type=float, default=1.5, help="seconds the server spends on one turn")
+    asyncio.run(main(parser.parse_args()))
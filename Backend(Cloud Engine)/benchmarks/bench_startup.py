@@ -0,0 +1,80 @@
+# benchmarks/bench_startup.py
+"""
+Cold start of the server: the previous sequence (clients built one after
+another at import, then startup blocked until both emotion model pools
+had loaded) versus the lifespan hook (everything loaded concurrently, turns
+accepted once Firestore and Speech are up). Client costs are simulated;
+the model pools are real worker processes whose loader sleeps.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup --model-load 8 --client 0.5 --latency 0.05
+"""
+import argparse
+import asyncio
+import functools
+import time
+
+from benchmarks.fakes import FakeFirestore
+from model_workers import ModelWorkerPool
+from startup import Readiness
+
+
+def slow_loader(seconds):
+    # Stands in for importing TensorFlow / funasr and loading weights
+    time.sleep(seconds)
+    return object()
+
+
+def make_pools(args):
+    loader = functools.partial(slow_loader, args.model_load)
+    return ModelWorkerPool("audio-emotion", loader, 1), ModelWorkerPool("video-emotion", loader, 2)
+
+
+async def sequential(args):
+    start = time.perf_counter()
+    audio_pool, video_pool = make_pools(args)
+    time.sleep(args.client)   # Speech client
+    time.sleep(args.client)   # server's Firestore client
+    time.sleep(args.client)   # conversation_manager's own Firestore client
+    await asyncio.gather(audio_pool.start(), video_pool.start())
+    serving = time.perf_counter() - start
+    audio_pool.shutdown()
+    video_pool.shutdown()
+    return serving, serving
+
+
+async def lifespan(args):
+    start = time.perf_counter()
+    audio_pool, video_pool = make_pools(args)
+    db = FakeFirestore(latency=args.latency)
+    readiness = Readiness(required=("firestore", "speech"))
+    readiness.expect("speech", "firestore", "audio_emotion", "video_emotion")
+    models = asyncio.gather(
+        readiness.load("audio_emotion", audio_pool.start),
+        readiness.load("video_emotion", video_pool.start),
+    )
+    await asyncio.gather(
+        readiness.load("speech", time.sleep, args.client),
+        readiness.load("firestore", lambda: db.collection("users").limit(1).get()),
+    )
+    serving = time.perf_counter() - start
+    await models
+    complete = time.perf_counter() - start
+    audio_pool.shutdown()
+    video_pool.shutdown()
+    return serving, complete
+
+
+async def main(args):
+    print(f"model load {args.model_load:.1f}s per worker, {args.client:.1f}s per client, 3 model workers")
+    for name, run in (("sequential startup", sequential), ("lifespan startup", lifespan)):
+        serving, complete = await run(args)
+        print(f"{name:<22} accepting turns after {serving:6.2f}s   all models ready after {complete:6.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-load", type=float, default=8.0, help="seconds each worker spends loading its model")
+    parser.add_argument("--client", type=float, default=0.5, help="seconds to build each Google client")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per Firestore RPC")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+# benchmarks/bench_stt.py
+"""
+Measures transcript latency after the user stops speaking for batch
+recognition versus StreamingRecognizer, using FakeSpeechClient so it runs
+offline.
+
+Run from the backend directory:
+    python -m benchmarks.bench_stt --seconds 4 --turns 8
+"""
+import argparse
+import asyncio
+import time
+
+from google.cloud import speech
+
+from audio_pipeline import AUDIO_RATE
+from benchmarks.common import summarize
+from benchmarks.fakes import FakeSpeechClient
+from stt_engine import StreamingRecognizer
+
+RATE = AUDIO_RATE
+CHUNK_MS = 100
+
+
+async def speak(seconds: float):
+    """Yield silent PCM in real time, like a decoder fed by a live microphone."""
+    chunk = b"\x00\x00" * (RATE * CHUNK_MS // 1000)
+    for _ in range(int(seconds * 1000 / CHUNK_MS)):
+        await asyncio.sleep(CHUNK_MS / 1000)
+        yield chunk
+
+
+async def batch_turn(client, seconds):
+    pcm = bytearray()
+    async for chunk in speak(seconds):
+        pcm.extend(chunk)
+    utterance_end = time.perf_counter()
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=RATE,
+        language_code="en-US",
+    )
+    await asyncio.to_thread(client.recognize, config=config, audio=speech.RecognitionAudio(content=bytes(pcm)))
+    return (time.perf_counter() - utterance_end) * 1000, None
+
+
+async def streaming_turn(client, seconds):
+    marks = {}
+    start = time.perf_counter()
+
+    async def on_transcript(text, is_final):
+        marks.setdefault("first_interim", time.perf_counter())
+
+    async def timed_speech():
+        async for chunk in speak(seconds):
+            yield chunk
+        marks["utterance_end"] = time.perf_counter()
+
+    recognizer = StreamingRecognizer(client, RATE, on_transcript=on_transcript)
+    await recognizer.run(timed_speech())
+    done = time.perf_counter()
+    return (done - marks["utterance_end"]) * 1000, (marks["first_interim"] - start) * 1000
+
+
+async def main(seconds: float, turns: int):
+    client = FakeSpeechClient()
+    print(f"{turns} concurrent turns of {seconds:.1f}s speech (fake STT latencies)")
+    for name, turn in (("batch recognize", batch_turn), ("streaming recognize", streaming_turn)):
+        results = await asyncio.gather(*(turn(client, seconds) for _ in range(turns)))
+        print(summarize(f"{name} after speech end", [r[0] for r in results]))
+        first_interim = [r[1] for r in results if r[1] is not None]
+        if first_interim:
+            print(summarize(f"{name} first interim", first_interim))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=4.0)
+    parser.add_argument("--turns", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.turns))
@@ -0,0 +1,93 @@
+# benchmarks/bench_suggestions.py
+"""
+Journal page load latency and Gemini calls for /suggestion/{user_id}:
+generating on every load versus SuggestionCache with a prefetch after
+each conversation turn, using FakeFirestore and a stub Gemini server.
+
+Run from the backend directory:
+    python -m benchmarks.bench_suggestions --users 20 --loads 3 --gemini-latency 0.8
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import import_offline, summarize, timed
+from benchmarks.fakes import FakeFirestore, StubHttpServer, StubResponse, gemini_reply
+from suggestion_cache import SuggestionCache
+from upstream import UpstreamClients
+
+conversation_manager = import_offline("conversation_manager")
+
+
+async def generate(gemini, url, user_id):
+    """build_suggestion from server.py: recent history, then one Gemini call."""
+    messages = await asyncio.to_thread(conversation_manager.ConversationManager(user_id).get_last_messages, 10)
+    context = " | ".join(m["text"] for m in messages if m.get("sender") == "user")
+    result = await gemini.post_json(url, {"contents": [{"parts": [{"text": context}]}]})
+    return result["candidates"][0]["content"]["parts"][0]["text"], True
+
+
+async def session(user_id, loads, load_page, after_turn):
+    # A conversation turn, a pause, then a few journal page loads
+    manager = conversation_manager.ConversationManager(user_id)
+    staged = manager.stage_turn("I went running this morning", "That sounds refreshing.")
+    await asyncio.to_thread(staged.commit)
+    after_turn(user_id)
+    await asyncio.sleep(1.0)
+    return [await timed(load_page(user_id)) for _ in range(loads)]
+
+
+async def run(name, args, server, cached):
+    conversation_manager.db = FakeFirestore(latency=args.latency)
+    conversation_manager.history_cache = conversation_manager.HistoryCache()
+    versions = conversation_manager.conversation_versions = conversation_manager.ConversationVersions()
+    clients = UpstreamClients(http2=False)
+    gemini = clients.register("gemini", max_concurrency=64)
+    url = f"{server.url}/gemini"
+    requests_before = server.requests
+    background = set()
+
+    if cached:
+        cache = SuggestionCache(prefetch_delay=0.2)
+        versions.subscribe(cache.invalidate)
+
+        def load_page(user_id):
+            return cache.get_or_generate(user_id, versions.current(user_id), lambda: generate(gemini, url, user_id))
+
+        def after_turn(user_id):
+            task = asyncio.ensure_future(
+                cache.prefetch(user_id, versions.current, lambda: generate(gemini, url, user_id))
+            )
+            background.add(task)
+    else:
+        def load_page(user_id):
+            return generate(gemini, url, user_id)
+
+        def after_turn(user_id):
+            pass
+
+    results = await asyncio.gather(*(session(f"user-{u}", args.loads, load_page, after_turn) for u in range(args.users)))
+    await asyncio.gather(*background)
+    latencies = [ms for user in results for ms in user]
+    print(summarize(f"{name} page load", latencies))
+    extra = f"  {cache.stats()}" if cached else ""
+    print(f"{'':<36} gemini calls={server.requests - requests_before}{extra}")
+    await clients.aclose()
+
+
+async def main(args):
+    server = await StubHttpServer(
+        lambda method, path, body: StubResponse(json_body=gemini_reply("Reflect on your run."), delay=args.gemini_latency)
+    ).start()
+    print(f"{args.users} users x {args.loads} page loads after one turn, Gemini {args.gemini_latency * 1000:.0f}ms")
+    await run("uncached", args, server, cached=False)
+    await run("cached + prefetch", args, server, cached=True)
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--loads", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.03, help="seconds per Firestore RPC")
+    parser.add_argument("--gemini-latency", type=float, default=0.8)
+    asyncio.run(main(parser.parse_args()))
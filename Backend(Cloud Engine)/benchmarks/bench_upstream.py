@@ -0,0 +1,66 @@
+# benchmarks/bench_upstream.py
+"""
+Throughput of the outbound HTTP layer under many concurrent turns: the old
+unpooled requests.post-in-a-thread pattern versus the shared async
+UpstreamClients pool, against a local stub server.
+
+Run from the backend directory:
+    python -m benchmarks.bench_upstream --turns 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+import requests
+
+from benchmarks.common import summarize, timed
+from benchmarks.fakes import StubHttpServer, StubResponse, gemini_reply
+from upstream import UpstreamClients
+
+
+def legacy_call(url: str, payload: dict) -> dict:
+    resp = requests.post(url, json=payload, timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def legacy_turn(base_url):
+    # One Gemini call and one TTS call per turn, each on the default thread pool
+    await asyncio.to_thread(legacy_call, f"{base_url}/gemini", {"contents": []})
+    await asyncio.to_thread(legacy_call, f"{base_url}/tts", {"input": {"text": "hi"}})
+
+
+async def pooled_turn(gemini, tts, base_url):
+    await gemini.post_json(f"{base_url}/gemini", {"contents": []})
+    await tts.post_json(f"{base_url}/tts", {"input": {"text": "hi"}})
+
+
+async def run(name, turn, turns):
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(timed(turn(), start) for _ in range(turns)))
+    elapsed = time.perf_counter() - start
+    print(summarize(name, latencies) + f"  throughput={turns / elapsed:7.1f} turns/s")
+
+
+async def main(turns: int, latency: float):
+    server = await StubHttpServer(
+        lambda method, path, body: StubResponse(json_body=gemini_reply("Hello."), delay=latency)
+    ).start()
+    print(f"{turns} concurrent turns, stub latency {latency * 1000:.0f}ms per call")
+
+    await run("legacy requests + to_thread", lambda: legacy_turn(server.url), turns)
+
+    clients = UpstreamClients()
+    gemini = clients.register("gemini", max_concurrency=256)
+    tts = clients.register("tts", max_concurrency=256)
+    await run("pooled async upstream", lambda: pooled_turn(gemini, tts, server.url), turns)
+    await clients.aclose()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.latency))
@@ -0,0 +1,89 @@
+# benchmarks/bench_video.py
+"""
+Compares the original one-task-per-frame FER path with VideoEmotionEngine on
+synthetic webcam frames, reporting frames per second, CPU time per turn and
+event-loop stall.
+
+Run from the backend directory:
+    python -m benchmarks.bench_video --frames 60 --turns 4
+    python -m benchmarks.bench_video --detector fer   # real FER + MTCNN, if installed
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from benchmarks.common import LoopStallMonitor
+from benchmarks.fakes import FakeFaceDetector
+from video_emotion import VideoEmotionEngine
+
+
+def synthetic_frames(count: int, still_ratio: float = 0.6, seed: int = 0) -> list:
+    """JPEG frames of a 'face' that mostly sits still and occasionally moves."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    x = 320
+    for _ in range(count):
+        if rng.random() > still_ratio:
+            x = int(np.clip(x + rng.integers(-40, 40), 200, 440))
+        img = np.full((480, 640, 3), 90, np.uint8)
+        cv2.ellipse(img, (x, 240), (90, 120), 0, 0, 360, (180, 200, 230), -1)
+        noise = rng.integers(0, 3, img.shape, dtype=np.uint8)
+        ok, jpeg = cv2.imencode(".jpg", img + noise, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        frames.append(jpeg.tobytes())
+    return frames
+
+
+async def legacy_turn(detector, frames):
+    async def one(frame_bytes):
+        frame = cv2.imdecode(np.frombuffer(frame_bytes, np.uint8), cv2.IMREAD_COLOR)
+        emotions = detector.detect_emotions(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        return emotions[0].get("emotions", {}) if emotions else {}
+
+    return await asyncio.gather(*(asyncio.create_task(one(f)) for f in frames))
+
+
+async def engine_turn(engine, executor, frames):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, engine.analyze, frames)
+
+
+async def measure(name, turn, frames, turns):
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    async with LoopStallMonitor() as monitor:
+        results = await asyncio.gather(*(turn(frames) for _ in range(turns)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    analysed = sum(len(r) for r in results) / turns
+    print(
+        f"{name:<16} {turns * len(frames) / wall:8.1f} frames/s  "
+        f"cpu/turn={cpu / turns * 1000:8.1f}ms  analysed/turn={analysed:5.1f}  "
+        f"max-loop-stall={monitor.max_stall_ms:7.1f}ms"
+    )
+
+
+async def main(args):
+    if args.detector == "fer":
+        from fer import FER
+        detector = FER(mtcnn=True)
+    else:
+        detector = FakeFaceDetector()
+    frames = synthetic_frames(args.frames)
+    print(f"{args.turns} concurrent turns x {args.frames} frames, detector={args.detector}")
+
+    await measure("legacy per-frame", lambda f: legacy_turn(detector, f), frames, args.turns)
+    engine = VideoEmotionEngine(detector)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        await measure("engine", lambda f: engine_turn(engine, executor, f), frames, args.turns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--detector", choices=["fake", "fer"], default="fake")
+    asyncio.run(main(parser.parse_args()))
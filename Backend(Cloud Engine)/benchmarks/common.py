@@ -0,0 +1,88 @@
+# benchmarks/common.py
+import asyncio
+import statistics
+import subprocess
+import time
+
+from audio_pipeline import FFMPEG_BIN
+
+
+def make_webm(seconds: float = 3.0, frequency: int = 440) -> bytes:
+    """Synthesize a WebM/Opus recording like the one MediaRecorder uploads."""
+    command = [
+        FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={seconds}",
+        "-c:a", "libopus", "-f", "webm", "pipe:1",
+    ]
+    return subprocess.run(command, check=True, capture_output=True).stdout
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, samples_ms) -> str:
+    return (
+        f"{name:<36} n={len(samples_ms):<5} "
+        f"mean={statistics.fmean(samples_ms) if samples_ms else 0:8.1f}ms "
+        f"p50={percentile(samples_ms, 50):8.1f}ms "
+        f"p95={percentile(samples_ms, 95):8.1f}ms "
+        f"p99={percentile(samples_ms, 99):8.1f}ms"
+    )
+
+
+class LoopStallMonitor:
+    """Measures how late a periodic tick fires, i.e. how long the event loop was blocked."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stalls_ms = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.stalls_ms.append(max(0.0, (loop.time() - expected) * 1000))
+
+    async def __aenter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc):
+        # Let a pending tick land so a stall at the very end is still counted.
+        await asyncio.sleep(self.interval * 2)
+        self._task.cancel()
+
+    @property
+    def max_stall_ms(self) -> float:
+        return max(self.stalls_ms, default=0.0)
+
+
+async def timed(coro, start: float = None) -> float:
+    """
+    Await a coroutine and return elapsed milliseconds. Pass a shared start
+    time to measure from when a burst was submitted rather than from when
+    this coroutine first got to run.
+    """
+    start = time.perf_counter() if start is None else start
+    await coro
+    return (time.perf_counter() - start) * 1000
+
+
+def import_offline(name: str):
+    """
+    Import a backend module for a benchmark. Importing creates no clients:
+    server.py builds them at startup (connect_clients) and hands Firestore
+    to the modules that need it, so the benchmarks set the module's `db`
+    to the fakes they measure instead.
+    """
+    import importlib
+
+    return importlib.import_module(name)
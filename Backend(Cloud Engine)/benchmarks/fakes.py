@@ -0,0 +1,584 @@
+# benchmarks/fakes.py
+"""Offline stand-ins for the Google services the backend talks to."""
+import random
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+
+def _speech_response(transcript: str, is_final: bool):
+    alternative = SimpleNamespace(transcript=transcript, confidence=0.9)
+    result = SimpleNamespace(alternatives=[alternative], is_final=is_final)
+    return SimpleNamespace(results=[result])
+
+
+class FakeSpeechClient:
+    """
+    Mimics google.cloud.speech.SpeechClient with a simple latency model:
+    batch recognition costs `base_latency` plus `per_audio_second` for every
+    second of audio, streaming recognition emits an interim result every
+    `interim_every` requests and the final result `finalize_latency` after
+    the request stream ends.
+    """
+
+    def __init__(self, base_latency=0.25, per_audio_second=0.1, finalize_latency=0.15, interim_every=5):
+        self.base_latency = base_latency
+        self.per_audio_second = per_audio_second
+        self.finalize_latency = finalize_latency
+        self.interim_every = interim_every
+        self.calls = {"recognize": 0, "streaming_recognize": 0}
+
+    @staticmethod
+    def _seconds(config, num_bytes):
+        return num_bytes / (2 * config.sample_rate_hertz)
+
+    def recognize(self, config, audio):
+        self.calls["recognize"] += 1
+        time.sleep(self.base_latency + self.per_audio_second * self._seconds(config, len(audio.content)))
+        return _speech_response("hello polaris this is a test", True)
+
+    def streaming_recognize(self, config, requests):
+        self.calls["streaming_recognize"] += 1
+        received = 0
+        for count, request in enumerate(requests, start=1):
+            received += len(request.audio_content)
+            if count % self.interim_every == 0:
+                words = int(self._seconds(config.config, received) * 2.5)
+                yield _speech_response(" ".join(["word"] * max(words, 1)), False)
+        time.sleep(self.finalize_latency)
+        yield _speech_response("hello polaris this is a test", True)
+
+
+def burn_cpu(seconds: float):
+    """Busy-wait to model CPU-bound inference (sleeping would not show up as CPU time)."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class FakeFaceDetector:
+    """
+    Mimics the parts of fer.FER the backend uses. Face detection costs
+    `detect_cost` seconds of CPU per frame; classification costs
+    `classify_base_cost` per call plus `classify_face_cost` per face, so
+    batching shows up the same way it does with the real Keras model.
+    """
+
+    LABELS = {0: "angry", 1: "disgust", 2: "fear", 3: "happy", 4: "sad", 5: "surprise", 6: "neutral"}
+
+    def __init__(self, detect_cost=0.04, classify_base_cost=0.015, classify_face_cost=0.002):
+        self.detect_cost = detect_cost
+        self.classify_base_cost = classify_base_cost
+        self.classify_face_cost = classify_face_cost
+        self.calls = {"find_faces": 0, "classify": 0}
+
+    def _get_labels(self):
+        return self.LABELS
+
+    def find_faces(self, img, bgr=True):
+        self.calls["find_faces"] += 1
+        burn_cpu(self.detect_cost)
+        h, w = img.shape[:2]
+        return [(w // 4, h // 4, w // 2, h // 2)]
+
+    def _classify_emotions(self, gray_faces):
+        self.calls["classify"] += 1
+        burn_cpu(self.classify_base_cost + self.classify_face_cost * len(gray_faces))
+        scores = [0.05, 0.0, 0.05, 0.6, 0.1, 0.05, 0.15]
+        return [scores for _ in range(len(gray_faces))]
+
+    def detect_emotions(self, img):
+        boxes = self.find_faces(img)
+        scores = self._classify_emotions([None])[0]
+        return [{"box": boxes[0], "emotions": {self.LABELS[i]: s for i, s in enumerate(scores)}}]
+
+
+class FakeEmotionModel:
+    """
+    Mimics funasr's AutoModel for emotion2vec. Each `generate` call costs
+    `call_cost` seconds of CPU plus `per_second_cost` per second of audio;
+    file inputs are read back with soundfile like funasr does.
+    """
+
+    LABELS = ["angry", "disgusted", "fearful", "happy", "neutral", "other", "sad", "surprised", "unknown"]
+
+    def __init__(self, call_cost=0.03, per_second_cost=0.01):
+        self.call_cost = call_cost
+        self.per_second_cost = per_second_cost
+        self.calls = 0
+
+    def generate(self, input, fs=16000, **kwargs):
+        import soundfile as sf
+
+        self.calls += 1
+        clips = input if isinstance(input, list) else [input]
+        seconds = 0.0
+        for clip in clips:
+            if isinstance(clip, str):
+                clip, fs = sf.read(clip, dtype="float32")
+            seconds += len(clip) / fs
+        burn_cpu(self.call_cost + self.per_second_cost * seconds)
+        scores = [0.02, 0.01, 0.02, 0.1, 0.7, 0.02, 0.1, 0.02, 0.01]
+        return [{"labels": self.LABELS, "scores": scores} for _ in clips]
+
+
+class StubResponse:
+    """What StubHttpServer sends back: a JSON body, or a list of server-sent events."""
+
+    def __init__(self, status=200, json_body=None, events=None, delay=0.0, event_delay=0.0):
+        self.status = status
+        self.json_body = json_body if json_body is not None else {}
+        self.events = events
+        self.delay = delay
+        self.event_delay = event_delay
+
+
+class StubHttpServer:
+    """
+    A tiny keep-alive HTTP/1.1 server on localhost standing in for Google
+    REST APIs. `handler(method, path, body)` returns a StubResponse; its
+    delay is awaited before responding, so many requests overlap the way
+    they would against the real service.
+    """
+
+    def __init__(self, handler, host="127.0.0.1", port=0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        import asyncio
+
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        import asyncio
+        import json
+
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {k.strip().lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests += 1
+
+                stub = self.handler(method, path, body)
+                if asyncio.iscoroutine(stub):
+                    stub = await stub
+                if stub.delay:
+                    await asyncio.sleep(stub.delay)
+
+                if stub.events is None:
+                    payload = json.dumps(stub.json_body).encode()
+                    writer.write(
+                        f"HTTP/1.1 {stub.status} OK\r\nContent-Type: application/json\r\n"
+                        f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                    )
+                else:
+                    writer.write(
+                        f"HTTP/1.1 {stub.status} OK\r\nContent-Type: text/event-stream\r\n"
+                        "Transfer-Encoding: chunked\r\n\r\n".encode()
+                    )
+                    for event in stub.events:
+                        data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+                        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                        await writer.drain()
+                        if stub.event_delay:
+                            await asyncio.sleep(stub.event_delay)
+                    writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            # CancelledError: the stub was stopped with a request still in flight
+            pass
+        finally:
+            writer.close()
+
+
+def gemini_reply(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+def perspective_reply(score: float) -> dict:
+    return {"attributeScores": {"TOXICITY": {"summaryScore": {"value": score, "type": "PROBABILITY"}}}}
+
+
+class FakePerspective:
+    """
+    A StubHttpServer handler for comments:analyze. Texts containing one of
+    HOSTILE_WORDS score 0.9, everything else 0.1. With `qps` set, requests
+    beyond that rate get 429 like an exhausted Perspective quota (which is
+    counted per minute, so one request of burst headroom is allowed).
+    """
+
+    HOSTILE_WORDS = ("idiot", "stupid", "hate you", "loser", "kill", "moron", "fuck", "bitch")
+
+    def __init__(self, latency=0.1, qps=None):
+        self.latency = latency
+        self.qps = qps
+        self.scored = 0
+        self.throttled = 0
+        self._tokens = qps or 0
+        self._updated = time.monotonic()
+
+    def _within_quota(self) -> bool:
+        if not self.qps:
+            return True
+        now = time.monotonic()
+        self._tokens = min(max(self.qps, 1) + 1, self._tokens + (now - self._updated) * self.qps)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def __call__(self, method, path, body):
+        import json
+
+        if not self._within_quota():
+            self.throttled += 1
+            return StubResponse(status=429, json_body={"error": {"code": 429}})
+        text = json.loads(body)["comment"]["text"].lower()
+        self.scored += 1
+        score = 0.9 if any(word in text for word in self.HOSTILE_WORDS) else 0.1
+        return StubResponse(json_body=perspective_reply(score), delay=self.latency)
+
+
+class FakeGoogleApis:
+    """
+    A StubHttpServer handler answering every Google REST API the server
+    calls, routed by path: Gemini generateContent and streamGenerateContent
+    (SSE), Text-to-Speech text:synthesize (silent LINEAR16 sized to the
+    text) and Perspective comments:analyze (through FakePerspective).
+    """
+
+    REPLY = ("That sounds like a lot to carry this week. It makes sense that you feel tired. "
+             "What is one small thing that would make tomorrow a little easier?")
+
+    def __init__(self, gemini_latency=0.8, stream_first_latency=0.3, stream_event_delay=0.15,
+                 tts_latency=0.25, perspective_latency=0.1):
+        self.gemini_latency = gemini_latency
+        self.stream_first_latency = stream_first_latency
+        self.stream_event_delay = stream_event_delay
+        self.tts_latency = tts_latency
+        self.perspective = FakePerspective(perspective_latency)
+        self.calls = {}
+
+    def __call__(self, method, path, body):
+        import base64
+        import json
+        import re
+
+        if "streamGenerateContent" in path:
+            api = "gemini_stream"
+            sentences = re.split(r"(?<=[.?!]) ", self.REPLY)
+            stub = StubResponse(events=[gemini_reply(s + " ") for s in sentences],
+                                delay=self.stream_first_latency, event_delay=self.stream_event_delay)
+        elif "generateContent" in path:
+            api = "gemini"
+            stub = StubResponse(json_body=gemini_reply(self.REPLY), delay=self.gemini_latency)
+        elif "text:synthesize" in path:
+            api = "tts"
+            # About 15 characters per second of speech at 16 kHz LINEAR16
+            text = json.loads(body)["input"]["text"]
+            audio = bytes(int(len(text) / 15 * 32000))
+            stub = StubResponse(json_body={"audioContent": base64.b64encode(audio).decode()}, delay=self.tts_latency)
+        elif "comments:analyze" in path:
+            api = "perspective"
+            stub = self.perspective(method, path, body)
+        else:
+            api = "unknown"
+            stub = StubResponse(status=404)
+        self.calls[api] = self.calls.get(api, 0) + 1
+        return stub
+
+
+class FakeFirestore:
+    """
+    An in-memory stand-in for google.cloud.firestore.Client covering the
+    calls the backend makes. Every RPC sleeps `latency` seconds and is
+    counted: `rpcs` is round trips, `reads` is documents returned,
+    `queries` is stream() calls, `writes` is documents written. A
+    `failure_rate` fraction of RPCs raise ServiceUnavailable.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.docs = {}
+        self.rpcs = 0
+        self.reads = 0
+        self.queries = 0
+        self.writes = 0
+        self._watches = []
+
+    def _rpc(self):
+        from google.api_core.exceptions import ServiceUnavailable
+
+        self.rpcs += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ServiceUnavailable("injected failure")
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def document(self, path):
+        return FakeDocumentRef(self, tuple(path.split("/")))
+
+    def collection_group(self, name):
+        return FakeQuery(self, group=name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def _write(self, path, data, merge=False):
+        from google.cloud.firestore import SERVER_TIMESTAMP
+
+        data = {k: datetime.now(timezone.utc) if v is SERVER_TIMESTAMP else v for k, v in data.items()}
+        if merge and path in self.docs:
+            data = {**self.docs[path], **data}
+        self.docs[path] = data
+        self.writes += 1
+        self._notify_watches()
+
+    def _notify_watches(self):
+        for watch in list(self._watches):
+            watch.notify()
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field) if self._data else None
+
+
+class FakeDocumentRef:
+    def __init__(self, client, key):
+        self._client = client
+        self._key = key  # path segments; `path` is the slash-joined string, as in Firestore
+        self.id = key[-1]
+
+    @property
+    def path(self):
+        return "/".join(self._key)
+
+    @property
+    def parent(self):
+        return FakeCollection(self._client, self._key[:-1])
+
+    def collection(self, name):
+        return FakeCollection(self._client, self._key + (name,))
+
+    def get(self):
+        self._client._rpc()
+        self._client.reads += 1
+        return FakeSnapshot(self, self._client.docs.get(self._key))
+
+    def set(self, data, merge=False):
+        self._client._rpc()
+        self._client._write(self._key, data, merge)
+
+    def create(self, data):
+        from google.api_core.exceptions import AlreadyExists
+
+        self._client._rpc()
+        if self._key in self._client.docs:
+            raise AlreadyExists(f"Document already exists: {self.path}")
+        self._client._write(self._key, data)
+
+    def update(self, data):
+        self._client._rpc()
+        self._client._write(self._key, data, merge=True)
+
+    def delete(self):
+        self._client._rpc()
+        self._client.docs.pop(self._key, None)
+        self._client._notify_watches()
+
+
+class FakeQuery:
+    def __init__(self, client, path=None, group=None, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._client = client
+        self._path = path
+        self._group = group
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = dict(path=self._path, group=self._group, filters=self._filters, orders=self._orders,
+                     limit=self._limit, cursor=self._cursor, fields=self._fields)
+        state.update(changes)
+        return FakeQuery(self._client, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, cursor):
+        """A snapshot, or a dict of the ordered fields' values ("__name__" is a document reference)."""
+        return self._copy(cursor=cursor)
+
+    def select(self, fields):
+        return self._copy(fields=tuple(fields))
+
+    def _matches(self, path, data):
+        if self._group is not None:
+            if len(path) < 2 or path[-2] != self._group:
+                return False
+        elif path[:-1] != self._path:
+            return False
+        ops = {"==": lambda a, b: a == b, "<": lambda a, b: a < b, ">": lambda a, b: a > b,
+               "<=": lambda a, b: a <= b, ">=": lambda a, b: a >= b}
+        return all(field in data and ops[op](data[field], value) for field, op, value in self._filters)
+
+    @staticmethod
+    def _value(path, data, field):
+        return path if field == "__name__" else data.get(field)
+
+    def _after_cursor(self, path, data):
+        if isinstance(self._cursor, dict):
+            cursor = {k: v._key if k == "__name__" else v for k, v in self._cursor.items()}
+        else:
+            cursor = {"__name__": self._cursor.reference._key, **self._cursor.to_dict()}
+        for field, direction in self._orders + (("__name__", "ASCENDING"),):
+            if field not in cursor:
+                break
+            value, bound = self._value(path, data, field), cursor[field]
+            if value != bound:
+                return value < bound if str(direction).upper().startswith("DESC") else value > bound
+        return False
+
+    def _evaluate(self):
+        # list() copies the items in one step, so writes from other threads cannot break the scan
+        items = [(p, d) for p, d in list(self._client.docs.items()) if self._matches(p, d)]
+        items.sort(key=lambda item: item[0])
+        for field, direction in reversed(self._orders):
+            items.sort(key=lambda item: self._value(*item, field),
+                       reverse=str(direction).upper().startswith("DESC"))
+        if self._cursor is not None:
+            items = [(p, d) for p, d in items if self._after_cursor(p, d)]
+        if self._limit is not None:
+            items = items[:self._limit]
+        return items
+
+    def stream(self):
+        self._client._rpc()
+        self._client.queries += 1
+        for path, data in self._evaluate():
+            self._client.reads += 1
+            if self._fields is not None:
+                data = {k: v for k, v in data.items() if k in self._fields}
+            yield FakeSnapshot(FakeDocumentRef(self._client, path), data)
+
+    def get(self):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self, callback)
+        self._client._watches.append(watch)
+        watch.notify()
+        return watch
+
+
+class FakeWatch:
+    """
+    A snapshot listener. Unlike Firestore, which calls back on its own
+    thread, it calls back synchronously on the writer's thread after every
+    write that changes the query's result set.
+    """
+
+    def __init__(self, query, callback):
+        self._query = query
+        self._callback = callback
+        self._seen = None
+        self.is_active = True
+
+    def notify(self):
+        client = self._query._client
+        items = self._query._evaluate()
+        docs = [FakeSnapshot(FakeDocumentRef(client, path), data) for path, data in items]
+        current = {doc.reference._key: doc for doc in docs}
+        first, changes = self._seen is None, []
+        self._seen = self._seen or {}
+        for key, doc in current.items():
+            if key not in self._seen:
+                changes.append(SimpleNamespace(type=SimpleNamespace(name="ADDED"), document=doc))
+            elif self._seen[key] != doc._data:
+                changes.append(SimpleNamespace(type=SimpleNamespace(name="MODIFIED"), document=doc))
+        for key, data in self._seen.items():
+            if key not in current:
+                removed = FakeSnapshot(FakeDocumentRef(client, key), data)
+                changes.append(SimpleNamespace(type=SimpleNamespace(name="REMOVED"), document=removed))
+        self._seen = {key: dict(doc._data) for key, doc in current.items()}
+        if changes or first:
+            self._callback(docs, changes, datetime.now(timezone.utc))
+
+    def unsubscribe(self):
+        self.is_active = False
+        self._query._client._watches.remove(self)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path=path)
+        self.id = path[-1]
+
+    @property
+    def parent(self):
+        return FakeDocumentRef(self._client, self._path[:-1]) if len(self._path) > 1 else None
+
+    def document(self, document_id=None):
+        import uuid
+
+        return FakeDocumentRef(self._client, self._path + (document_id or uuid.uuid4().hex[:20],))
+
+
+class FakeWriteBatch:
+    """Collects writes and applies them in one RPC on commit()."""
+
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, data, merge=False):
+        self._ops.append((reference._key, data, merge))
+
+    def update(self, reference, data):
+        self._ops.append((reference._key, data, True))
+
+    def commit(self):
+        self._client._rpc()
+        for path, data, merge in self._ops:
+            self._client._write(path, data, merge)
+        self._ops = []
@@ -0,0 +1,393 @@
+# benchmarks/loadtest.py
+"""
+End-to-end offline load test of server.py. The real app runs under uvicorn
+in a child process, with Google STT, TTS, Gemini, Perspective and Firestore
+replaced by the fakes in benchmarks/fakes.py (latencies set below) and the
+emotion models by CPU-burning stand-ins. Synthetic clients replay /process
+turns (init, video frames, audio_file) while others load /journal,
+/journals/{user_id}, /public_journals and /suggestion/{user_id}. The report
+gives throughput and p50/p95/p99 per endpoint, per turn stage (from the
+timings the server returns after each turn) and the server's peak memory. Everything listens on
+127.0.0.1, so no network access is needed.
+
+Run from the backend directory:
+    python -m benchmarks.loadtest --duration 30 --ws-users 3 --http-users 6
+    python -m benchmarks.loadtest --save baseline.json
+    python -m benchmarks.loadtest --baseline baseline.json   # exits 1 if a p95 regressed
+"""
+import argparse
+import asyncio
+import base64
+import functools
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import httpx
+
+from benchmarks.common import make_webm, percentile
+
+ENDPOINT_WEIGHTS = {
+    "POST /journal": 1,
+    "GET /journals/{user_id}": 3,
+    "GET /public_journals": 4,
+    "GET /suggestion/{user_id}": 2,
+}
+JOURNAL_TEXTS = (
+    "Work was overwhelming today but I went for a walk and felt calmer.",
+    "Grateful for a long call with my sister this evening.",
+    "Slept badly again. Trying to put the phone away earlier.",
+    "Finished the project I was dreading. Proud of myself.",
+)
+REGRESSION_FLOOR_MS = 5.0  # p95 changes smaller than this are noise, whatever the ratio
+TIMINGS_WAIT = 5.0         # seconds to wait for a turn's turn_timings after its reply
+
+
+# --- Server side (child process) ---
+
+def fake_audio_model():
+    from benchmarks.fakes import FakeEmotionModel
+    return FakeEmotionModel()
+
+
+def fake_video_engine():
+    from benchmarks.fakes import FakeFaceDetector
+    from video_emotion import VideoEmotionEngine
+    return VideoEmotionEngine(FakeFaceDetector())
+
+
+class RedirectTransport(httpx.AsyncBaseTransport):
+    """Sends every request to the local stub, whichever Google host it names."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self._transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=100))
+
+    async def handle_async_request(self, request):
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def serve(args):
+    """Import server.py against the fakes and run it until terminated."""
+    from unittest import mock
+
+    import uvicorn
+
+    from benchmarks.fakes import FakeFirestore, FakeGoogleApis, FakeSpeechClient, StubHttpServer
+
+    import logs
+
+    db = FakeFirestore(latency=args.firestore_latency)
+    speech_client = FakeSpeechClient(base_latency=args.stt_latency, finalize_latency=args.stt_latency)
+    offline_credentials = SimpleNamespace(token="offline", expiry=None)
+    for patch in (
+        mock.patch("google.oauth2.service_account.Credentials.from_service_account_file",
+                   return_value=offline_credentials),
+        mock.patch("firebase_admin.credentials.Certificate"),
+        mock.patch("firebase_admin.initialize_app"),
+        mock.patch("firebase_admin.firestore.client", return_value=db),
+        mock.patch("google.cloud.speech.SpeechClient.from_service_account_file", return_value=speech_client),
+        # The server configures logging when it starts; keep it at the requested level
+        mock.patch("logs.configure", functools.partial(logs.configure, level=args.server_log_level)),
+    ):
+        patch.start()
+
+    import server
+
+    server.audio_pool.loader = fake_audio_model
+    server.video_pool.loader = fake_video_engine
+    apis = FakeGoogleApis(gemini_latency=args.gemini_latency, stream_first_latency=args.gemini_latency / 2,
+                          tts_latency=args.tts_latency, perspective_latency=args.perspective_latency)
+    lifespan = server.app.router.lifespan_context
+
+    @asynccontextmanager
+    async def offline_lifespan(app):
+        stub = await StubHttpServer(apis).start()
+        original = server.upstreams.http
+        http = httpx.AsyncClient(transport=RedirectTransport(stub.port))
+        server.upstreams.http = http
+        for upstream in server.upstreams.upstreams.values():
+            upstream.http = http
+        await original.aclose()
+        async with lifespan(app):
+            yield
+        await stub.stop()
+
+    server.app.router.lifespan_context = offline_lifespan
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- Client side ---
+
+class TurnBusy(Exception):
+    """The server shed the turn with a busy status."""
+
+
+class Results:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.stages = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def record(self, name: str, ms: float):
+        self.samples[name].append(ms)
+
+    def fail(self, name: str, reason: str):
+        self.errors[name][reason] += 1
+
+
+async def process_turns(args, user_id, frames, audio, results, stop_at):
+    import websockets
+
+    url = f"ws://127.0.0.1:{args.port}/process"
+    while time.perf_counter() < stop_at:
+        try:
+            async with websockets.connect(url, max_size=None) as ws:
+                await ws.send(json.dumps({"type": "init", "user_id": user_id, "response_mode": args.response_mode,
+                                          "timings": True}))
+                for frame in frames:
+                    await ws.send(json.dumps({"type": "video", "data": frame}))
+                sent = time.perf_counter()
+                await ws.send(json.dumps({"type": "audio_file", "data": audio}))
+                first_audio = None
+                while True:
+                    message = json.loads(await ws.recv())
+                    kind = message.get("type")
+                    if kind == "status" and message.get("message") == "busy":
+                        raise TurnBusy()
+                    if kind in ("response_chunk", "final_response") and first_audio is None:
+                        first_audio = time.perf_counter()
+                    if kind in ("final_response", "response_end"):
+                        break
+                done = time.perf_counter()
+                # The server's own stage timings for this turn follow the reply
+                while message.get("type") != "turn_timings":
+                    message = json.loads(await asyncio.wait_for(ws.recv(), TIMINGS_WAIT))
+            results.record("WS /process turn", (done - sent) * 1000)
+            results.record("WS /process first audio", (first_audio - sent) * 1000)
+            for stage, ms in message["stage_ms"].items():
+                results.stages[stage].append(ms)
+        except TurnBusy:
+            results.fail("WS /process turn", "busy")
+        except Exception as e:
+            results.fail("WS /process turn", type(e).__name__)
+
+
+async def journal_request(client, name, user_id, rng):
+    if name == "POST /journal":
+        return await client.post("/journal", json={
+            "title": "Today",
+            "content": rng.choice(JOURNAL_TEXTS),
+            "visibility": rng.choice(("public", "private")),
+            "user_id": user_id,
+        })
+    if name == "GET /journals/{user_id}":
+        return await client.get(f"/journals/{user_id}")
+    if name == "GET /public_journals":
+        return await client.get("/public_journals")
+    return await client.get(f"/suggestion/{user_id}")
+
+
+async def http_requests(client, user_id, rng, results, stop_at):
+    names = list(ENDPOINT_WEIGHTS)
+    weights = list(ENDPOINT_WEIGHTS.values())
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await journal_request(client, name, user_id, rng)
+        except Exception as e:
+            results.fail(name, type(e).__name__)
+            continue
+        if response.status_code >= 400:
+            results.fail(name, str(response.status_code))
+        else:
+            results.record(name, (time.perf_counter() - start) * 1000)
+
+
+def percentiles(samples: list) -> dict:
+    return {f"p{pct}": round(percentile(samples, pct), 1) for pct in (50, 95, 99)}
+
+
+def peak_memory_mb(pid: int) -> dict:
+    """VmHWM of the server process and the sum over its children (the model workers)."""
+    def hwm(process_id):
+        try:
+            with open(f"/proc/{process_id}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return 0.0
+
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        children = []
+    return {"server": round(hwm(pid), 1), "workers": round(sum(hwm(child) for child in children), 1)}
+
+
+async def wait_until_ready(client, timeout: float) -> dict:
+    deadline = time.perf_counter() + timeout
+    snapshot = {}
+    while time.perf_counter() < deadline:
+        try:
+            snapshot = (await client.get("/ready")).json()
+            if snapshot.get("mode") == "full":
+                return snapshot
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    if not snapshot.get("ready"):
+        raise RuntimeError(f"server did not become ready within {timeout:.0f}s: {snapshot}")
+    return snapshot
+
+
+async def run_load(args, server_pid: int) -> dict:
+    rng = random.Random(args.seed)
+    audio = base64.b64encode(make_webm(args.audio_seconds)).decode()
+    frames = []
+    if args.frames:
+        from benchmarks.bench_video import synthetic_frames
+        frames = [base64.b64encode(frame).decode() for frame in synthetic_frames(args.frames)]
+
+    limits = httpx.Limits(max_connections=args.http_users * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+        snapshot = await wait_until_ready(client, args.startup_timeout)
+        print(f"server {snapshot.get('mode')} after {snapshot.get('uptime_seconds')}s")
+
+        # Every user starts with a few journals so the reads return pages
+        users = [f"load-user-{i}" for i in range(max(args.http_users, args.ws_users))]
+        await asyncio.gather(*(
+            journal_request(client, "POST /journal", user, rng) for user in users for _ in range(args.seed_journals)
+        ))
+
+        results = Results()
+        start = time.perf_counter()
+        stop_at = start + args.duration
+        await asyncio.gather(
+            *(process_turns(args, users[i], frames, audio, results, stop_at) for i in range(args.ws_users)),
+            *(http_requests(client, users[i], random.Random(args.seed + i), results, stop_at)
+              for i in range(args.http_users)),
+        )
+        elapsed = time.perf_counter() - start
+        stats = (await client.get("/stats")).json()
+
+    endpoints = {}
+    for name in sorted(set(results.samples) | set(results.errors)):
+        samples = results.samples[name]
+        endpoints[name] = {
+            "n": len(samples),
+            "per_second": round(len(samples) / elapsed, 2),
+            **percentiles(samples),
+            "errors": dict(results.errors[name]),
+        }
+    # tts_sentence is summed over a turn's sentences, like every stage a turn enters more than once
+    stages = {stage: {"n": len(samples), **percentiles(samples)} for stage, samples in results.stages.items()}
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("save", "baseline")},
+        "seconds": round(elapsed, 1),
+        "endpoints": endpoints,
+        "stages": stages,
+        "memory_mb": peak_memory_mb(server_pid),
+        "admission": stats.get("admission"),
+    }
+
+
+def print_report(report: dict):
+    print(f"\n{report['seconds']:.0f}s of load")
+    print(f"{'endpoint':<28} {'n':>6} {'req/s':>7} {'p50':>9} {'p95':>9} {'p99':>9}  errors")
+    for name, row in report["endpoints"].items():
+        print(f"{name:<28} {row['n']:>6} {row['per_second']:>7} {row['p50']:>7.1f}ms {row['p95']:>7.1f}ms "
+              f"{row['p99']:>7.1f}ms  {row['errors'] or ''}")
+    print(f"\n{'turn stage (server)':<28} {'n':>6} {'':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for stage, row in sorted(report["stages"].items()):
+        print(f"{stage:<28} {row['n']:>6} {'':>7} {row['p50']:>7.1f}ms {row['p95']:>7.1f}ms {row['p99']:>7.1f}ms")
+    memory = report["memory_mb"]
+    print(f"\npeak RSS: server {memory['server']:.0f} MiB, model workers {memory['workers']:.0f} MiB (sum)")
+    print(f"admission: {report['admission']}")
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    found = []
+    for section in ("endpoints", "stages"):
+        for name, row in report[section].items():
+            old = baseline.get(section, {}).get(name)
+            if not old or not row.get("n"):
+                continue
+            if row["p95"] > old["p95"] * (1 + tolerance) and row["p95"] - old["p95"] > REGRESSION_FLOOR_MS:
+                found.append(f"{name}: p95 {old['p95']:.1f}ms -> {row['p95']:.1f}ms")
+    return found
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(args):
+    args.port = args.port or free_port()
+    context = multiprocessing.get_context("spawn")
+    server_process = context.Process(target=serve, args=(args,))
+    server_process.start()
+    try:
+        report = asyncio.run(run_load(args, server_process.pid))
+    finally:
+        # SIGINT lets uvicorn run the lifespan shutdown, which stops the model worker processes
+        os.kill(server_process.pid, signal.SIGINT)
+        server_process.join(15)
+        if server_process.is_alive():
+            server_process.terminate()
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+        print(f"no p95 regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after warm-up")
+    parser.add_argument("--ws-users", type=int, default=3, help="clients replaying /process turns back to back")
+    parser.add_argument("--http-users", type=int, default=6, help="clients calling the journal endpoints")
+    parser.add_argument("--frames", type=int, default=10, help="video frames sent per turn")
+    parser.add_argument("--audio-seconds", type=float, default=3.0)
+    parser.add_argument("--response-mode", choices=("full", "stream"), default="full")
+    parser.add_argument("--seed-journals", type=int, default=5, help="journals each user posts before the run")
+    parser.add_argument("--gemini-latency", type=float, default=0.8)
+    parser.add_argument("--tts-latency", type=float, default=0.25)
+    parser.add_argument("--stt-latency", type=float, default=0.2)
+    parser.add_argument("--perspective-latency", type=float, default=0.1)
+    parser.add_argument("--firestore-latency", type=float, default=0.02, help="seconds per Firestore RPC")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--server-log-level", default=os.environ.get("COSMOS_LOG_LEVEL", "WARNING"))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the report as JSON, e.g. to use as a baseline")
+    parser.add_argument("--baseline", help="a saved report to compare p95s against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth over the baseline")
+    main(parser.parse_args())
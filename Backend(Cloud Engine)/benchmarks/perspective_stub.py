@@ -0,0 +1,33 @@
+# benchmarks/perspective_stub.py
+"""
+Runs FakePerspective as a local stand-in for the Perspective API, so the
+server's moderation path can be exercised without an API key.
+
+Run from the backend directory, then start the server with the printed
+COSMOS_PERSPECTIVE_URL:
+    python -m benchmarks.perspective_stub --port 8085 --latency 0.1 --qps 1
+"""
+import argparse
+import asyncio
+
+from benchmarks.fakes import FakePerspective, StubHttpServer
+
+
+async def main(args):
+    server = await StubHttpServer(FakePerspective(args.latency, args.qps), port=args.port).start()
+    print(f"COSMOS_PERSPECTIVE_URL={server.url}/v1alpha1/comments:analyze")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--qps", type=float, default=None, help="answer 429 above this rate")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,11 +1,220 @@
 # conversation_manager.py
 import uuid
 import time
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
 from google.cloud import firestore
-from google.oauth2 import service_account
 
-credentials = service_account.Credentials.from_service_account_file("response_credentials.json")
-db = firestore.Client(credentials=credentials)
+from logs import get_logger
+
+log = get_logger("conversation_manager")
+
+# The server's Firestore client, handed over at startup so the process holds one
+db = None
+
+HISTORY_CACHE_SIZE = 20          # recent messages kept in memory per user
+HISTORY_CACHE_TTL = 600          # seconds before a user's cached history is re-read from Firestore
+HISTORY_CACHE_MAX_USERS = 2000   # least recently used users are evicted beyond this
+VERSION_MAX_USERS = 10000        # users whose conversation version is tracked; least recently written are forgotten
+
+
+class HistoryCache:
+    """
+    Per-user ring buffers of the most recent messages, shared by every
+    ConversationManager in the process. Writes go through to the buffer
+    so the turn hot path only reads Firestore on a cold (or expired) miss.
+
+    Staged messages (written to the buffer, their Firestore batch not yet
+    committed) are also kept aside per user and merged into any refill,
+    so a read from Firestore that misses them cannot drop them from the
+    history. They are let go once a refill finds them in Firestore, once
+    their commit has landed more than `ttl` ago, or when the write fails.
+    """
+
+    def __init__(self, size=HISTORY_CACHE_SIZE, ttl=HISTORY_CACHE_TTL, max_users=HISTORY_CACHE_MAX_USERS):
+        self.size = size
+        self.ttl = ttl
+        self.max_users = max_users
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user_id -> {"messages": deque, "complete": bool, "loaded_at": float}
+        self._staged = {}  # user_id -> [{"message": dict, "landed_at": float or None}]
+        self._lock = threading.Lock()  # managers are used from asyncio.to_thread workers
+
+    def _live_entry(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["loaded_at"] > self.ttl:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def get(self, user_id, limit):
+        """Return the last `limit` messages, or None if the cache can't answer."""
+        with self._lock:
+            entry = self._live_entry(user_id)
+            # `complete` means Firestore holds no older messages than the buffer does
+            if entry and (len(entry["messages"]) >= limit or entry["complete"]):
+                self.hits += 1
+                return [dict(m) for m in list(entry["messages"])[-limit:]]
+            self.misses += 1
+            return None
+
+    def fill(self, user_id, messages, complete):
+        """Replace the user's buffer with `messages` read from Firestore; returns them with unseen staged ones."""
+        with self._lock:
+            messages = messages + self._unseen_staged(user_id, messages)
+            self._entries[user_id] = {
+                "messages": deque((dict(m) for m in messages[-self.size:]), maxlen=self.size),
+                "complete": complete,
+                "loaded_at": time.monotonic(),
+            }
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+            return messages
+
+    def append(self, user_id, message):
+        """Write-through for a new message. Cold users stay cold: a lone message is not their history."""
+        with self._lock:
+            self._append(user_id, message)
+
+    def _append(self, user_id, message):
+        entry = self._live_entry(user_id)
+        if entry is not None:
+            entry["messages"].append(dict(message))
+            # An active user's buffer is current; the TTL only bounds how stale an idle one gets
+            entry["loaded_at"] = time.monotonic()
+
+    def stage(self, user_id, messages):
+        """Write-through for messages whose Firestore write is still pending."""
+        with self._lock:
+            staged = self._staged.setdefault(user_id, [])
+            for message in messages:
+                staged.append({"message": dict(message), "landed_at": None})
+                self._append(user_id, message)
+
+    def landed(self, user_id, messages):
+        """The staged `messages` are committed; refills still merge them until Firestore returns them."""
+        keys = {_message_key(m) for m in messages}
+        with self._lock:
+            for item in self._staged.get(user_id, ()):
+                if _message_key(item["message"]) in keys:
+                    item["landed_at"] = time.monotonic()
+
+    def discard(self, user_id, messages):
+        """The staged `messages` will never be written: forget them and the buffer that shows them."""
+        keys = {_message_key(m) for m in messages}
+        with self._lock:
+            self._keep_staged(user_id, lambda item: _message_key(item["message"]) not in keys)
+            self._entries.pop(user_id, None)
+
+    def _unseen_staged(self, user_id, messages):
+        """Staged messages missing from a Firestore read, dropping those it shows or that landed long ago."""
+        keys = {_message_key(m) for m in messages}
+        now = time.monotonic()
+        self._keep_staged(user_id, lambda item: _message_key(item["message"]) not in keys and (
+            item["landed_at"] is None or now - item["landed_at"] <= self.ttl))
+        return [dict(item["message"]) for item in self._staged.get(user_id, ())]
+
+    def _keep_staged(self, user_id, keep):
+        staged = [item for item in self._staged.get(user_id, ()) if keep(item)]
+        if staged:
+            self._staged[user_id] = staged
+        else:
+            self._staged.pop(user_id, None)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "staged": sum(len(items) for items in self._staged.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _message_key(message):
+    return message.get("sender"), message.get("text"), message.get("timestamp")
+
+
+history_cache = HistoryCache()
+
+
+class ConversationVersions:
+    """
+    A per-user version bumped whenever messages are written, so caches of
+    anything derived from a conversation can key on it. Subscribers are
+    called with the user ID after each bump.
+
+    Versions come from one process-wide counter, and only the
+    `max_users` most recently written users are tracked. A forgotten
+    user reads as the counter's value at the last eviction, which is
+    newer than any version it had, so caches miss instead of matching
+    an old entry.
+    """
+
+    def __init__(self, max_users=VERSION_MAX_USERS):
+        self.max_users = max_users
+        self._versions = OrderedDict()
+        self._counter = 0
+        self._forgotten = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def current(self, user_id):
+        return self._versions.get(user_id, self._forgotten)
+
+    def bump(self, user_id):
+        with self._lock:
+            self._counter += 1
+            self._versions[user_id] = self._counter
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_users:
+                self._versions.popitem(last=False)
+                self._forgotten = self._counter
+        for callback in self._subscribers:
+            callback(user_id)
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+
+conversation_versions = ConversationVersions()
+
+
+def use_firestore(client):
+    global db
+    db = client
+
+
+class StagedTurn:
+    """
+    A turn's two messages, already in the history cache, and the
+    uncommitted WriteBatch that stores them. `commit` is the blocking
+    write for the write-behind queue; `discard` is its on_failure.
+    """
+
+    def __init__(self, user_id: str, batch, messages: list):
+        self.user_id = user_id
+        self.batch = batch
+        self.messages = messages
+
+    def commit(self):
+        self.batch.commit()
+        history_cache.landed(self.user_id, self.messages)
+
+    def discard(self):
+        history_cache.discard(self.user_id, self.messages)
+
 
 class ConversationManager:
     def __init__(self, user_id: str):
@@ -30,20 +239,51 @@ class ConversationManager:
         
         # ✅ Use .document().set() instead of .add() for guaranteed uniqueness
         self.convo_ref.document(unique_id).set(data)
-        print(f"📝 DEBUG: Saved message with ID: {unique_id}")
+        history_cache.append(self.user_id, {**data, "timestamp": datetime.now(timezone.utc)})
+        conversation_versions.bump(self.user_id)
+        log.debug("Saved message", user_id=self.user_id, message_id=unique_id)
+
+    def stage_turn(self, user_text: str, ai_text: str) -> StagedTurn:
+        """
+        Record a user message and the AI reply in the history cache and
+        return them with an uncommitted WriteBatch holding both. Timestamps
+        come from this clock, not the server's, so the pair keeps its order
+        however late the batch is committed.
+        """
+        batch = db.batch()
+        user_time = datetime.now(timezone.utc)
+        ai_time = max(datetime.now(timezone.utc), user_time + timedelta(microseconds=1))
+        messages = []
+        for sender, text, timestamp in (("user", user_text, user_time), ("ai", ai_text, ai_time)):
+            unique_id = f"{sender}_{int(timestamp.timestamp() * 1000)}_{uuid.uuid4().hex[:8]}"
+            data = {"sender": sender, "text": text, "timestamp": timestamp}
+            # Fixed document IDs make re-committing the batch after a failure idempotent
+            batch.set(self.convo_ref.document(unique_id), data)
+            messages.append(data)
+        history_cache.stage(self.user_id, messages)
+        conversation_versions.bump(self.user_id)
+        return StagedTurn(self.user_id, batch, messages)
 
     def get_last_messages(self, limit=6):
         """Fetch last N messages (user + AI)"""
+        cached = history_cache.get(self.user_id, limit)
+        if cached is not None:
+            return cached
         try:
+            # Read enough to fill the cache so the following turns don't query again
+            fetch_limit = max(limit, history_cache.size)
             docs = (
                 self.convo_ref.order_by("timestamp", direction=firestore.Query.DESCENDING)
-                .limit(limit)
+                .limit(fetch_limit)
                 .stream()
             )
             # Correctly reverses the list to be in chronological order
             messages = [doc.to_dict() for doc in docs][::-1]
-            print(f"📖 DEBUG: Retrieved {len(messages)} messages")
+            # Staged turns whose batch has not landed yet are merged back in
+            messages = history_cache.fill(self.user_id, messages, complete=len(messages) < fetch_limit)
+            messages = messages[-limit:]
+            log.debug("Retrieved messages", user_id=self.user_id, count=len(messages))
             return messages
         except Exception as e:
-            print(f"\ DEBUG: Error retrieving messages: {e}")
+            log.error("Error retrieving messages", user_id=self.user_id, error=str(e))
             return []
\ No newline at end of file
@@ -0,0 +1,84 @@
+# framing.py
+import base64
+import struct
+
+# A binary WebSocket frame is this header followed by the raw payload:
+# kind (u8) and a sequence number (u16, big-endian)
+FRAME_HEADER = struct.Struct("!BH")
+
+FRAME_AUDIO = 1           # client -> server: a slice of the WebM recording
+FRAME_VIDEO = 2           # client -> server: one JPEG camera frame
+FRAME_RESPONSE_AUDIO = 3  # server -> client: the audio of the JSON message sent just before it
+
+MAX_BUFFERED_FRAMES = 24  # video frames held per turn; twice the analysis budget leaves room to drop duplicates
+
+
+class FrameError(ValueError):
+    """Raised for a binary frame too short for its header or of an unknown kind."""
+
+
+def encode_frame(kind: int, sequence: int, payload) -> bytes:
+    return FRAME_HEADER.pack(kind, sequence & 0xFFFF) + payload
+
+
+def decode_frame(data) -> tuple:
+    """(kind, sequence, payload) where the payload is a memoryview into `data`, not a copy."""
+    view = memoryview(data)
+    if view.nbytes < FRAME_HEADER.size:
+        raise FrameError("frame shorter than its header")
+    kind, sequence = FRAME_HEADER.unpack_from(view)
+    if kind not in (FRAME_AUDIO, FRAME_VIDEO):
+        raise FrameError(f"unknown frame kind {kind}")
+    return kind, sequence, view[FRAME_HEADER.size:]
+
+
+class FrameSampler:
+    """
+    The video frames of one turn, thinned as they arrive. Once `limit`
+    frames are kept, every other one is dropped and from then on only
+    every second (then fourth, ...) arriving frame is kept, so a long turn
+    holds at most `limit` evenly spaced frames instead of all of them.
+    `take` hands the held frames over for analysis while the turn goes on.
+    """
+
+    def __init__(self, limit: int = MAX_BUFFERED_FRAMES):
+        self.limit = limit
+        self.frames = []
+        self.received = 0
+        self._kept = 0
+        self._stride = 1
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __bool__(self) -> bool:
+        return bool(self.frames)
+
+    def add(self, frame):
+        """Keep `frame` (bytes or a memoryview) if it falls on the current stride."""
+        index = self.received
+        self.received += 1
+        if index % self._stride:
+            return
+        self.frames.append(frame)
+        self._kept += 1
+        if self._kept >= self.limit:
+            self.frames = self.frames[::2]
+            self._kept //= 2
+            self._stride *= 2
+
+    def add_base64(self, frame_b64: str):
+        # The JSON protocol: decode now, so only the kept frames' raw bytes stay in memory
+        index = self.received
+        if index % self._stride == 0:
+            self.add(base64.b64decode(frame_b64))
+        else:
+            self.received += 1
+
+    def take(self) -> list:
+        """Hand over the frames held so far; sampling goes on at the current stride."""
+        frames, self.frames = self.frames, []
+        return frames
+
+    def clear(self):
+        self.frames = []
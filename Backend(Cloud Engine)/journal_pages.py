@@ -0,0 +1,132 @@
+# journal_pages.py
+import base64
+import json
+from datetime import datetime
+
+from google.cloud.firestore import Query
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from logs import get_logger
+
+log = get_logger("journal_pages")
+
+JOURNAL_PAGE_SIZE = 50      # journals per page when the client does not ask for a limit
+JOURNAL_PAGE_MAX = 200      # upper bound on a requested limit
+JOURNAL_PREVIEW_CHARS = 160
+
+# Fields a client may request. `id` and `user_id` come from the document path and
+# `preview` is derived from `content`; the rest are stored on the journal itself.
+JOURNAL_FIELDS = ("id", "user_id", "title", "content", "preview", "visibility", "timestamp")
+_STORED_FIELDS = {"title": "title", "content": "content", "preview": "content",
+                  "visibility": "visibility", "timestamp": "timestamp"}
+
+
+class PageRequestError(ValueError):
+    """Raised for a malformed cursor or an unknown field name."""
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, JOURNAL_PAGE_MAX))
+
+
+def parse_fields(fields: str = None) -> tuple:
+    """Parse a comma-separated field list; None means every field."""
+    if not fields:
+        return JOURNAL_FIELDS
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in JOURNAL_FIELDS]
+    if unknown:
+        raise PageRequestError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def encode_position(timestamp, path: str) -> str:
+    """An opaque cursor pointing just past the journal at `path` in timestamp order."""
+    raw = json.dumps({"t": timestamp.isoformat(), "p": path})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def encode_cursor(snapshot) -> str:
+    return encode_position(snapshot.get("timestamp"), snapshot.reference.path)
+
+
+def parse_cursor(cursor: str) -> tuple:
+    """The (timestamp, document path) a cursor points just past."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        return datetime.fromisoformat(position["t"]), position["p"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise PageRequestError(f"Invalid cursor: {e}")
+
+
+def decode_cursor(db, cursor: str) -> dict:
+    timestamp, path = parse_cursor(cursor)
+    return {"timestamp": timestamp, "__name__": db.document(path)}
+
+
+def page_query(db, query, limit: int, start_after: str = None, fields: tuple = JOURNAL_FIELDS):
+    """
+    Bound `query` to one page, newest first. The document ID breaks
+    timestamp ties so a cursor never skips or repeats a journal, and only
+    the stored fields the page needs are read.
+    """
+    query = (
+        query.order_by("timestamp", direction=Query.DESCENDING)
+             .order_by(FieldPath.document_id(), direction=Query.DESCENDING)
+    )
+    if start_after:
+        query = query.start_after(decode_cursor(db, start_after))
+    # The timestamp is always read because the next cursor is built from it
+    stored = sorted({_STORED_FIELDS[f] for f in fields if f in _STORED_FIELDS} | {"timestamp"})
+    return query.select(stored).limit(limit)
+
+
+def shape_journal(data: dict, journal_id: str, user_id: str, fields: tuple) -> dict:
+    """Build the JSON form of one journal with just the requested fields."""
+    journal = {}
+    for field in fields:
+        if field == "id":
+            journal["id"] = journal_id
+        elif field == "user_id":
+            journal["user_id"] = user_id
+        elif field == "preview":
+            content = data.get("content") or ""
+            preview = content[:JOURNAL_PREVIEW_CHARS]
+            journal["preview"] = preview.rstrip() + "…" if len(content) > JOURNAL_PREVIEW_CHARS else preview
+        elif field == "timestamp":
+            if data.get("timestamp") is not None:
+                journal["timestamp"] = data["timestamp"].isoformat()
+        elif field in data:
+            journal[field] = data[field]
+    return journal
+
+
+def serialize_journal(snapshot, fields: tuple) -> dict:
+    return shape_journal(snapshot.to_dict(), snapshot.id, snapshot.reference.parent.parent.id, fields)
+
+
+def stream_page(snapshots, first, limit: int, fields: tuple):
+    """
+    Yield one page as a JSON document, a journal at a time, so the server
+    never holds the whole page as objects and the client starts receiving
+    bytes immediately. `first` is the already-fetched first snapshot (or
+    None) so that query errors surface before the response starts.
+    """
+    yield '{"journals": ['
+    count = 0
+    last = None
+    error = None
+    try:
+        snapshot = first
+        while snapshot is not None:
+            yield ("," if count else "") + json.dumps(serialize_journal(snapshot, fields))
+            count += 1
+            last = snapshot
+            snapshot = next(snapshots, None)
+    except Exception as e:
+        log.error("Error while streaming journals", error=str(e))
+        error = str(e)
+    tail = {"count": count, "next_cursor": encode_cursor(last) if count == limit and last else None}
+    tail.update({"success": False, "error": error} if error else {"success": True})
+    yield "], " + json.dumps(tail)[1:]
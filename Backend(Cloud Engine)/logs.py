@@ -0,0 +1,73 @@
+# logs.py
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+LOG_FORMAT = os.environ.get("COSMOS_LOG_FORMAT", "text")  # "json" writes one JSON object per line
+LOG_LEVEL = os.environ.get("COSMOS_LOG_LEVEL", "INFO")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The message as before, followed by its fields as key=value pairs."""
+
+    def format(self, record):
+        line = record.getMessage()
+        fields = getattr(record, "fields", {})
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class Logger:
+    """A stdlib logger whose calls take structured fields as keyword arguments."""
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"cosmos.{name}")
+
+    def _log(self, level, message, fields, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, message, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, message: str, **fields):
+        self._log(logging.DEBUG, message, fields)
+
+    def info(self, message: str, **fields):
+        self._log(logging.INFO, message, fields)
+
+    def warning(self, message: str, **fields):
+        self._log(logging.WARNING, message, fields)
+
+    def error(self, message: str, exc_info=False, **fields):
+        self._log(logging.ERROR, message, fields, exc_info)
+
+
+def get_logger(name: str) -> Logger:
+    return Logger(name)
+
+
+def configure(log_format: str = LOG_FORMAT, level: str = LOG_LEVEL):
+    """Send every cosmos.* logger to stdout, as plain lines or as JSON."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    root = logging.getLogger("cosmos")
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+    root.propagate = False
@@ -0,0 +1,185 @@
+# metrics.py
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()  # observed from asyncio.to_thread workers too
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def samples(self):
+        """(suffix, label names, label values, value) tuples for the exposition format."""
+        return []
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels_text(names, values)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", self.labels, key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """A value read when /metrics is scraped: `collect()` returns {label values tuple: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), collect=None):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def samples(self):
+        try:
+            values = self.collect() if self.collect else {}
+        except Exception:
+            values = {}
+        return [("", self.labels, key, value) for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        names = self.labels + ("le",)
+        out = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    out.append(("_bucket", names, key + (_number(bound),), count))
+                out.append(("_bucket", names, key + ("+Inf",), series[-1]))
+                out.append(("_sum", self.labels, key, series[-2]))
+                out.append(("_count", self.labels, key, series[-1]))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """The Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+TURN_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "cosmos_turn_stage_seconds", "Time spent in each stage of a /process turn.", ("stage",)
+))
+TURNS = REGISTRY.register(Counter(
+    "cosmos_turns_total", "Finished /process turns by response mode and outcome.", ("mode", "outcome")
+))
+INFERENCE_SECONDS = REGISTRY.register(Histogram(
+    "cosmos_model_inference_seconds",
+    "Model worker pool requests: waiting for a slot (queue) and running in a worker (run).",
+    ("model", "phase"),
+))
+INFERENCE_FAILURES = REGISTRY.register(Counter(
+    "cosmos_model_inference_failures_total", "Model requests that were rejected, missed their deadline or lost their worker.",
+    ("model", "reason"),
+))
+
+
+class TurnTrace:
+    """
+    Stage timings for one /process turn. Every stage is observed in
+    TURN_STAGE_SECONDS as it finishes; `timings` keeps them for the turn's
+    log line. Stages may overlap (video emotion runs beside decoding).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(self.timings.get(name, 0.0) + elapsed * 1000, 1)
+            TURN_STAGE_SECONDS.observe(elapsed, stage=name)
+
+    async def measure(self, name: str, awaitable):
+        with self.stage(name):
+            return await awaitable
+
+    def finish(self, mode: str, outcome: str) -> dict:
+        """Record the whole turn and return the stage timings in milliseconds."""
+        elapsed = time.perf_counter() - self.started
+        TURN_STAGE_SECONDS.observe(elapsed, stage="total")
+        TURNS.inc(mode=mode, outcome=outcome)
+        return {**self.timings, "total": round(elapsed * 1000, 1)}
@@ -0,0 +1,238 @@
+# model_router.py
+import asyncio
+import json
+import time
+from collections import deque
+
+ROUTER_WINDOW = 200              # recent successful latencies kept per model
+ROUTER_MIN_SAMPLES = 20          # below this, hedge after HEDGE_DEFAULT_DELAY
+ROUTER_DEADLINE = 45.0           # seconds before a turn gives up on every model
+HEDGE_PERCENTILE = 95            # a backup request goes out once the primary is slower than this
+HEDGE_DEFAULT_DELAY = 4.0
+HEDGE_MIN_DELAY = 1.0
+HEDGE_MAX_DELAY = 10.0
+BREAKER_WINDOW = 20              # recent outcomes the breaker's error rate is computed over
+BREAKER_ERROR_RATE = 0.5
+BREAKER_MIN_CALLS = 10
+BREAKER_CONSECUTIVE_FAILURES = 5
+BREAKER_COOLDOWN = 10.0          # seconds an open breaker waits before letting one probe through
+
+
+class NoModelAvailable(Exception):
+    """Raised when every model failed, timed out or has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls flow. Open: calls are refused until the cooldown passes.
+    Half-open: a single probe is let through, and its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, window: int = BREAKER_WINDOW, error_rate: float = BREAKER_ERROR_RATE,
+                 min_calls: int = BREAKER_MIN_CALLS, consecutive: int = BREAKER_CONSECUTIVE_FAILURES,
+                 cooldown: float = BREAKER_COOLDOWN):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.consecutive = consecutive
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)
+        self._failures_in_a_row = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record(self, ok: bool):
+        self._probing = False
+        if self.state == "half_open":
+            if ok:
+                self.state = "closed"
+                self._outcomes.clear()
+                self._failures_in_a_row = 0
+            else:
+                self._open()
+            return
+        self._outcomes.append(ok)
+        self._failures_in_a_row = 0 if ok else self._failures_in_a_row + 1
+        failures = self._outcomes.count(False)
+        if self._failures_in_a_row >= self.consecutive or (
+            len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate
+        ):
+            self._open()
+
+    def release(self):
+        """A call was let through but cancelled before it finished; it counts for nothing."""
+        self._probing = False
+
+    def _open(self):
+        self.state = "open"
+        self.trips += 1
+        self._opened_at = time.monotonic()
+
+
+class RoutedModel:
+    """A Gemini model endpoint with its rolling latency, error counts and breaker."""
+
+    def __init__(self, name: str, url: str, window: int = ROUTER_WINDOW):
+        self.name = name
+        self.url = url
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self._latencies = deque(maxlen=window)
+
+    def percentile(self, pct: float):
+        if len(self._latencies) < ROUTER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self) -> float:
+        observed = self.percentile(HEDGE_PERCENTILE)
+        if observed is None:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, observed))
+
+    def stats(self) -> dict:
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "wins": self.wins,
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "breaker": self.breaker.state,
+            "trips": self.breaker.trips,
+        }
+
+
+class ModelRouter:
+    """
+    Sends a generateContent request to the preferred model and, if it has
+    not answered within that model's p95 latency, a hedged copy to the next
+    model whose breaker allows it (the same model if it is the only one).
+    A failure starts the next attempt at once. The first answer wins and
+    the other request is cancelled.
+    """
+
+    def __init__(self, upstream, models, deadline: float = ROUTER_DEADLINE):
+        self.upstream = upstream
+        self.models = [RoutedModel(name, url) for name, url in models]
+        self.deadline = deadline
+        self.hedges = 0
+
+    def _next_model(self, tried):
+        for model in self.models:
+            if model not in tried and model.breaker.allow():
+                return model
+        # Nothing else is healthy: send another copy to a model already tried
+        for model in tried:
+            if model.breaker.state == "closed":
+                return model
+        return None
+
+    async def _attempt(self, model: RoutedModel, payload: dict) -> str:
+        model.calls += 1
+        start = time.perf_counter()
+        try:
+            resj = await self.upstream.post_json(model.url, payload)
+            text = resj["candidates"][0]["content"]["parts"][0]["text"].strip()
+        except asyncio.CancelledError:
+            model.breaker.release()
+            raise
+        except Exception:
+            model.errors += 1
+            model.breaker.record(False)
+            raise
+        model._latencies.append(time.perf_counter() - start)
+        model.breaker.record(True)
+        return text
+
+    async def stream(self, name: str, url: str, payload: dict):
+        """
+        Yield reply text from the named model's streamGenerateContent (SSE)
+        endpoint as it arrives. The call goes through that model's breaker
+        (NoModelAvailable if it is open), the first text must arrive within
+        the router deadline, and the outcome is recorded like any attempt.
+        """
+        model = next(m for m in self.models if m.name == name)
+        if not model.breaker.allow():
+            raise NoModelAvailable(f"{name}: circuit breaker is open")
+        model.calls += 1
+        try:
+            async with asyncio.timeout(self.deadline) as first_text:
+                async with self.upstream.stream("POST", url, json=payload) as resp:
+                    async for line in resp.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        chunk = json.loads(line[len("data:"):])
+                        parts = chunk.get("candidates", [{}])[0].get("content", {}).get("parts", [])
+                        text = "".join(part.get("text", "") for part in parts)
+                        if text:
+                            # Only the wait for the first text is bounded; never yield under the deadline
+                            first_text.reschedule(None)
+                            yield text
+        except (asyncio.CancelledError, GeneratorExit):
+            model.breaker.release()
+            raise
+        except Exception as e:
+            model.errors += 1
+            model.breaker.record(False)
+            if isinstance(e, TimeoutError):
+                raise NoModelAvailable(f"{name}: no text within {self.deadline:.0f}s") from e
+            raise
+        model.breaker.record(True)
+
+    async def generate(self, payload: dict) -> str:
+        """The reply text from whichever model answers first."""
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.deadline
+        attempts = {}  # task -> model
+        tried = []
+        errors = []
+        try:
+            while True:
+                # On entry, after a failure and after a hedge delay passes: start another attempt
+                if len(tried) <= len(self.models):
+                    model = self._next_model(tried)
+                    if model is not None:
+                        if attempts:
+                            self.hedges += 1
+                        tried.append(model)
+                        attempts[asyncio.ensure_future(self._attempt(model, payload))] = model
+                if not attempts:
+                    raise NoModelAvailable("; ".join(errors) or "every circuit breaker is open")
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    raise NoModelAvailable(f"no model answered within {self.deadline:.0f}s")
+                newest = tried[-1]
+                done, _ = await asyncio.wait(
+                    attempts, timeout=min(remaining, newest.hedge_delay()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    model = attempts.pop(task)
+                    if task.exception() is None:
+                        model.wins += 1
+                        return task.result()
+                    errors.append(f"{model.name}: {task.exception()}")
+        finally:
+            for task in attempts:
+                task.cancel()
+            if attempts:
+                await asyncio.gather(*attempts, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"hedges": self.hedges, **{m.name: m.stats() for m in self.models}}
@@ -0,0 +1,317 @@
+# model_workers.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from logs import get_logger
+from metrics import INFERENCE_FAILURES, INFERENCE_SECONDS
+
+AUDIO_MODEL_WORKERS = int(os.environ.get("COSMOS_AUDIO_WORKERS", 1))
+VIDEO_MODEL_WORKERS = int(os.environ.get("COSMOS_VIDEO_WORKERS", 2))
+INFERENCE_QUEUE_SIZE = int(os.environ.get("COSMOS_INFERENCE_QUEUE_SIZE", 16))  # per model, queued + running
+INFERENCE_DEADLINE = 15.0  # seconds a request may spend waiting for a slot and running
+AUDIO_BATCH_WINDOW = 0.02  # seconds to wait for other turns' clips before calling emotion2vec
+AUDIO_MAX_BATCH = 8
+WORKER_START_TIMEOUT = 300.0  # seconds a worker waits for the others to load their models at start
+
+
+class InferenceQueueFull(Exception):
+    """Raised when a model's request queue stays full until the request's deadline."""
+
+
+class InferenceDeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before its result is ready."""
+
+
+log = get_logger("model_workers")
+
+
+# --- Worker process side ---
+
+_worker_model = None
+_start_barrier = None
+
+
+def _init_worker(loader, barrier=None):
+    global _worker_model, _start_barrier
+    _worker_model = loader()
+    _start_barrier = barrier
+
+
+def _warm_up():
+    # Held until every worker has loaded its model, so no process can take a second warm-up call
+    if _start_barrier is not None:
+        _start_barrier.wait(WORKER_START_TIMEOUT)
+    return os.getpid()
+
+
+def _run_job(job, shm_name, shape, dtype, deadline, kwargs):
+    if time.time() > deadline:
+        raise InferenceDeadlineExceeded("request expired while queued")
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        try:
+            return job(_worker_model, array, **kwargs)
+        finally:
+            del array
+    finally:
+        shm.close()
+
+
+# --- Model loaders and jobs (run inside the workers) ---
+
+def load_audio_model():
+    from funasr import AutoModel
+    return AutoModel(model="iic/emotion2vec_plus_seed", hub="hf", device="cpu", disable_pbar=True)
+
+
+def load_video_engine():
+    from fer import FER
+    from video_emotion import VideoEmotionEngine
+    return VideoEmotionEngine(FER(mtcnn=True))
+
+
+def _emotion_scores(rec: dict) -> dict:
+    if rec and 'scores' in rec and 'labels' in rec:
+        return dict(zip(rec['labels'], rec['scores']))
+    return {}
+
+
+def audio_emotion_job(model, pcm: np.ndarray, rate: int) -> dict:
+    # emotion2vec accepts waveforms directly and resamples from `fs` itself
+    audio = pcm.astype(np.float32) / 32768.0
+    rec_result = model.generate(input=audio, fs=rate, granularity="utterance")
+    return _emotion_scores(rec_result[0]) if rec_result else {}
+
+
+def audio_emotion_batch_job(model, packed: np.ndarray, offsets: list, rate: int) -> list:
+    audio = packed.astype(np.float32) / 32768.0
+    clips = [audio[start:end] for start, end in offsets]
+    rec_result = model.generate(input=clips, fs=rate, granularity="utterance", batch_size=len(clips))
+    return [_emotion_scores(rec) for rec in rec_result]
+
+
+def video_emotion_job(engine, packed: np.ndarray, offsets: list) -> list:
+    frames = [packed[start:end] for start, end in offsets]
+    return engine.analyze(frames)
+
+
+def pack_clips(clips: list):
+    """Concatenate PCM sample arrays into one buffer plus (start, end) offsets."""
+    offsets = []
+    position = 0
+    for clip in clips:
+        offsets.append((position, position + len(clip)))
+        position += len(clip)
+    return np.concatenate(clips) if clips else np.empty(0, np.int16), offsets
+
+
+def pack_frames(frames: list):
+    """Concatenate encoded frames into one buffer plus (start, end) offsets."""
+    offsets = []
+    position = 0
+    for frame in frames:
+        offsets.append((position, position + len(frame)))
+        position += len(frame)
+    packed = np.empty(position, dtype=np.uint8)
+    for frame, (start, end) in zip(frames, offsets):
+        packed[start:end] = np.frombuffer(frame, dtype=np.uint8)
+    return packed, offsets
+
+
+# --- Parent process side ---
+
+class ModelWorkerPool:
+    """
+    A fixed set of pre-warmed processes that each hold one copy of a model.
+
+    Requests carry a NumPy buffer that is handed over through shared memory
+    rather than pickled, wait for one of `queue_size` slots (backpressure),
+    and fail with InferenceQueueFull / InferenceDeadlineExceeded instead of
+    piling up once their deadline has passed. A worker that dies breaks the
+    whole executor: requests then fail with BrokenProcessPool until
+    `restart` replaces it.
+    """
+
+    def __init__(self, name: str, loader, workers: int, queue_size: int = INFERENCE_QUEUE_SIZE):
+        self.name = name
+        self.loader = loader
+        self.workers = workers
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self._executor = None
+        self._slots = None
+
+    @property
+    def ready(self) -> bool:
+        return self._executor is not None
+
+    async def start(self):
+        """Spawn the workers and wait until every one of them has loaded its model."""
+        if self._executor:
+            return
+        self._slots = asyncio.Semaphore(self.queue_size)
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.loader, context.Barrier(self.workers)),
+        )
+        # One warm-up call per worker; each blocks its process at the barrier, so every
+        # worker has to start and load its model before any call returns
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _warm_up) for _ in range(self.workers))
+        )
+        log.info(f"{self.name}: worker processes ready", model=self.name, workers=len(set(pids)))
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def restart(self):
+        """Replace the executor with freshly spawned workers, e.g. after BrokenProcessPool."""
+        self.shutdown()
+        await self.start()
+
+    async def infer(self, job, array: np.ndarray, deadline: float = None, **kwargs):
+        """Run `job(model, array, **kwargs)` in a worker and return its result."""
+        if not self._executor:
+            raise RuntimeError(f"{self.name} worker pool is not started")
+        deadline = deadline or time.time() + INFERENCE_DEADLINE
+
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(0.0, deadline - time.time()))
+        except asyncio.TimeoutError:
+            INFERENCE_FAILURES.inc(model=self.name, reason="queue_full")
+            raise InferenceQueueFull(f"{self.name} queue is full")
+        self.in_flight += 1
+        started_at = time.perf_counter()
+        INFERENCE_SECONDS.observe(started_at - queued_at, model=self.name, phase="queue")
+
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+
+        loop = asyncio.get_running_loop()
+        slots = self._slots
+
+        def release(_):
+            # Runs when the worker is really done, even if the caller stopped waiting;
+            # the slot goes back to the executor it came from, even after a restart
+            shm.close()
+            shm.unlink()
+            loop.call_soon_threadsafe(self._release_slot, slots)
+
+        try:
+            future = self._executor.submit(
+                _run_job, job, shm.name, array.shape, array.dtype.str, deadline, kwargs
+            )
+        except BrokenProcessPool:
+            release(None)
+            INFERENCE_FAILURES.inc(model=self.name, reason="broken")
+            raise
+        except Exception:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=max(0.0, deadline - time.time())
+            )
+        except asyncio.TimeoutError:
+            INFERENCE_FAILURES.inc(model=self.name, reason="deadline")
+            raise InferenceDeadlineExceeded(f"{self.name} request missed its deadline")
+        except InferenceDeadlineExceeded:
+            INFERENCE_FAILURES.inc(model=self.name, reason="deadline")
+            raise
+        except BrokenProcessPool:
+            INFERENCE_FAILURES.inc(model=self.name, reason="broken")
+            raise
+        INFERENCE_SECONDS.observe(time.perf_counter() - started_at, model=self.name, phase="run")
+        return result
+
+    def _release_slot(self, slots):
+        self.in_flight -= 1
+        slots.release()
+
+
+class AudioEmotionBatcher:
+    """
+    Groups clips from concurrent turns into a single emotion2vec `generate`
+    call. The first clip opens a short batching window; the batch is sent to
+    the audio pool when the window closes or `max_batch` clips are waiting.
+    If the batched call fails, its clips are retried one by one so a single
+    bad clip only fails its own turn.
+    """
+
+    def __init__(self, pool: ModelWorkerPool, rate: int, window: float = AUDIO_BATCH_WINDOW,
+                 max_batch: int = AUDIO_MAX_BATCH):
+        self.pool = pool
+        self.rate = rate
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_handle = None
+        self._running = set()
+
+    async def infer(self, pcm: np.ndarray, deadline: float = None) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((pcm, deadline or time.time() + INFERENCE_DEADLINE, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list):
+        packed, offsets = pack_clips([pcm for pcm, _, _ in batch])
+        try:
+            results = await self.pool.infer(
+                audio_emotion_batch_job, packed,
+                deadline=min(deadline for _, deadline, _ in batch),
+                offsets=offsets, rate=self.rate,
+            )
+        except (InferenceQueueFull, InferenceDeadlineExceeded, BrokenProcessPool) as e:
+            # The pool, not a clip, is at fault: running the clips one by one would fail too
+            results = [e] * len(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                results = [e]
+            else:
+                # One bad clip fails the whole generate call; give each clip its own result
+                log.warning("Audio emotion batch failed, retrying clips one by one",
+                            clips=len(batch), error=str(e))
+                results = await asyncio.gather(
+                    *(self.pool.infer(audio_emotion_job, pcm, deadline=deadline, rate=self.rate)
+                      for pcm, deadline, _ in batch),
+                    return_exceptions=True,
+                )
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,177 @@
+# moderation.py
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+
+from logs import get_logger
+
+log = get_logger("moderation")
+
+TOXICITY_THRESHOLD = 0.7         # scores above this keep a journal private
+# Perspective's default quota is one request per second
+PERSPECTIVE_QPS = float(os.environ.get("COSMOS_PERSPECTIVE_QPS", 1.0))
+PERSPECTIVE_BURST = int(os.environ.get("COSMOS_PERSPECTIVE_BURST", 1))
+MODERATION_CACHE_SIZE = 10000    # content hashes whose score is remembered
+TOXIC_TERM_HITS = 2              # strong-lexicon hits that make a text clearly toxic without asking Perspective
+SAFE_TEXT_WORDS = 12             # longest text the lexicon may pass as clean on its own
+
+# Lexicon entries are regex fragments matched as whole words (plus plural/verb
+# endings); `\w*` marks a stem. Clearly abusive terms: one hit alone is
+# ambiguous ("what a shit day"), several are not.
+STRONG_TERMS = (
+    r"fuck\w*", r"shit\w*", r"bitch\w*", "bastard", r"asshole", "cunt", "dick", "slut", "whore",
+    r"retard\w*", r"fag\w*", r"nigg\w*", r"motherf\w*", r"wank\w*", "twat", "prick",
+)
+# Words that can be hostile, violent, sexual or about self-harm depending on context:
+# any hit sends the text to Perspective instead of passing it as clearly clean.
+WATCH_TERMS = (
+    "idiot", "stupid", "dumb", "moron", "loser", "ugly", "hate", "kill", "die", "dead",
+    "murder", "shoot", "stab", "hurt", r"suicid\w*", "worthless", "pathetic", r"disgust\w*", "trash",
+    "freak", "creep", "scum", "shut up", "crap", "damn", "hell", "piss", "sex", "nude", r"racis\w*",
+    "end my life",
+)
+# Everyday words a short text may consist of and still pass as clean without Perspective;
+# any other word leaves the verdict to Perspective.
+SAFE_WORDS = frozenset("""
+    a an the and or but so to of in on at for with from by about today tonight yesterday tomorrow
+    morning afternoon evening night day week weekend i im i'm me my we our us it it's its is am are
+    was were be been feel feeling felt good great fine okay ok nice happy calm grateful thankful
+    proud relaxed rested better well glad excited peaceful hopeful lovely fun really very much
+    little bit quite pretty had have has did do went go going walk walked slept sleep ate cooked
+    worked studied finished started tried learned made saw met friends friend family mom dad sister
+    brother dog cat home school work class book music movie coffee tea dinner lunch breakfast sunny
+    weather park beach river time first this that thanks thank hello hi hey yes again too also lot
+""".split())
+
+_SUFFIX = r"(?:s|es|d|ed|ing|er|ers|y)?\b"
+_STRONG = re.compile(r"\b(?:" + "|".join(STRONG_TERMS) + ")" + _SUFFIX)
+_WATCH = re.compile(r"\b(?:" + "|".join(WATCH_TERMS) + ")" + _SUFFIX)
+_LEET = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s", "!": "i"})
+# Substitutions are only undone between letters, so "sh1t" reads "shit" but "idiot!" stays "idiot!"
+_IN_WORD_LEET = re.compile(r"(?<=[^\W\d_])[013457@$!]+(?=[^\W\d_])")
+_WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+
+def normalize(text: str) -> str:
+    """Casefold, undo common in-word character substitutions and collapse whitespace."""
+    text = _IN_WORD_LEET.sub(lambda m: m.group().translate(_LEET), text.casefold())
+    return " ".join(text.split())
+
+
+def prefilter(normalized: str):
+    """
+    1.0 for clearly toxic text, 0.0 for a short text made only of SAFE_WORDS,
+    None for everything else, which Perspective decides.
+    """
+    if len(_STRONG.findall(normalized)) >= TOXIC_TERM_HITS:
+        return 1.0
+    if _STRONG.search(normalized) or _WATCH.search(normalized):
+        return None
+    words = _WORD.findall(normalized)
+    if words and len(words) <= SAFE_TEXT_WORDS and all(word in SAFE_WORDS for word in words):
+        return 0.0
+    return None
+
+
+class ModerationResult:
+    """A toxicity score and where it came from. `score` is None if it could not be determined."""
+
+    def __init__(self, score, source: str):
+        self.score = score
+        self.source = source
+
+    def toxic(self, threshold: float = TOXICITY_THRESHOLD) -> bool:
+        # Fail closed: an unscored text is treated as toxic
+        return self.score is None or self.score > threshold
+
+
+class RateLimiter:
+    """Token bucket; waiters are served in arrival order."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+
+
+class Moderator:
+    """
+    Scores text in stages, cheapest first: the local lexicon pre-filter,
+    then a cache of earlier scores by content hash, then Perspective. The
+    Perspective call is rate limited, and concurrent requests for the same
+    text share a single call.
+    """
+
+    def __init__(self, upstream, api_key: str, url: str, qps: float = PERSPECTIVE_QPS,
+                 burst: int = PERSPECTIVE_BURST, cache_size: int = MODERATION_CACHE_SIZE):
+        self.upstream = upstream
+        self.api_key = api_key
+        self.url = url
+        self.cache_size = cache_size
+        self.limiter = RateLimiter(qps, burst)
+        self.counts = {"lexicon_clean": 0, "lexicon_toxic": 0, "cache": 0, "coalesced": 0,
+                       "perspective": 0, "failed": 0}
+        self._cache = OrderedDict()
+        self._in_flight = {}
+
+    async def score(self, text: str) -> ModerationResult:
+        normalized = normalize(text)
+        verdict = prefilter(normalized)
+        if verdict is not None:
+            self.counts["lexicon_toxic" if verdict else "lexicon_clean"] += 1
+            return ModerationResult(verdict, "lexicon")
+
+        key = hashlib.sha256(normalized.encode()).hexdigest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.counts["cache"] += 1
+            return ModerationResult(cached, "cache")
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.counts["coalesced"] += 1
+            return await asyncio.shield(pending)
+        pending = asyncio.ensure_future(self._ask_perspective(key, text))
+        self._in_flight[key] = pending
+        pending.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _ask_perspective(self, key: str, text: str) -> ModerationResult:
+        payload = {
+            "comment": {"text": text},
+            "languages": ["en"],
+            "requestedAttributes": {"TOXICITY": {}},
+        }
+        try:
+            await self.limiter.acquire()
+            self.counts["perspective"] += 1
+            resj = await self.upstream.post_json(self.url, payload, params={"key": self.api_key})
+            score = resj["attributeScores"]["TOXICITY"]["summaryScore"]["value"]
+        except Exception as e:
+            self.counts["failed"] += 1
+            log.warning("Perspective API call failed", error=str(e))
+            return ModerationResult(None, "unavailable")
+        self._cache[key] = score
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return ModerationResult(score, "perspective")
+
+    def stats(self) -> dict:
+        return {**self.counts, "cache_entries": len(self._cache), "in_flight": len(self._in_flight)}
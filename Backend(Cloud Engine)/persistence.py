@@ -0,0 +1,130 @@
+# persistence.py
+import asyncio
+import random
+import threading
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import AlreadyExists
+
+from logs import get_logger
+
+log = get_logger("persistence")
+
+WRITE_BEHIND_WORKERS = 4      # Firestore commits in flight at once
+WRITE_BEHIND_QUEUE_SIZE = 1000  # pending writes before submitters wait for room
+WRITE_MAX_ATTEMPTS = 4
+WRITE_RETRY_BASE_DELAY = 0.25  # seconds; doubled (with jitter) on every retry
+WRITE_DRAIN_TIMEOUT = 10.0     # seconds shutdown waits for pending writes
+
+
+class WriteBehindQueue:
+    """
+    Runs Firestore writes off the response path. Each write is a blocking
+    callable executed on a worker thread, retried with jittered backoff up
+    to WRITE_MAX_ATTEMPTS times; `on_failure` runs if every attempt fails.
+    """
+
+    def __init__(self, workers: int = WRITE_BEHIND_WORKERS, queue_size: int = WRITE_BEHIND_QUEUE_SIZE,
+                 max_attempts: int = WRITE_MAX_ATTEMPTS, base_delay: float = WRITE_RETRY_BASE_DELAY):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.written = 0
+        self.retries = 0
+        self.failed = 0
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, name: str, write, on_failure=None):
+        """Queue `write` (a no-argument blocking callable); waits only if the queue is full."""
+        await self._queue.put((name, write, on_failure))
+
+    async def drain(self, timeout: float = WRITE_DRAIN_TIMEOUT):
+        """Give pending writes a chance to land, then stop the workers."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("Write-behind: writes still pending at shutdown", pending=self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            name, write, on_failure = await self._queue.get()
+            try:
+                await self._run(name, write, on_failure)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, name, write, on_failure):
+        for attempt in range(self.max_attempts):
+            try:
+                await asyncio.to_thread(write)
+                self.written += 1
+                return
+            except Exception as e:
+                if attempt == self.max_attempts - 1:
+                    self.failed += 1
+                    log.error("Write-behind: giving up", write=name, attempts=self.max_attempts, error=str(e))
+                    if on_failure is not None:
+                        on_failure()
+                    return
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, self.base_delay * (2 ** attempt)))
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+
+class UserBootstrap:
+    """
+    Creates each user's document at most once per process. `create()` is
+    idempotent on the Firestore side (AlreadyExists counts as success), so
+    there is no read before the write and no race between two connections.
+    """
+
+    def __init__(self, db, collection: str):
+        self.db = db
+        self.collection = collection
+        self._known = set()
+        self._lock = threading.Lock()
+
+    def claim(self, user_id: str) -> bool:
+        """True if the caller should create the document; False if it exists or is being created."""
+        with self._lock:
+            if user_id in self._known:
+                return False
+            self._known.add(user_id)
+            return True
+
+    def forget(self, user_id: str):
+        """Undo a claim whose write failed so the next request tries again."""
+        with self._lock:
+            self._known.discard(user_id)
+
+    def create(self, user_id: str):
+        try:
+            self.db.collection(self.collection).document(user_id).create({
+                "created_at": datetime.now(timezone.utc),
+                "user_id": user_id,
+            })
+            log.info("Created user document", user_id=user_id)
+        except AlreadyExists:
+            pass
+
+    async def ensure(self, user_id: str, writer: WriteBehindQueue):
+        """Schedule the create-if-absent on the write-behind queue (once per user per process)."""
+        if self.claim(user_id):
+            await writer.submit(f"user {user_id}", lambda: self.create(user_id),
+                                on_failure=lambda: self.forget(user_id))
@@ -0,0 +1,250 @@
+# prompt_engine.py
+import asyncio
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from logs import get_logger
+
+log = get_logger("prompt_engine")
+
+PROMPT_HISTORY_MESSAGES = 20       # messages read per turn (the history cache holds this many)
+PROMPT_RECENT_MESSAGES = 4         # at most this many are sent verbatim...
+PROMPT_RECENT_TOKENS = 500         # ...and only as many as fit in this budget
+SUMMARY_BATCH_MESSAGES = 6         # older unsummarized messages that trigger a summary refresh
+PROMPT_OVERFLOW_TOKENS = 1000      # older messages the summary does not cover yet are sent verbatim within this
+SUMMARY_MAX_TOKENS = 250
+SUMMARY_CACHE_MAX_USERS = 2000
+CHARS_PER_TOKEN = 4                # rough estimate for English text, good enough for budgeting
+
+# Sent once per request as systemInstruction; never rebuilt per turn
+POLARIS_INSTRUCTION = """You are Polaris, an empathetic conversational agent and wellness companion. You blend the qualities of a therapist and close friend.
+
+CORE GUIDELINES:
+- Always prioritize the emotion expressed in the text
+- Be warm, understanding, and naturally conversational
+- Intelligently decide when conversation history is relevant to the current question - use it when it helps provide better context, ignore it when it doesn't relate to the current input
+- If video and audio emotions differ from text, blend them subtly without mentioning the mismatch
+- Adjust response length proportionally to user input - keep it short for basic questions and expand only when the topic truly demands more comprehensive coverage
+- Paraphrase rather than repeat the user's exact words
+- No emojis
+
+Each user turn ends with an analysis of the current input (text plus detected video and audio emotion). Respond naturally as Polaris, keeping your response conversational and supportive."""
+
+SUMMARY_INSTRUCTION = f"""You maintain a running summary of a conversation between a user and Polaris, a wellness companion.
+Merge the new messages into the existing summary. Keep what matters for future conversations: the user's situation, recurring feelings, people and events they mention, goals, and advice already given.
+Write in the third person, plain prose, under {SUMMARY_MAX_TOKENS * 3 // 4} words. Output only the summary."""
+
+GENERATION_CONFIG = {"temperature": 0.8, "maxOutputTokens": 4000}
+SUMMARY_GENERATION_CONFIG = {"temperature": 0.2, "maxOutputTokens": SUMMARY_MAX_TOKENS}
+
+EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _timestamp(message):
+    value = message.get("timestamp")
+    return value if isinstance(value, datetime) else EPOCH
+
+
+def newest_within(messages, max_tokens, max_messages=None):
+    """The newest run of chronological `messages` that fits the budgets (always at least one)."""
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        cost = estimate_tokens(message["text"])
+        if len(kept) == max_messages or (kept and used + cost > max_tokens):
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def split_history(messages, covered_until=EPOCH, max_messages=PROMPT_RECENT_MESSAGES,
+                  max_tokens=PROMPT_RECENT_TOKENS):
+    """
+    Split chronological messages into (recent, overflow): `recent` is the
+    newest run that fits the message and token budgets, `overflow` the
+    older messages not yet folded into the summary.
+    """
+    unsummarized = [m for m in messages if _timestamp(m) > covered_until and m.get("text", "").strip()]
+    recent = newest_within(unsummarized, max_tokens, max_messages)
+    return recent, unsummarized[:len(unsummarized) - len(recent)]
+
+
+def _role(message):
+    return "model" if message.get("sender") == "ai" else "user"
+
+
+def _contents(turns):
+    """Gemini contents from (role, text) pairs: starting with a user turn and alternating roles."""
+    contents = []
+    for role, text in turns:
+        if not contents and role == "model":
+            continue
+        if contents and contents[-1]["role"] == role:
+            contents[-1]["parts"].append({"text": text})
+        else:
+            contents.append({"role": role, "parts": [{"text": text}]})
+    return contents
+
+
+def current_input_text(input_json: dict) -> str:
+    return f"""CURRENT INPUT ANALYSIS:
+- Text: "{input_json.get('text_input', '')}"
+- Video emotion detected: {input_json.get('video_emotion') or 'none'}
+- Audio emotion detected: {input_json.get('audio_emotion') or 'none'}"""
+
+
+class PromptHistory:
+    """
+    What a turn's prompt knows of the past: the rolling summary, the recent
+    messages and the older ones the summary does not cover yet.
+    """
+
+    def __init__(self, summary: str = "", recent=(), overflow=()):
+        self.summary = summary
+        self.recent = list(recent)
+        self.overflow = list(overflow)
+
+
+def build_payload(input_json: dict, history: PromptHistory) -> dict:
+    """The generateContent request for one Polaris turn."""
+    turns = []
+    if history.summary:
+        turns.append(("user", f"SUMMARY OF OUR EARLIER CONVERSATIONS:\n{history.summary}"))
+    # Until the summary folds them in, overflow messages are sent as they are, as far as the budget allows
+    overflow = newest_within(history.overflow, PROMPT_OVERFLOW_TOKENS) if history.overflow else []
+    turns.extend((_role(m), m["text"]) for m in overflow + history.recent)
+    turns.append(("user", current_input_text(input_json)))
+    return {
+        "systemInstruction": {"parts": [{"text": POLARIS_INSTRUCTION}]},
+        "contents": _contents(turns),
+        "generationConfig": GENERATION_CONFIG,
+    }
+
+
+def build_summary_payload(previous: str, messages) -> dict:
+    transcript = "\n".join(f"{m.get('sender', 'user').upper()}: {m['text']}" for m in messages)
+    return {
+        "systemInstruction": {"parts": [{"text": SUMMARY_INSTRUCTION}]},
+        "contents": [{"role": "user", "parts": [{"text": (
+            f"EXISTING SUMMARY:\n{previous or '(none)'}\n\nNEW MESSAGES:\n{transcript}"
+        )}]}],
+        "generationConfig": SUMMARY_GENERATION_CONFIG,
+    }
+
+
+class SummaryStore:
+    """
+    Rolling conversation summaries, stored per user next to the messages
+    at users/{user_id}/conversation_state/summary and kept in memory after
+    the first read.
+    """
+
+    def __init__(self, max_users: int = SUMMARY_CACHE_MAX_USERS):
+        self.max_users = max_users
+        self._entries = OrderedDict()  # user_id -> {"text", "covered_until", "messages"}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ref(conv_manager):
+        return conv_manager.convo_ref.parent.collection("conversation_state").document("summary")
+
+    def get(self, conv_manager) -> dict:
+        user_id = conv_manager.user_id
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                return entry
+        try:
+            snapshot = self._ref(conv_manager).get()
+            data = snapshot.to_dict() if snapshot.exists else {}
+        except Exception as e:
+            # Answer without a summary this turn and try the read again next turn
+            log.warning("Failed to read conversation summary", user_id=user_id, error=str(e))
+            return {"text": "", "covered_until": EPOCH, "messages": 0}
+        entry = {
+            "text": data.get("text", ""),
+            "covered_until": data.get("covered_until") or EPOCH,
+            "messages": data.get("messages", 0),
+        }
+        self._remember(user_id, entry)
+        return entry
+
+    def put(self, conv_manager, entry: dict):
+        self._ref(conv_manager).set({**entry, "updated_at": datetime.now(timezone.utc)})
+        self._remember(conv_manager.user_id, entry)
+
+    def _remember(self, user_id, entry):
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+
+class PromptEngine:
+    """
+    Builds Polaris prompts from a token-budgeted window of recent messages
+    plus a rolling summary of everything older, and refreshes that summary
+    in the background once enough messages have fallen out of the window.
+    """
+
+    def __init__(self, upstream, url: str, store: SummaryStore = None,
+                 batch_messages: int = SUMMARY_BATCH_MESSAGES):
+        self.upstream = upstream
+        self.url = url
+        self.store = store or SummaryStore()
+        self.batch_messages = batch_messages
+        self.summaries = 0
+        self.failures = 0
+        self._refreshing = set()
+
+    def history(self, conv_manager) -> PromptHistory:
+        """Blocking: reads the summary and recent messages (usually from memory)."""
+        summary = self.store.get(conv_manager)
+        messages = conv_manager.get_last_messages(limit=PROMPT_HISTORY_MESSAGES)
+        recent, overflow = split_history(messages, summary["covered_until"])
+        return PromptHistory(summary["text"], recent, overflow)
+
+    async def refresh(self, conv_manager):
+        """Fold messages that no longer fit the recent window into the user's summary."""
+        user_id = conv_manager.user_id
+        if user_id in self._refreshing:
+            return
+        self._refreshing.add(user_id)
+        try:
+            history = await asyncio.to_thread(self.history, conv_manager)
+            if len(history.overflow) < self.batch_messages:
+                return
+            summary = self.store.get(conv_manager)
+            payload = build_summary_payload(summary["text"], history.overflow)
+            resj = await self.upstream.post_json(self.url, payload)
+            text = resj["candidates"][0]["content"]["parts"][0]["text"].strip()
+            entry = {
+                "text": text,
+                "covered_until": _timestamp(history.overflow[-1]),
+                "messages": summary["messages"] + len(history.overflow),
+            }
+            await asyncio.to_thread(self.store.put, conv_manager, entry)
+            self.summaries += 1
+        except Exception as e:
+            # The messages stay in the overflow and are folded in on a later turn
+            self.failures += 1
+            log.warning("Conversation summary refresh failed", user_id=user_id, error=str(e))
+        finally:
+            self._refreshing.discard(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "summaries": self.summaries,
+            "failures": self.failures,
+            "refreshing": len(self._refreshing),
+        }
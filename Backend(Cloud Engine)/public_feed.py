@@ -0,0 +1,156 @@
+# public_feed.py
+import bisect
+import threading
+import uuid
+
+from google.cloud.firestore import Query
+
+from journal_pages import encode_position, parse_cursor, shape_journal
+
+PUBLIC_FEED_COLLECTION = "public_feed"
+PUBLIC_FEED_SIZE = 2000  # newest public journals mirrored in memory; older pages are read from Firestore
+
+
+def feed_entry(journal_ref, data: dict) -> dict:
+    """The denormalized copy of a public journal kept in PUBLIC_FEED_COLLECTION."""
+    return {
+        "journal_id": journal_ref.id,
+        "user_id": journal_ref.parent.parent.id,
+        "path": journal_ref.path,
+        "title": data.get("title"),
+        "content": data.get("content"),
+        "visibility": "public",
+        "timestamp": data["timestamp"],
+    }
+
+
+def feed_document_id(journal_ref) -> str:
+    return f"{journal_ref.parent.parent.id}_{journal_ref.id}"
+
+
+class FeedPage:
+    def __init__(self, body: dict, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+class PublicFeed:
+    """
+    An in-memory mirror of the newest public journals, kept current by a
+    Firestore snapshot listener on PUBLIC_FEED_COLLECTION. Reads are a
+    binary search plus one page of dict building, and every change to the
+    feed bumps the version the ETag is derived from.
+    """
+
+    def __init__(self, size: int = PUBLIC_FEED_SIZE):
+        self.size = size
+        self.version = 0
+        self.hits = 0
+        self.not_modified = 0
+        self.fallbacks = 0
+        self._epoch = uuid.uuid4().hex[:8]  # ETags from another process never match ours
+        self._entries = ()    # oldest first, ordered by (timestamp, path)
+        self._keys = ()
+        self._by_id = {}
+        self._watch = None
+        self._received = False
+        self._lock = threading.Lock()
+
+    def start(self, db):
+        query = (
+            db.collection(PUBLIC_FEED_COLLECTION)
+              .order_by("timestamp", direction=Query.DESCENDING)
+              .order_by("path", direction=Query.DESCENDING)  # same tie-break as the journal cursors
+              .limit(self.size)
+        )
+        self._watch = query.on_snapshot(self._on_snapshot)
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    @property
+    def ready(self) -> bool:
+        return self._received and self._watch is not None and getattr(self._watch, "is_active", True)
+
+    @property
+    def etag(self) -> str:
+        return f'W/"feed-{self._epoch}-{self.version}"'
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # Runs on the listener's thread. Only changed documents are re-read into
+        # entries; the ordering comes straight from the snapshot.
+        with self._lock:
+            for change in changes:
+                if change.type.name == "REMOVED":
+                    self._by_id.pop(change.document.id, None)
+                else:
+                    self._by_id[change.document.id] = change.document.to_dict()
+            entries = [self._by_id[doc.id] for doc in reversed(docs) if doc.id in self._by_id]
+            self._by_id = {doc.id: self._by_id[doc.id] for doc in docs if doc.id in self._by_id}
+            self._entries = tuple(entries)
+            self._keys = tuple((e["timestamp"], e["path"]) for e in entries)
+            self.version += 1
+            self._received = True
+
+    def page(self, limit: int, start_after: str = None, fields: tuple = ()) -> FeedPage:
+        """
+        One page, newest first, in the same shape and cursor format as the
+        Firestore-backed listing. Returns None when the mirror cannot answer
+        (no snapshot yet, or the page reaches past the mirrored window).
+        """
+        if not self.ready:
+            self.fallbacks += 1
+            return None
+        with self._lock:
+            entries, keys, etag = self._entries, self._keys, self.etag
+        end = bisect.bisect_left(keys, parse_cursor(start_after)) if start_after else len(entries)
+        start = max(0, end - limit)
+        if start == 0 and len(entries) >= self.size and end - start < limit:
+            # Older journals exist beyond the mirrored window
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        page = entries[start:end][::-1]
+        journals = [shape_journal(e, e["journal_id"], e["user_id"], fields) for e in page]
+        next_cursor = encode_position(page[-1]["timestamp"], page[-1]["path"]) if len(page) == limit else None
+        body = {"journals": journals, "count": len(journals), "next_cursor": next_cursor, "success": True}
+        return FeedPage(body, etag)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "entries": len(self._entries),
+            "version": self.version,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def backfill(db, user_collection: str = "users", batch_size: int = 400) -> int:
+    """Copy every existing public journal into PUBLIC_FEED_COLLECTION (one-off migration)."""
+    feed = db.collection(PUBLIC_FEED_COLLECTION)
+    batch, pending, copied = db.batch(), 0, 0
+    for doc in db.collection_group("journals").where("visibility", "==", "public").stream():
+        if doc.reference.parent.parent.parent.id != user_collection:
+            continue
+        batch.set(feed.document(feed_document_id(doc.reference)), feed_entry(doc.reference, doc.to_dict()))
+        pending += 1
+        if pending == batch_size:
+            batch.commit()
+            copied += pending
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+        copied += pending
+    return copied
+
+
+if __name__ == "__main__":
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    firebase_admin.initialize_app(credentials.Certificate("response_credentials.json"))
+    print(f"Copied {backfill(firestore.client())} public journals into {PUBLIC_FEED_COLLECTION}")
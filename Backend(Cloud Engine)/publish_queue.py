@@ -0,0 +1,125 @@
+# publish_queue.py
+import asyncio
+import random
+from collections import OrderedDict
+
+from logs import get_logger
+
+log = get_logger("publish_queue")
+
+PENDING_VISIBILITY = "pending"  # stored on a journal until moderation settles its visibility
+PUBLISH_WORKERS = 4
+PUBLISH_QUEUE_SIZE = 500        # beyond this, /journal moderates inline instead of queueing
+PUBLISH_MAX_ATTEMPTS = 3
+PUBLISH_RETRY_BASE_DELAY = 0.5
+PUBLISH_STATES_KEPT = 5000      # finished jobs whose outcome can still be polled from memory
+PUBLISH_WAIT_TIMEOUT = 60.0     # seconds a status subscriber waits for a pending journal
+
+
+class PublishJob:
+    def __init__(self, user_id: str, journal_id: str, title: str, content: str, requested_visibility: str,
+                 timestamp=None):
+        self.user_id = user_id
+        self.journal_id = journal_id
+        self.title = title
+        self.content = content
+        self.requested_visibility = requested_visibility
+        self.timestamp = timestamp
+
+
+class PublishQueue:
+    """
+    Finishes journals accepted as pending: a pool of workers runs
+    `process(job)` (moderate, then write the final visibility; returns it)
+    with bounded retries, and records each outcome so clients can poll for
+    it or wait on it.
+    """
+
+    def __init__(self, process, workers: int = PUBLISH_WORKERS, queue_size: int = PUBLISH_QUEUE_SIZE,
+                 max_attempts: int = PUBLISH_MAX_ATTEMPTS, states_kept: int = PUBLISH_STATES_KEPT):
+        self.process = process
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.states_kept = states_kept
+        self.finished = 0
+        self.failed = 0
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._states = OrderedDict()  # journal_id -> {"status", "final_visibility"}
+        self._done_events = {}
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job: PublishJob) -> bool:
+        """Queue a job; False if the queue is full and the caller should finish it inline."""
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return False
+        self._set_state(job.journal_id, {"status": "pending", "final_visibility": None})
+        self._done_events[job.journal_id] = asyncio.Event()
+        return True
+
+    def status(self, journal_id: str):
+        """The in-memory state of a job, or None if this process does not know it."""
+        state = self._states.get(journal_id)
+        return {"journal_id": journal_id, **state} if state else None
+
+    async def wait(self, journal_id: str, timeout: float):
+        """Wait until the job is no longer pending (or `timeout` passes) and return its state."""
+        event = self._done_events.get(journal_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.status(journal_id)
+
+    def _set_state(self, journal_id, state):
+        self._states[journal_id] = state
+        self._states.move_to_end(journal_id)
+        while len(self._states) > self.states_kept:
+            evicted, _ = self._states.popitem(last=False)
+            self._done_events.pop(evicted, None)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                state = await self._run(job)
+                self._set_state(job.journal_id, state)
+                event = self._done_events.pop(job.journal_id, None)
+                if event is not None:
+                    event.set()
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: PublishJob) -> dict:
+        for attempt in range(self.max_attempts):
+            try:
+                visibility = await self.process(job)
+                self.finished += 1
+                return {"status": "final", "final_visibility": visibility}
+            except Exception as e:
+                if attempt == self.max_attempts - 1:
+                    # The journal stays pending in Firestore and is picked up again on restart
+                    self.failed += 1
+                    log.error("Publishing journal failed", journal_id=job.journal_id, attempts=self.max_attempts, error=str(e))
+                    return {"status": "failed", "final_visibility": None}
+                await asyncio.sleep(random.uniform(0, PUBLISH_RETRY_BASE_DELAY * (2 ** attempt)))
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "pending": len(self._done_events),
+            "finished": self.finished,
+            "failed": self.failed,
+        }
@@ -0,0 +1,84 @@
+# response_pipeline.py
+import asyncio
+import re
+
+MIN_SENTENCE_CHARS = 24      # shorter fragments are merged into the next sentence for natural prosody
+TTS_CONCURRENCY_PER_TURN = 3  # sentences being synthesized at once for one reply
+
+_SENTENCE_END = re.compile(r"""(?<=[.!?])["')\]]*\s+""")
+
+
+class SentenceSplitter:
+    """Cuts a stream of text deltas into complete sentences as soon as they end."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> list:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+async def stream_response(text_stream, synthesize, send) -> str:
+    """
+    Pipelines a streamed reply into speech: every sentence is handed to
+    `synthesize` (async text -> audio bytes) as soon as it is complete, up to
+    TTS_CONCURRENCY_PER_TURN at a time, and each `response_chunk` is sent
+    through `send(message, audio, index)` in sentence order the moment its
+    audio is ready.
+    Returns the full reply text.
+    """
+    splitter = SentenceSplitter()
+    limiter = asyncio.Semaphore(TTS_CONCURRENCY_PER_TURN)
+    ready = asyncio.Queue()
+    parts = []
+    synth_tasks = []
+
+    async def synthesize_limited(sentence: str) -> bytes:
+        async with limiter:
+            return await synthesize(sentence)
+
+    def enqueue(sentence: str):
+        task = asyncio.create_task(synthesize_limited(sentence))
+        synth_tasks.append(task)
+        ready.put_nowait((sentence, task))
+
+    async def sender():
+        index = 0
+        while True:
+            item = await ready.get()
+            if item is None:
+                return
+            sentence, task = item
+            audio = await task
+            await send({"type": "response_chunk", "index": index, "text": sentence}, audio, index)
+            index += 1
+
+    sender_task = asyncio.create_task(sender())
+    try:
+        async for delta in text_stream:
+            parts.append(delta)
+            for sentence in splitter.feed(delta):
+                enqueue(sentence)
+        for sentence in splitter.flush():
+            enqueue(sentence)
+        ready.put_nowait(None)
+        await sender_task
+    finally:
+        for task in [sender_task, *synth_tasks]:
+            if not task.done():
+                task.cancel()
+    return "".join(parts).strip()
@@ -2,32 +2,66 @@ import asyncio
 import base64
 import json
 import os
-import time
-import uuid
 from collections import defaultdict
-import subprocess
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import aclosing, asynccontextmanager, suppress
 from datetime import datetime
 
-import cv2
-import numpy as np
-import requests
-from fer import FER
-from funasr import AutoModel
 from google.cloud import speech
 from google.oauth2 import service_account
-from google.auth.transport.requests import AuthorizedSession
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import soundfile as sf
 import firebase_admin
 from firebase_admin import credentials, firestore
-from google.cloud.firestore import Query
 
-from conversation_manager import ConversationManager
+from admission import PRIORITY_NEW, PRIORITY_SESSION, TurnAdmission, TurnRejected
+from audio_pipeline import AudioFrontEnd, DecodeError, PcmBuffer, iter_queue
+from conversation_manager import ConversationManager, conversation_versions, history_cache, use_firestore
+from framing import FRAME_VIDEO, FrameError, decode_frame
+from journal_pages import (
+    JOURNAL_PAGE_SIZE,
+    PageRequestError,
+    clamp_limit,
+    page_query,
+    parse_fields,
+    stream_page,
+)
+import logs
+from metrics import REGISTRY, Gauge, TurnTrace
+from model_workers import (
+    AUDIO_MODEL_WORKERS,
+    VIDEO_MODEL_WORKERS,
+    AudioEmotionBatcher,
+    InferenceDeadlineExceeded,
+    InferenceQueueFull,
+    ModelWorkerPool,
+    audio_emotion_job,
+    load_audio_model,
+    load_video_engine,
+    pack_frames,
+    video_emotion_job,
+)
+from persistence import UserBootstrap, WriteBehindQueue
+from prompt_engine import PromptEngine, PromptHistory, build_payload
+from model_router import ROUTER_DEADLINE, ModelRouter, NoModelAvailable
+from moderation import TOXICITY_THRESHOLD, Moderator
+from publish_queue import PENDING_VISIBILITY, PUBLISH_WAIT_TIMEOUT, PublishJob, PublishQueue
+from public_feed import PUBLIC_FEED_COLLECTION, PublicFeed, feed_document_id, feed_entry
+from response_pipeline import stream_response
+from sessions import Session, TurnInput
+from startup import Readiness
+from stt_engine import StreamingRecognizer
+from suggestion_cache import SuggestionCache
+from tts_cache import TtsCache
+from upstream import UpstreamClients
 
 # --- Configuration ---
-RATE = 48000
+AUDIO_EMOTION_BATCHING = True  # group concurrent turns' clips into one emotion2vec call
+SUGGESTION_PREFETCH = True  # generate the next journal suggestion in the background after each turn
+VIDEO_BATCH_FRAMES = 6  # video frames analysed together while an utterance is still arriving
+STT_MODE = "streaming"  # "streaming" pushes interim transcripts while chunked audio arrives; "batch" waits for the full clip
 SERVICE_ACCOUNT_FILE = "response_credentials.json"
 FIREBASE_CREDENTIALS_FILE = "response_credentials.json" 
 
@@ -35,17 +69,40 @@ SCOPES = [
     "https://www.googleapis.com/auth/cloud-platform",
     "https://www.googleapis.com/auth/generative-language"
 ]
+GEMINI_FLASH = "Gemini 1.5 Flash"
+GEMINI_PRO = "Gemini 1.5 Pro"
 GEMINI_FLASH_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
 GEMINI_PRO_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-pro:generateContent"
+GEMINI_FLASH_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:streamGenerateContent?alt=sse"
+SUGGESTION_FALLBACK = "Take a moment to reflect on what's bringing you joy today."
+GEMINI_FALLBACK_REPLY = "I'm sorry, I'm facing some technical difficulties connecting to my brain right now. Please try again in a moment."
 
 # Perspective API
 PERSPECTIVE_API_KEY = "<YOUR-API-KEY>"
-PERSPECTIVE_URL = "https://commentanalyzer.googleapis.com/v1alpha1/comments:analyze"
+# Point COSMOS_PERSPECTIVE_URL at a local stub (benchmarks/perspective_stub.py) to test offline
+PERSPECTIVE_URL = os.environ.get("COSMOS_PERSPECTIVE_URL", "https://commentanalyzer.googleapis.com/v1alpha1/comments:analyze")
+
+# Google Text-to-Speech (REST, so it shares the pooled HTTP client)
+TTS_URL = "https://texttospeech.googleapis.com/v1/text:synthesize"
+TTS_VOICE_CONFIG = {
+    "voice": {"languageCode": "en-US", "name": "en-US-Chirp3-HD-Algieba"},
+    "audioConfig": {
+        "audioEncoding": "LINEAR16",
+        "sampleRateHertz": 16000,
+        "speakingRate": 0.9,
+    },
+}
 
 # Dynamic user configuration
 USER_COLLECTION = "users"
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_services()
+    yield
+    await stop_services()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enhanced CORS middleware
 app.add_middleware(
@@ -88,93 +145,164 @@ class JournalRequest(BaseModel):
     user_id: str
 
 # --- Model and Services Initialization ---
-print("Initializing server and loading models...")
-try:
-    audio_model = AutoModel(model="iic/emotion2vec_plus_seed", hub="hf", device="cpu", disable_pbar=True)
-    video_detector = FER(mtcnn=True)
-    speech_client = speech.SpeechClient.from_service_account_file(SERVICE_ACCOUNT_FILE)
-    gcp_credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    authed_session = AuthorizedSession(gcp_credentials)
-    
+log = logs.get_logger("server")
+
+# Only plain client objects are built at import: model worker processes are spawned and
+# import this module again, so reading credentials, Firebase and logging setup wait for
+# connect_clients() in the lifespan hook, which then warms everything concurrently.
+# Every outbound HTTP call goes through one pooled client with per-upstream limits
+upstreams = UpstreamClients()
+gemini_upstream = upstreams.register("gemini", authenticated=True, max_concurrency=32, timeout=120, base_delay=1)
+# Routed turns: one attempt per request, since the router hedges and fails over itself
+gemini_routed_upstream = upstreams.register("gemini-routed", authenticated=True, max_concurrency=32,
+                                            timeout=ROUTER_DEADLINE, max_retries=1)
+tts_upstream = upstreams.register("tts", authenticated=True, max_concurrency=16, timeout=20)
+perspective_upstream = upstreams.register("perspective", max_concurrency=8, timeout=10)
+
+db = None  # the process's Firestore client, created by connect_clients()
+speech_client = None  # created by the lifespan hook
+
+# Turns are accepted once Firestore and Speech are up; the emotion models may still be warming
+readiness = Readiness(required=("firestore", "speech"))
+
+# Decodes once to AUDIO_RATE (16 kHz by default); STT and audio emotion share the result
+audio_front_end = AudioFrontEnd()
+
+# emotion2vec and FER each live in their own pool of worker processes so that
+# inference runs on separate cores instead of contending for this process's GIL
+audio_pool = ModelWorkerPool("audio-emotion", load_audio_model, AUDIO_MODEL_WORKERS)
+video_pool = ModelWorkerPool("video-emotion", load_video_engine, VIDEO_MODEL_WORKERS)
+audio_batcher = AudioEmotionBatcher(audio_pool, audio_front_end.rate)
+
+# Conversation turns and user documents are written to Firestore after the reply is sent
+write_behind = WriteBehindQueue()
+user_bootstrap = None  # created by connect_clients()
+
+# Flash first, Pro as the hedge and failover target
+model_router = ModelRouter(gemini_routed_upstream, [(GEMINI_FLASH, GEMINI_FLASH_URL), (GEMINI_PRO, GEMINI_PRO_URL)])
+
+# Static Polaris instructions, a token-budgeted recent window and a rolling per-user summary
+prompt_engine = PromptEngine(gemini_upstream, GEMINI_FLASH_URL)
+
+# Newest public journals, mirrored in memory by a Firestore listener
+public_feed = PublicFeed()
+
+# Fire-and-forget work must be referenced somewhere or the loop may drop it mid-flight
+background_tasks = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+def ping_firestore():
+    # Opens the gRPC channel and fetches a token before the first turn needs them
+    db.collection(USER_COLLECTION).limit(1).get()
+
+async def load_core_services():
+    global speech_client
+    speech_client, *_ = await asyncio.gather(
+        readiness.load("speech", speech.SpeechClient.from_service_account_file, SERVICE_ACCOUNT_FILE),
+        readiness.load("firestore", ping_firestore),
+        readiness.load("gcp_auth", upstreams.tokens.token),
+        # If the listener fails, /public_journals queries Firestore directly
+        readiness.load("public_feed", public_feed.start, db),
+    )
+    if readiness.ready("firestore"):
+        spawn_background(resume_pending_journals())
+    # The apology is spoken exactly when upstreams are struggling, so have it ready
+    spawn_background(query_google_tts(GEMINI_FALLBACK_REPLY))
+
+def connect_clients():
+    """Load the service account and create the Firebase app and Firestore client; nothing here calls the network."""
+    global db, user_bootstrap
+    upstreams.authenticate(
+        service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    )
     if not firebase_admin._apps:
         cred = credentials.Certificate(FIREBASE_CREDENTIALS_FILE)
         firebase_admin.initialize_app(cred)
+    # One Firestore client (and gRPC channel) for the process, shared with ConversationManager
     db = firestore.client()
-    print("Firebase connected.")
-except Exception as e:
-    print(f"Critical error during initialization: {e}")
-    exit()
-print("Server ready.")
+    use_firestore(db)
+    user_bootstrap = UserBootstrap(db, USER_COLLECTION)
+
+async def start_services():
+    """Start everything at once and return without waiting, so the server can answer /ready right away."""
+    # COSMOS_LOG_FORMAT=json switches every log line to one JSON object
+    logs.configure()
+    log.info("Starting services")
+    connect_clients()
+    readiness.expect("speech", "firestore", "gcp_auth", "public_feed", "audio_emotion", "video_emotion")
+    write_behind.start()
+    publish_queue.start()
+    spawn_background(load_core_services())
+    # emotion2vec and FER take the longest; turns skip them until they are ready
+    spawn_background(readiness.load("audio_emotion", audio_pool.start))
+    spawn_background(readiness.load("video_emotion", video_pool.start))
+
+def recover_pool(name: str, pool: ModelWorkerPool, error: Exception):
+    """A worker process died and broke `pool`: report it on /ready and respawn the workers."""
+    if not readiness.ready(name):
+        # Another turn already noticed and the restart is under way
+        return
+    readiness.fail(name, error)
+    spawn_background(readiness.load(name, pool.restart))
+
+async def stop_services():
+    audio_pool.shutdown()
+    video_pool.shutdown()
+    public_feed.stop()
+    await publish_queue.stop()
+    await write_behind.drain()
+    await audio_front_end.close()
+    await upstreams.aclose()
 
 # --- Helper Functions ---
 
-def ensure_user_exists(user_id: str):
+async def ensure_user_exists(user_id: str):
     """Ensure a user document exists - only store user_id and creation timestamp"""
+    await user_bootstrap.ensure(user_id, write_behind)
+
+async def persist_turn(conv_manager: ConversationManager, user_text: str, ai_text: str):
+    """Update the history cache now and queue the turn's two messages as one Firestore batch."""
+    staged = conv_manager.stage_turn(user_text, ai_text)
+    # If the batch never lands, the cached history would show messages Firestore lacks
+    await write_behind.submit(f"turn for {conv_manager.user_id}", staged.commit, on_failure=staged.discard)
+    # Messages pushed out of the prompt window are folded into the rolling summary
+    spawn_background(prompt_engine.refresh(conv_manager))
+
+async def convert_webm_to_pcm(webm_data: bytes) -> PcmBuffer:
+    """Converts WEBM audio data to raw PCM by streaming it through FFmpeg's stdin/stdout."""
     try:
-        user_ref = db.collection(USER_COLLECTION).document(user_id)
-        user_doc = user_ref.get()
-        
-        if not user_doc.exists:
-            user_ref.set({
-                "created_at": datetime.utcnow(),
-                "user_id": user_id
-            })
-            print(f"Created user document for {user_id}")
-    except Exception as e:
-        print(f"Error ensuring user exists: {e}")
-
-async def convert_webm_to_pcm(webm_data: bytes) -> bytes:
-    """Converts WEBM audio data to raw PCM format using FFmpeg."""
-    input_filename = f"/tmp/{uuid.uuid4()}.webm"
-    output_filename = f"/tmp/{uuid.uuid4()}.raw"
-
-    with open(input_filename, "wb") as f:
-        f.write(webm_data)
+        return await audio_front_end.decode(webm_data)
+    except (DecodeError, OSError) as e:
+        log.warning("FFmpeg conversion failed", error=str(e))
+        return PcmBuffer(rate=audio_front_end.rate)
 
+async def finish_streaming_decode(decoder) -> PcmBuffer:
+    """Close a decoder that was fed incrementally and return the full PCM buffer."""
     try:
-        command = [
-            "ffmpeg",
-            "-i", input_filename,
-            "-ar", str(RATE),
-            "-ac", "1",
-            "-f", "s16le",
-            output_filename
-        ]
-        subprocess.run(command, check=True, capture_output=True)
-
-        with open(output_filename, "rb") as f:
-            pcm_data = f.read()
-        return pcm_data
-    except subprocess.CalledProcessError as e:
-        print(f"FFmpeg conversion failed: {e.stderr.decode()}")
-        return b""
-    finally:
-        if os.path.exists(input_filename):
-            os.remove(input_filename)
-        if os.path.exists(output_filename):
-            os.remove(output_filename)
-
-async def process_video_frame_emotion(frame_b64: str) -> dict:
-    """Process a single video frame for emotion detection."""
+        return await audio_front_end.finish(decoder)
+    except DecodeError as e:
+        log.warning("FFmpeg conversion failed", error=str(e))
+        return PcmBuffer(rate=audio_front_end.rate)
+
+async def run_video_emotion(frames: list) -> list:
+    """Runs sampled, batched video emotion detection for a turn in the video worker pool."""
+    if not frames or not readiness.ready("video_emotion"):
+        # Still warming up: the turn goes ahead on text and audio alone
+        return []
     try:
-        frame_bytes = base64.b64decode(frame_b64)
-        nparr = np.frombuffer(frame_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if frame is None:
-            return {}
-        
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        emotions = video_detector.detect_emotions(frame_rgb)
-        
-        if not emotions:
-            return {}
-            
-        return emotions[0].get("emotions", {})
-        
+        packed, offsets = await asyncio.to_thread(pack_frames, frames)
+        return await video_pool.infer(video_emotion_job, packed, offsets=offsets)
+    except BrokenProcessPool as e:
+        recover_pool("video_emotion", video_pool, e)
+        return []
     except Exception as e:
-        print(f"Error processing video frame: {e}")
-        return {}
+        log.warning("Error processing video frames", error=str(e))
+        return []
 
 def aggregate_video_emotions(emotion_list):
     """Aggregate multiple emotion dictionaries into a single dominant emotion."""
@@ -198,121 +326,95 @@ def aggregate_video_emotions(emotion_list):
     
     return dominant_emotion, avg_scores
 
-async def run_stt(pcm_data: bytes) -> list:
+async def run_stt(pcm: PcmBuffer) -> list:
     """Runs Speech-to-Text on raw PCM audio data."""
-    if not pcm_data:
+    if not pcm:
         return [""]
         
-    audio = speech.RecognitionAudio(content=pcm_data)
+    # The protobuf message needs its own bytes, so this is the one copy STT makes
+    audio = speech.RecognitionAudio(content=bytes(pcm.view()))
     config = speech.RecognitionConfig(
         encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=RATE,
+        sample_rate_hertz=pcm.rate,
         language_code="en-US"
     )
     response = await asyncio.to_thread(speech_client.recognize, config=config, audio=audio)
     return [r.alternatives[0].transcript for r in response.results]
 
-async def run_audio_emotion(pcm_data: bytes) -> dict:
-    """Runs audio emotion analysis on raw PCM audio data."""
-    if not pcm_data:
+async def run_streaming_stt(pcm_queue: asyncio.Queue, on_transcript) -> list:
+    """Runs streaming Speech-to-Text over PCM chunks as they are decoded."""
+    recognizer = StreamingRecognizer(speech_client, audio_front_end.rate, on_transcript=on_transcript)
+    finals = await recognizer.run(iter_queue(pcm_queue))
+    return [" ".join(finals)] if finals else [""]
+
+async def collect_transcripts(stream_stt_task, pcm: PcmBuffer) -> list:
+    """Awaits the streaming recognizer, falling back to batch recognition if it failed."""
+    if stream_stt_task is not None:
+        try:
+            return await stream_stt_task
+        except Exception as e:
+            log.warning("Streaming STT failed, falling back to batch", error=str(e))
+    return await run_stt(pcm)
+
+async def run_audio_emotion(pcm: PcmBuffer) -> dict:
+    """Runs audio emotion analysis on raw PCM audio data in the audio worker pool."""
+    if not pcm or not readiness.ready("audio_emotion"):
         return {}
-
-    temp_file = f"/tmp/{uuid.uuid4()}.wav"
+    samples = pcm.samples()
     try:
-        audio_float32 = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768.0
-        await asyncio.to_thread(sf.write, temp_file, audio_float32, RATE)
-        
-        rec_result = await asyncio.to_thread(audio_model.generate, input=temp_file)
-        if rec_result and 'scores' in rec_result[0] and 'labels' in rec_result[0]:
-            return dict(zip(rec_result[0]['labels'], rec_result[0]['scores']))
-    finally:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+        if AUDIO_EMOTION_BATCHING:
+            return await audio_batcher.infer(samples)
+        return await audio_pool.infer(audio_emotion_job, samples, rate=pcm.rate)
+    except (InferenceQueueFull, InferenceDeadlineExceeded) as e:
+        log.warning("Audio emotion skipped", error=str(e))
+    except BrokenProcessPool as e:
+        recover_pool("audio_emotion", audio_pool, e)
+    except Exception as e:
+        # The turn goes ahead without audio emotion, as it does without video
+        log.warning("Error in audio emotion analysis", error=str(e))
     return {}
 
-def query_gemini_text(input_json: dict, conversation_history: str) -> str:
-    audio_emotion = input_json.get("audio_emotion", "")
-    video_emotion = input_json.get("video_emotion", "")
-    if audio_emotion: 
-        audio_emotion = audio_emotion.split('/')[-1].strip()
-    if video_emotion: 
-        video_emotion = video_emotion.split('/')[-1].strip()
-    
-    history_context = ""
-    if conversation_history:
-        history_context = f"""
-RECENT CONVERSATION CONTEXT:
-{conversation_history}
-
-"""
-
-    prompt_text = f"""You are Polaris, an empathetic conversational agent and wellness companion. You blend the qualities of a therapist and close friend.
-
-{history_context}CORE GUIDELINES:
-- Always prioritize the emotion expressed in the text
-- Be warm, understanding, and naturally conversational
-- Intelligently decide when conversation history is relevant to the current question - use it when it helps provide better context, ignore it when it doesn't relate to the current input
-- If video and audio emotions differ from text, blend them subtly without mentioning the mismatch
-- Adjust response length proportionally to user input - keep it short for basic questions and expand only when the topic truly demands more comprehensive coverage
-- Paraphrase rather than repeat the user's exact words
-- No emojis
-
-CURRENT INPUT ANALYSIS:
-- Text: "{input_json.get('text_input', '')}"
-- Video emotion detected: {video_emotion or 'none'}  
-- Audio emotion detected: {audio_emotion or 'none'}
-
-Respond naturally as Polaris, keeping your response conversational and supportive."""
+async def query_gemini_text(input_json: dict, history: PromptHistory) -> str:
+    payload = build_payload(input_json, history)
+    try:
+        return await model_router.generate(payload)
+    except NoModelAvailable as e:
+        log.error("Gemini failed", error=str(e))
+        return GEMINI_FALLBACK_REPLY
+
+async def stream_gemini_text(input_json: dict, history: PromptHistory):
+    """Yields reply text as Gemini Flash generates it, falling back to the routed call if the stream fails early."""
+    payload = build_payload(input_json, history)
+    streamed_any = False
+    try:
+        # Closed here, even if the caller stops early, so the breaker hears how the call ended
+        async with aclosing(model_router.stream(GEMINI_FLASH, GEMINI_FLASH_STREAM_URL, payload)) as chunks:
+            async for text in chunks:
+                streamed_any = True
+                yield text
+    except Exception as e:
+        log.warning("Gemini streaming failed", error=str(e))
+        if not streamed_any:
+            # Flash's breaker is open or its stream failed before any text: hedge and fail over
+            yield await query_gemini_text(input_json, history)
 
-    payload = {
-        "contents": [{"parts": [{"text": prompt_text}]}],
-        "generationConfig": {"temperature": 0.8, "maxOutputTokens": 4000},
-    }
-    
-    models_to_try = [
-        {"name": "Gemini 1.5 Flash", "url": GEMINI_FLASH_URL},
-        {"name": "Gemini 1.5 Pro", "url": GEMINI_PRO_URL}
-    ]
-    max_retries = 3
-    base_delay = 1
-    
-    for model in models_to_try:
-        for i in range(max_retries):
-            try:
-                resp = authed_session.post(model['url'], json=payload, timeout=120)
-                if resp.status_code >= 500:
-                    time.sleep(base_delay * (2**i))
-                    continue
-                resp.raise_for_status()
-                resj = resp.json()
-                return resj["candidates"][0]["content"]["parts"][0]["text"].strip()
-            except Exception as e:
-                if i < max_retries - 1:
-                    time.sleep(base_delay * (2**i))
-    
-    return "I'm sorry, I'm facing some technical difficulties connecting to my brain right now. Please try again in a moment."
+# Repeated phrases (the fallback apology, greetings, short acknowledgements) are served from memory
+tts_cache = TtsCache()
 
-def query_google_tts(text: str) -> bytes:
+async def query_google_tts(text: str) -> bytes:
     if not text.strip(): 
         return b""
+    cached = tts_cache.get(text, TTS_VOICE_CONFIG)
+    if cached is not None:
+        return cached
+    payload = {"input": {"text": text}, **TTS_VOICE_CONFIG}
     try:
-        from google.cloud import texttospeech
-        client = texttospeech.TextToSpeechClient.from_service_account_file(SERVICE_ACCOUNT_FILE)
-        synthesis_input = texttospeech.SynthesisInput(text=text)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US", name="en-US-Chirp3-HD-Algieba"
-        )
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.LINEAR16,
-            sample_rate_hertz=16000, 
-            speaking_rate=0.9
-        )
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
-        return response.audio_content
+        resj = await tts_upstream.post_json(TTS_URL, payload)
+        audio = base64.b64decode(resj.get("audioContent", ""))
+        tts_cache.put(text, TTS_VOICE_CONFIG, audio)
+        return audio
     except Exception as e:
-        print(f"Google TTS error: {e}")
+        log.warning("Google TTS error", error=str(e))
         return b""
 
 # Journal helper functions
@@ -346,50 +448,92 @@ def get_latest_conversation(user_id: str):
         return " ".join(conversation_context) if conversation_context else None
     
     except Exception as e:
-        print(f"Conversation fetch failed: {e}")
+        log.warning("Conversation fetch failed", error=str(e))
         return None
 
-def save_journal(title: str, content: str, visibility: str, user_id: str):
-    """Save journal entry under users → user_id → journals → [doc]."""
+def save_journal(title: str, content: str, visibility: str, user_id: str, timestamp: datetime = None):
+    """Save journal entry under users → user_id → journals → [doc]. Returns the journal ID."""
     try:
-        # Ensure user exists before saving journal
-        ensure_user_exists(user_id)
-        
         journals_ref = db.collection(USER_COLLECTION).document(user_id).collection("journals")
         doc_ref = journals_ref.document()
-        doc_ref.set(
-            {
-                "title": title,
-                "content": content,
-                "visibility": visibility,
-                "timestamp": datetime.utcnow(),
-            }
-        )
-        print(f"Journal saved for user {user_id}")
+        data = {
+            "title": title,
+            "content": content,
+            "visibility": visibility,
+            "timestamp": timestamp or datetime.utcnow(),
+        }
+        # Public journals are mirrored into the feed collection in the same commit
+        batch = db.batch()
+        batch.set(doc_ref, data)
+        if visibility == "public":
+            feed_ref = db.collection(PUBLIC_FEED_COLLECTION).document(feed_document_id(doc_ref))
+            batch.set(feed_ref, feed_entry(doc_ref, data))
+        batch.commit()
+        log.info("Journal saved", user_id=user_id, journal_id=doc_ref.id, visibility=visibility)
+        return doc_ref.id
     except Exception as e:
-        print(f"Failed to save journal: {e}")
+        log.error("Failed to save journal", user_id=user_id, error=str(e))
+        return None
 
-def check_toxicity(text: str) -> float:
-    """Check toxicity using Perspective API."""
+def finalize_journal(job: PublishJob, visibility: str):
+    """Replace a pending journal's visibility, adding it to the public feed if it passed moderation."""
+    doc_ref = db.collection(USER_COLLECTION).document(job.user_id).collection("journals").document(job.journal_id)
+    batch = db.batch()
+    batch.update(doc_ref, {"visibility": visibility})
+    if visibility == "public":
+        data = {"title": job.title, "content": job.content, "timestamp": job.timestamp}
+        feed_ref = db.collection(PUBLIC_FEED_COLLECTION).document(feed_document_id(doc_ref))
+        batch.set(feed_ref, feed_entry(doc_ref, data))
+    batch.commit()
+
+def load_pending_journals() -> list:
+    """Journals left pending by a previous process (e.g. a restart with jobs still queued)."""
+    jobs = []
+    for doc in db.collection_group("journals").where("visibility", "==", PENDING_VISIBILITY).stream():
+        data = doc.to_dict()
+        jobs.append(PublishJob(doc.reference.parent.parent.id, doc.id, data.get("title"),
+                               data.get("content", ""), "public", data.get("timestamp")))
+    return jobs
+
+# Lexicon pre-filter, then cached scores, then rate-limited Perspective calls
+moderator = Moderator(perspective_upstream, PERSPECTIVE_API_KEY, PERSPECTIVE_URL)
+
+async def check_toxicity(text: str):
+    """Toxicity score in [0, 1], or None when it could not be determined."""
+    result = await moderator.score(text)
+    return result.score
+
+async def moderate_visibility(content: str, requested_visibility: str) -> str:
+    if requested_visibility != "public":
+        return requested_visibility
+    toxicity = await check_toxicity(content)
+    # Fail closed: a journal that could not be scored is not published
+    if toxicity is None or toxicity > TOXICITY_THRESHOLD:
+        return "private"
+    return "public"
+
+async def process_publish_job(job: PublishJob) -> str:
+    visibility = await moderate_visibility(job.content, job.requested_visibility)
+    await asyncio.to_thread(finalize_journal, job, visibility)
+    return visibility
+
+# Journals posted with mode=async are stored as pending and finished here
+publish_queue = PublishQueue(process_publish_job)
+
+async def resume_pending_journals():
     try:
-        payload = {
-            "comment": {"text": text},
-            "languages": ["en"],
-            "requestedAttributes": {"TOXICITY": {}}
-        }
-        resp = requests.post(f"{PERSPECTIVE_URL}?key={PERSPECTIVE_API_KEY}", json=payload)
-        resp.raise_for_status()
-        score = resp.json()["attributeScores"]["TOXICITY"]["summaryScore"]["value"]
-        return score
+        jobs = await asyncio.to_thread(load_pending_journals)
     except Exception as e:
-        print(f"Perspective API call failed: {e}")
-        return 0.0
-
-def generate_one_suggestion(convo_context: str) -> str:
+        log.error("Could not load pending journals", error=str(e))
+        return
+    for job in jobs:
+        if not publish_queue.submit(job):
+            await process_publish_job(job)
+    if jobs:
+        log.info("Resumed pending journals", count=len(jobs))
+
+async def generate_one_suggestion(convo_context: str) -> str:
     """Generate a suggestion using Gemini API."""
-    if not authed_session:
-        return "Take a moment to reflect on what's bringing you joy today."
-
     # Create prompt based on whether we have conversation context
     if convo_context:
         prompt = f"""Context: {convo_context}
@@ -407,64 +551,72 @@ Write a journal prompt based on the above context. Start with "Write about" or "
         }
     }
     try:
-        resp = authed_session.post(GEMINI_FLASH_URL, json=payload)
-        resp.raise_for_status()
-        result = resp.json()
-        content = result.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "Take a moment to reflect on what's bringing you joy today.")
+        result = await gemini_upstream.post_json(GEMINI_FLASH_URL, payload)
+        content = result.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", SUGGESTION_FALLBACK)
         return content.strip()
     except Exception as e:
-        print(f"Gemini API call failed: {e}")
-        return "Take a moment to reflect on what's bringing you joy today."
-
-# --- ROUTES ---
-
-# AI WebSocket endpoint
-@app.websocket("/process")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    print("Client connected for a single turn.")
-    video_frames = []
-    audio_data = None
-    user_id = None
-    conv_manager = None
-    
-    try:
-        while True:
-            message = json.loads(await websocket.receive_text())
-            msg_type = message.get("type")
-            
-            if msg_type == "init":
-                user_id = message.get("user_id")
-                if not user_id:
-                    raise ValueError("User ID is required")
-                
-                # Ensure user exists when they connect
-                ensure_user_exists(user_id)
-                conv_manager = ConversationManager(user_id)
-                print(f"User {user_id} connected")
-                continue
-            elif msg_type == "video":
-                video_frames.append(message['data'])
-            elif msg_type == "audio_file":
-                audio_data = base64.b64decode(message['data'])
-                break
+        log.warning("Gemini suggestion call failed", error=str(e))
+        return SUGGESTION_FALLBACK
 
-        if not conv_manager or not audio_data or not user_id:
-            raise ValueError("Required data not received.")
+# Suggestions are cached per conversation version; writing messages invalidates them
+suggestion_cache = SuggestionCache()
+conversation_versions.subscribe(suggestion_cache.invalidate)
 
-        await websocket.send_text(json.dumps({"type": "status", "message": "transcribing"}))
+async def build_suggestion(user_id: str):
+    convo_context = await asyncio.to_thread(get_latest_conversation, user_id)
+    suggestion = await generate_one_suggestion(convo_context)
+    # The canned fallback means Gemini failed; try again on the next request
+    return suggestion, suggestion != SUGGESTION_FALLBACK
 
-        pcm_audio_data = await convert_webm_to_pcm(audio_data)
+def prefetch_suggestion(user_id: str):
+    if SUGGESTION_PREFETCH:
+        spawn_background(suggestion_cache.prefetch(user_id, conversation_versions.current,
+                                                   lambda: build_suggestion(user_id)))
 
-        video_emotion_tasks = [
-            asyncio.create_task(process_video_frame_emotion(frame_b64))
-            for frame_b64 in video_frames
-        ]
-        
-        stt_task = asyncio.create_task(run_stt(pcm_audio_data))
-        audio_emotion_task = asyncio.create_task(run_audio_emotion(pcm_audio_data))
+# --- ROUTES ---
 
-        video_emotion_results = await asyncio.gather(*video_emotion_tasks)
+async def run_turn(session: Session, turn: TurnInput):
+    """Transcribe one utterance, answer it and speak the answer."""
+    trace = TurnTrace()
+    outcome = "error"
+    user_id = session.user_id
+    conv_manager = session.conv_manager
+    send_json = session.send_json
+    video_dominant_emotion = None
+    final_input = {}
+    admitted = False
+    skip_video = False
+    video_emotion_task = stt_task = audio_emotion_task = None
+    try:
+        # Follow-up turns of an open session go ahead of first turns
+        priority = PRIORITY_SESSION if session.turns > 1 else PRIORITY_NEW
+        with trace.stage("admission"):
+            await turn_admission.acquire(user_id, priority)
+        admitted = True
+        if turn_admission.pressured and (turn.video_frames or turn.video_task):
+            # Near capacity: answer from the words, the voice and what video is already analysed,
+            # and leave the video workers free
+            skip_video = True
+            turn.skip_video()
+            turn_admission.note_degraded()
+
+        await send_json({"type": "status", "message": "transcribing"})
+
+        # Most frames were analysed while the user spoke; the rest does not depend on the audio,
+        # so it runs while decoding finishes
+        video_emotion_task = asyncio.create_task(trace.measure("video_emotion", turn.video_results(run_video_emotion)))
+
+        with trace.stage("decode"):
+            if turn.decoder:
+                # Most of the audio is already decoded by now; only the tail remains
+                pcm = await finish_streaming_decode(turn.decoder)
+            else:
+                pcm = await convert_webm_to_pcm(turn.audio_data)
+
+        stt_task = asyncio.create_task(trace.measure("stt", collect_transcripts(turn.stt_task, pcm)))
+        audio_emotion_task = asyncio.create_task(trace.measure("audio_emotion", run_audio_emotion(pcm)))
+
+        video_emotion_results = await video_emotion_task
         transcripts, audio_emotion_scores = await asyncio.gather(stt_task, audio_emotion_task)
 
         valid_emotions = [emotions for emotions in video_emotion_results if emotions]
@@ -475,13 +627,13 @@ async def websocket_endpoint(websocket: WebSocket):
             video_dominant_emotion = None
 
         transcription = transcripts[0] if transcripts else ""
-        await websocket.send_text(json.dumps({"type": "interim_transcript", "text": transcription}))
-        await websocket.send_text(json.dumps({"type": "status", "message": "thinking"}))
+        await send_json({"type": "interim_transcript", "text": transcription, "is_final": True})
+        await send_json({"type": "status", "message": "thinking"})
 
         audio_dominant_emotion = max(audio_emotion_scores, key=audio_emotion_scores.get, default=None)
 
-        last_msgs = await asyncio.to_thread(conv_manager.get_last_messages, limit=8)
-        conversation_history = "\n".join([f"{m['sender'].upper()}: {m['text']}" for m in last_msgs]) if last_msgs else ""
+        with trace.stage("history"):
+            prompt_history = await asyncio.to_thread(prompt_engine.history, conv_manager)
 
         final_input = {
             "text_input": transcription,
@@ -489,112 +641,377 @@ async def websocket_endpoint(websocket: WebSocket):
             "video_emotion": video_dominant_emotion
         }
         
-        print(f"User {user_id} - video emotion: {video_dominant_emotion}")
-        print(f"User {user_id} - audio emotion: {audio_dominant_emotion.split('/')[-1].strip() if audio_dominant_emotion else None}")
-        response_text = await asyncio.to_thread(query_gemini_text, final_input, conversation_history)
-        
-        await asyncio.to_thread(conv_manager.add_message, "user", transcription)
-        await asyncio.to_thread(conv_manager.add_message, "ai", response_text)
+        if session.response_mode == "stream":
+            # Speak the reply sentence by sentence while Gemini is still generating it
+            with trace.stage("response_stream"):
+                response_text = await stream_response(
+                    stream_gemini_text(final_input, prompt_history),
+                    synthesize=lambda text: trace.measure("tts_sentence", query_google_tts(text)),
+                    send=session.send_audio,
+                )
+            with trace.stage("persistence"):
+                # A barge-in from here on still records the reply the user heard
+                await asyncio.shield(persist_turn(conv_manager, transcription, response_text))
+            await send_json({"type": "response_end", "text": response_text})
+            prefetch_suggestion(user_id)
+            outcome = "ok"
+            return
+
+        with trace.stage("gemini"):
+            response_text = await query_gemini_text(final_input, prompt_history)
+
+        with trace.stage("persistence"):
+            await asyncio.shield(persist_turn(conv_manager, transcription, response_text))
+
+        with trace.stage("tts"):
+            response_audio_bytes = await query_google_tts(response_text)
+
+        await session.send_audio({"type": "final_response", "text": response_text}, response_audio_bytes)
+        prefetch_suggestion(user_id)
+        outcome = "ok"
+
+    except TurnRejected as e:
+        outcome = "shed"
+        with suppress(Exception):
+            await send_json({"type": "status", "message": "busy", "retry_after": e.retry_after})
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except WebSocketDisconnect:
+        outcome = "disconnected"
+        log.info("Client disconnected prematurely", user_id=user_id)
+    except Exception as e:
+        log.error("An error occurred during the turn", user_id=user_id, error=str(e))
+    finally:
+        # A cancelled or failed turn must not keep model workers and STT busy after its slot is given back
+        unfinished = [task for task in (video_emotion_task, stt_task, audio_emotion_task)
+                      if task is not None and not task.done()]
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        if admitted:
+            turn_admission.release(user_id)
+        await turn.discard()
+        stage_ms = trace.finish(session.response_mode, outcome)
+        log.info("Turn complete", user_id=user_id, mode=session.response_mode, outcome=outcome,
+                 turn=session.turns, degraded=not readiness.complete, skipped_video=skip_video,
+                 video_emotion=video_dominant_emotion,
+                 audio_emotion=final_input.get("audio_emotion"), stage_ms=stage_ms)
+        if session.send_timings and outcome == "ok":
+            with suppress(Exception):
+                await send_json({"type": "turn_timings", "stage_ms": stage_ms})
+
+# Connections currently open on /process
+open_sessions = set()
+# Caps how many turns run at once; the rest queue briefly or are told the server is busy
+turn_admission = TurnAdmission()
 
-        response_audio_bytes = await asyncio.to_thread(query_google_tts, response_text)
+# AI WebSocket endpoint
+@app.websocket("/process")
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    if not readiness.serving:
+        # 1013 (try again later): the load balancer should not have sent this yet
+        await websocket.close(code=1013)
+        return
+    session = Session(websocket)
+    open_sessions.add(session)
+    turn = TurnInput()
+
+    async def send_interim_transcript(text: str, is_final: bool):
+        await session.send_json({"type": "interim_transcript", "text": text, "is_final": is_final})
+
+    async def begin_audio():
+        # The first audio of an utterance: a turn still answering the previous one is cut off
+        if session.multi_turn and session.busy:
+            await session.cancel_turn()
+
+    async def ensure_decoder():
+        if turn.decoder is None:
+            await begin_audio()
+            turn.decoder = await audio_front_end.open_stream()
+            if STT_MODE == "streaming":
+                turn.stt_task = asyncio.create_task(
+                    run_streaming_stt(turn.decoder.subscribe(), send_interim_transcript)
+                )
+        return turn.decoder
+
+    def sample_video():
+        # Analyse frames while the utterance is still arriving, unless the server is near capacity
+        if not turn_admission.pressured:
+            turn.analyze_video(run_video_emotion, VIDEO_BATCH_FRAMES)
+
+    async def feed_audio(chunk: bytes):
+        if turn.failed:
+            return
+        try:
+            await (await ensure_decoder()).feed(chunk)
+        except (OSError, DecodeError) as e:
+            # A chunk ffmpeg cannot take costs this utterance, not the whole session
+            log.warning("Dropped a turn whose audio could not be decoded", user_id=session.user_id, error=str(e))
+            turn.failed = True
+            await turn.discard()
+            await session.send_json({"type": "status", "message": "error", "reason": "audio"})
 
-        response_message = {
-            "type": "final_response",
-            "text": response_text,
-            "data": base64.b64encode(response_audio_bytes).decode('utf-8')
-        }
-        await websocket.send_text(json.dumps(response_message))
-        print(f"Response sent to user {user_id}. Turn complete.")
+    try:
+        while True:
+            raw = await websocket.receive()
+            if raw["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(raw.get("code", 1000))
+            session.touch()
+
+            if raw.get("bytes") is not None:
+                if not session.binary_frames:
+                    # Without framing, binary messages are raw WebM audio chunks
+                    await feed_audio(raw["bytes"])
+                    continue
+                try:
+                    kind, _, payload = decode_frame(raw["bytes"])
+                except FrameError as e:
+                    log.warning("Dropped malformed frame", user_id=session.user_id, error=str(e))
+                    continue
+                if kind == FRAME_VIDEO:
+                    turn.video_frames.add(payload)
+                    sample_video()
+                else:
+                    await feed_audio(payload)
+                continue
+
+            message = json.loads(raw["text"])
+            msg_type = message.get("type")
+            
+            if msg_type == "init":
+                user_id = message.get("user_id")
+                if not user_id:
+                    raise ValueError("User ID is required")
+                
+                # Ensure user exists when they connect; a session does this once for all its turns
+                await ensure_user_exists(user_id)
+                session.user_id = user_id
+                session.conv_manager = ConversationManager(user_id)
+                # "stream" opts into sentence-by-sentence response_chunk messages
+                session.response_mode = message.get("response_mode", "full")
+                # "session": true keeps the connection open for further turns
+                session.multi_turn = bool(message.get("session"))
+                # "framing": "binary" switches frames and reply audio to raw binary messages
+                session.binary_frames = message.get("framing") == "binary"
+                # "timings": true follows each answered turn with its stage timings (turn_timings)
+                session.send_timings = bool(message.get("timings"))
+                if session.multi_turn:
+                    # Load history and the summary now so the first turn finds them in memory
+                    spawn_background(asyncio.to_thread(prompt_engine.history, session.conv_manager))
+                    session.start_heartbeats()
+                    await session.send_json({
+                        "type": "session_ready",
+                        "heartbeat_interval": session.heartbeat_interval,
+                        "idle_timeout": session.idle_timeout,
+                    })
+                log.debug("User connected", user_id=user_id, multi_turn=session.multi_turn)
+                continue
+            elif msg_type == "ping":
+                await session.send_json({"type": "pong"})
+                continue
+            elif msg_type == "cancel":
+                await session.cancel_turn()
+                continue
+            elif msg_type == "end":
+                await session.wait_turn()
+                await websocket.close(code=1000)
+                return
+            elif msg_type == "video":
+                turn.video_frames.add_base64(message['data'])
+                sample_video()
+                continue
+            elif msg_type == "audio_chunk":
+                await feed_audio(base64.b64decode(message['data']))
+                continue
+            elif msg_type == "audio_file":
+                await begin_audio()
+                turn.audio_data = base64.b64decode(message['data'])
+            elif msg_type != "audio_end":
+                continue
+
+            # audio_end or audio_file: the utterance is complete
+            if turn.failed:
+                # Already reported when its audio failed; the next utterance starts afresh
+                turn = TurnInput()
+                if not session.multi_turn:
+                    return
+                continue
+            if not session.conv_manager or not turn.has_audio:
+                raise ValueError("Required data not received.")
+            ready_turn, turn = turn, TurnInput()
+            if not session.multi_turn:
+                session.start_turn(run_turn(session, ready_turn))
+                await session.wait_turn()
+                return
+            # Keep receiving while the turn runs, so the user can barge in
+            session.start_turn(run_turn(session, ready_turn))
 
     except WebSocketDisconnect:
-        print("Client disconnected prematurely.")
+        log.info("Client disconnected", user_id=session.user_id, turns=session.turns)
     except Exception as e:
-        print(f"An error occurred during the turn: {e}")
+        log.error("An error occurred during the session", user_id=session.user_id, error=str(e))
     finally:
-        print("Closing connection.")
+        await turn.discard()
+        await session.close()
+        open_sessions.discard(session)
+
+# Cache statistics, for sizing the in-process caches
+@app.get("/stats")
+def get_stats():
+    return {
+        "tts_cache": tts_cache.stats(),
+        "history_cache": history_cache.stats(),
+        "prompt_summaries": prompt_engine.stats(),
+        "models": model_router.stats(),
+        "write_behind": write_behind.stats(),
+        "public_feed": public_feed.stats(),
+        "moderation": moderator.stats(),
+        "publish_queue": publish_queue.stats(),
+        "suggestions": suggestion_cache.stats(),
+        "admission": turn_admission.stats(),
+    }
+
+# Read at scrape time: how much work is waiting where
+REGISTRY.register(Gauge("cosmos_queue_depth", "Items waiting in the server's in-process queues.", ("queue",),
+                        collect=lambda: {
+                            ("write_behind",): write_behind.stats()["pending"],
+                            ("publish",): publish_queue.stats()["queued"],
+                            ("background_tasks",): len(background_tasks),
+                            ("turn_admission",): turn_admission.queued,
+                        }))
+REGISTRY.register(Gauge("cosmos_open_sessions", "Open /process connections.",
+                        collect=lambda: {(): len(open_sessions)}))
+REGISTRY.register(Gauge("cosmos_turns_running", "/process turns holding an admission slot.",
+                        collect=lambda: {(): turn_admission.running}))
+REGISTRY.register(Gauge("cosmos_model_in_flight", "Model worker pool requests queued or running.", ("model",),
+                        collect=lambda: {(pool.name,): pool.in_flight for pool in (audio_pool, video_pool)}))
+REGISTRY.register(Gauge("cosmos_upstream_in_flight", "Outbound HTTP requests in flight.", ("upstream",),
+                        collect=lambda: {(name,): u.in_flight for name, u in upstreams.upstreams.items()}))
+REGISTRY.register(Gauge("cosmos_gemini_breaker_open", "1 while a Gemini model's circuit breaker is not closed.",
+                        ("model",),
+                        collect=lambda: {(m.name,): int(m.breaker.state != "closed") for m in model_router.models}))
+
+REGISTRY.register(Gauge("cosmos_component_ready", "1 once a startup component has loaded.", ("component",),
+                        collect=lambda: {(name,): int(c["state"] == "ready")
+                                         for name, c in readiness.snapshot()["components"].items()}))
+
+# Readiness probe: 200 once turns can be served, even while the emotion models still load
+@app.get("/ready")
+def get_ready():
+    snapshot = readiness.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 # Journal endpoints
 @app.get("/suggestion/{user_id}")
-def get_suggestion(user_id: str):
-    convo_context = get_latest_conversation(user_id)
-    suggestion = generate_one_suggestion(convo_context)
+async def get_suggestion(user_id: str):
+    version = conversation_versions.current(user_id)
+    suggestion = await suggestion_cache.get_or_generate(user_id, version, lambda: build_suggestion(user_id))
     return {"suggestion": suggestion}
 
 @app.post("/journal")
-def post_journal(req: JournalRequest):
-    final_visibility = req.visibility
-
-    if final_visibility == "public":
-        toxicity = check_toxicity(req.content)
-        if toxicity > 0.7:
-            final_visibility = "private"
-
-    save_journal(req.title, req.content, final_visibility, req.user_id)
-    return {"status": "ok", "final_visibility": final_visibility}
+async def post_journal(req: JournalRequest, mode: str = "sync"):
+    await ensure_user_exists(req.user_id)
+
+    if mode == "async" and req.visibility == "public":
+        # Store the journal as pending now and let the publish workers settle its visibility
+        timestamp = datetime.utcnow()
+        journal_id = await asyncio.to_thread(
+            save_journal, req.title, req.content, PENDING_VISIBILITY, req.user_id, timestamp
+        )
+        if journal_id is None:
+            return JSONResponse({"status": "error", "error": "Failed to save journal"}, status_code=500)
+        job = PublishJob(req.user_id, journal_id, req.title, req.content, req.visibility, timestamp)
+        if publish_queue.submit(job):
+            return JSONResponse(
+                {"status": PENDING_VISIBILITY, "journal_id": journal_id, "final_visibility": None},
+                status_code=202,
+            )
+        # The queue is full, so this one is finished inline
+        final_visibility = await process_publish_job(job)
+        return {"status": "ok", "journal_id": journal_id, "final_visibility": final_visibility}
+
+    final_visibility = await moderate_visibility(req.content, req.visibility)
+    journal_id = await asyncio.to_thread(save_journal, req.title, req.content, final_visibility, req.user_id)
+    return {"status": "ok", "journal_id": journal_id, "final_visibility": final_visibility}
+
+def read_journal_status(user_id: str, journal_id: str):
+    """A journal's publish state from Firestore, for jobs this process does not know about."""
+    doc = db.collection(USER_COLLECTION).document(user_id).collection("journals").document(journal_id).get()
+    if not doc.exists:
+        return None
+    visibility = doc.get("visibility")
+    if visibility == PENDING_VISIBILITY:
+        return {"journal_id": journal_id, "status": PENDING_VISIBILITY, "final_visibility": None}
+    return {"journal_id": journal_id, "status": "final", "final_visibility": visibility}
+
+@app.get("/journal_status/{user_id}/{journal_id}")
+async def get_journal_status(user_id: str, journal_id: str):
+    state = publish_queue.status(journal_id) or await asyncio.to_thread(read_journal_status, user_id, journal_id)
+    if state is None:
+        return JSONResponse({"status": "not_found", "journal_id": journal_id}, status_code=404)
+    return state
+
+@app.websocket("/journal_status/{user_id}/{journal_id}")
+async def journal_status_socket(websocket: WebSocket, user_id: str, journal_id: str):
+    """Sends the journal's state once it is no longer pending (or when the wait times out), then closes."""
+    await websocket.accept()
+    try:
+        state = await publish_queue.wait(journal_id, PUBLISH_WAIT_TIMEOUT)
+        if state is None:
+            state = await asyncio.to_thread(read_journal_status, user_id, journal_id)
+        await websocket.send_json(state or {"status": "not_found", "journal_id": journal_id})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
 
 # Community endpoints
-@app.get("/journals/{user_id}")
-def get_journals(user_id: str):
+def journal_page_response(query, limit: int, start_after: str, fields: str):
+    """Run one page of a journal query and stream it back as JSON."""
     try:
-        journals_ref = (
-            db.collection("users")
-              .document(user_id)
-              .collection("journals")
-              .order_by("timestamp", direction=Query.DESCENDING)
-        )
-        docs = journals_ref.stream()
+        selected = parse_fields(fields)
+        limit = clamp_limit(limit)
+        snapshots = page_query(db, query, limit, start_after, selected).stream()
+        # Pull the first result here so query errors become a 500, not a truncated body
+        first = next(snapshots, None)
+    except PageRequestError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+    return StreamingResponse(stream_page(snapshots, first, limit, selected), media_type="application/json")
 
-        journals = []
-        for doc in docs:
-            data = doc.to_dict()
-            if "timestamp" in data:
-                data["timestamp"] = data["timestamp"].isoformat()
-            journals.append(data)
-
-        return {"success": True, "journals": journals}
+@app.get("/journals/{user_id}")
+def get_journals(user_id: str, limit: int = JOURNAL_PAGE_SIZE, start_after: str = None, fields: str = None):
+    try:
+        journals_ref = db.collection(USER_COLLECTION).document(user_id).collection("journals")
+        return journal_page_response(journals_ref, limit, start_after, fields)
     except Exception as e:
-        print(f"Error fetching journals for user {user_id}: {e}")
-        return {"success": False, "error": str(e)}, 500
+        log.error("Error fetching journals", user_id=user_id, error=str(e))
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 @app.get("/public_journals")
-def get_public_journals():
+def get_public_journals(request: Request, limit: int = JOURNAL_PAGE_SIZE, start_after: str = None,
+                        fields: str = None):
     try:
-        public_journals_ref = (
-            db.collection_group("journals")
-              .where("visibility", "==", "public")
-              .order_by("timestamp", direction=Query.DESCENDING)
-        )
-        docs = public_journals_ref.stream()
-
-        public_journals = []
-        for doc in docs:
-            journal_data = doc.to_dict()
-            journal_data["id"] = doc.id
+        page = public_feed.page(clamp_limit(limit), start_after, parse_fields(fields))
+    except PageRequestError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+    if page is not None:
+        headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == page.etag:
+            public_feed.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(page.body, headers=headers)
 
-            # Get user_id from the document path
-            user_id = doc.reference.parent.parent.id
-            journal_data["user_id"] = user_id
-            
-
-            if "timestamp" in journal_data:
-                journal_data["timestamp"] = journal_data["timestamp"].isoformat()
-
-            public_journals.append(journal_data)
-
-        print(f"📱 Total public journals found: {len(public_journals)}")
-        
-        # Log the first journal for debugging
-        if public_journals:
-            first_journal = public_journals[0]
-            print(f" First journal sample: {first_journal}")
-            
-        return {"success": True, "journals": public_journals}
-        
+    try:
+        public_journals_ref = db.collection_group("journals").where("visibility", "==", "public")
+        return journal_page_response(public_journals_ref, limit, start_after, fields)
     except Exception as e:
-        print(f"❌ Error fetching public journals: {e}")
-        import traceback
-        traceback.print_exc()
-        return {"success": False, "error": str(e)}, 500
+        log.error("Error fetching public journals", exc_info=True, error=str(e))
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
         
 if __name__ == "__main__":
     import uvicorn
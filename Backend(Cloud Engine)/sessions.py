@@ -0,0 +1,171 @@
+# sessions.py
+import asyncio
+import base64
+import json
+import time
+
+from framing import FRAME_RESPONSE_AUDIO, FrameSampler, encode_frame
+from logs import get_logger
+
+log = get_logger("sessions")
+
+SESSION_HEARTBEAT_INTERVAL = 20.0  # seconds between server heartbeats on an open session
+SESSION_IDLE_TIMEOUT = 180.0       # a session with no client messages and no turn running is closed after this
+
+
+class TurnInput:
+    """
+    What the client sent for one utterance: video frames and its audio,
+    whole or streamed. Video frames are analysed in batches while the
+    utterance is still arriving, one batch at a time.
+    """
+
+    def __init__(self):
+        self.video_frames = FrameSampler()
+        self.audio_data = None
+        self.decoder = None
+        self.stt_task = None
+        self.failed = False       # its audio could not be decoded; the rest of it is ignored
+        self.video_emotions = []  # per-frame emotion scores of the batches analysed so far
+        self.video_task = None
+
+    @property
+    def has_audio(self) -> bool:
+        return bool(self.audio_data) or self.decoder is not None
+
+    def analyze_video(self, analyze, min_frames: int):
+        """Start `analyze` (a coroutine function) on the held frames once `min_frames` are held and no batch runs."""
+        if len(self.video_frames) < min_frames or (self.video_task and not self.video_task.done()):
+            return
+        self.video_task = asyncio.create_task(self._analyze_batch(analyze, self.video_frames.take()))
+
+    async def _analyze_batch(self, analyze, frames: list):
+        self.video_emotions.extend(await analyze(frames))
+
+    async def video_results(self, analyze) -> list:
+        """Wait for the running batch, analyse the frames still held and return every frame's scores."""
+        if self.video_task:
+            await self.video_task
+        if self.video_frames:
+            await self._analyze_batch(analyze, self.video_frames.take())
+        return self.video_emotions
+
+    def skip_video(self):
+        """Stop analysing video: cancel the running batch and drop the frames not analysed yet."""
+        if self.video_task and not self.video_task.done():
+            self.video_task.cancel()
+        self.video_task = None
+        self.video_frames.clear()
+
+    async def discard(self):
+        """Release the decoder, recognizer and video analysis of a turn that will not run."""
+        if self.stt_task and not self.stt_task.done():
+            self.stt_task.cancel()
+        if self.video_task and not self.video_task.done():
+            self.video_task.cancel()
+        if self.decoder:
+            await self.decoder.abort()
+
+
+class Session:
+    """
+    One /process connection. A single-turn connection (the original
+    protocol) runs one turn and closes; with "session": true in init it
+    stays open for any number of turns, one at a time. The session holds
+    what turns share: the user, the conversation manager, a serialized
+    sender, heartbeats and the idle timer, and the turn in flight, which
+    is cancelled if the user barges in.
+    """
+
+    def __init__(self, websocket, heartbeat_interval: float = SESSION_HEARTBEAT_INTERVAL,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.websocket = websocket
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.user_id = None
+        self.conv_manager = None
+        self.response_mode = "full"
+        self.multi_turn = False
+        self.binary_frames = False
+        self.send_timings = False
+        self.turns = 0
+        self.cancelled = 0
+        self.closed = False
+        self.last_activity = time.monotonic()
+        self._send_lock = asyncio.Lock()
+        self._turn_task = None
+        self._watchdog = None
+
+    async def send_json(self, payload: dict):
+        # Interim transcripts, heartbeats and the turn itself all write here, so serialize
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(payload))
+
+    async def send_audio(self, payload: dict, audio: bytes, sequence: int = 0):
+        """
+        Send a message that carries audio: as one JSON message with base64
+        "data", or, with binary framing, the JSON followed by the raw audio
+        in a FRAME_RESPONSE_AUDIO frame.
+        """
+        async with self._send_lock:
+            if self.binary_frames:
+                await self.websocket.send_text(json.dumps(payload))
+                await self.websocket.send_bytes(encode_frame(FRAME_RESPONSE_AUDIO, sequence, audio))
+            else:
+                payload = {**payload, "data": base64.b64encode(audio).decode('utf-8')}
+                await self.websocket.send_text(json.dumps(payload))
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        return self._turn_task is not None and not self._turn_task.done()
+
+    def start_turn(self, coro) -> asyncio.Task:
+        self.turns += 1
+        self._turn_task = asyncio.create_task(coro)
+        self._turn_task.add_done_callback(lambda _: self.touch())
+        return self._turn_task
+
+    async def cancel_turn(self) -> bool:
+        """Stop the turn in flight (barge-in). False if nothing was running."""
+        if not self.busy:
+            return False
+        self._turn_task.cancel()
+        await asyncio.gather(self._turn_task, return_exceptions=True)
+        self.cancelled += 1
+        await self.send_json({"type": "turn_cancelled", "turn": self.turns})
+        return True
+
+    async def wait_turn(self):
+        if self._turn_task is not None:
+            await asyncio.gather(self._turn_task, return_exceptions=True)
+
+    def start_heartbeats(self):
+        if self._watchdog is None:
+            self._watchdog = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while not self.closed:
+            await asyncio.sleep(self.heartbeat_interval)
+            if self.closed:
+                return
+            try:
+                if not self.busy and time.monotonic() - self.last_activity > self.idle_timeout:
+                    log.info("Closing idle session", user_id=self.user_id, turns=self.turns)
+                    await self.send_json({"type": "session_closing", "reason": "idle"})
+                    await self.websocket.close(code=1000)
+                    return
+                await self.send_json({"type": "heartbeat"})
+            except Exception:
+                # The socket is gone; the receive loop sees the disconnect
+                return
+
+    async def close(self):
+        self.closed = True
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+        if self.busy:
+            self._turn_task.cancel()
+        await asyncio.gather(*(t for t in (self._watchdog, self._turn_task) if t), return_exceptions=True)
@@ -0,0 +1,80 @@
+# startup.py
+import asyncio
+import inspect
+import time
+
+from logs import get_logger
+
+log = get_logger("startup")
+
+
+class Readiness:
+    """
+    Loads the server's components concurrently and records, per component,
+    whether it is pending, loading, ready or failed and how long it took.
+    The server takes traffic once every `required` component is ready;
+    the rest (the emotion models) may still be warming up.
+    """
+
+    def __init__(self, required=()):
+        self.required = tuple(required)
+        self.started = time.perf_counter()
+        self._components = {}
+
+    def _set(self, name, **fields):
+        self._components.setdefault(name, {"state": "pending", "seconds": None, "error": None}).update(fields)
+
+    def expect(self, *names):
+        for name in names:
+            self._set(name)
+
+    async def load(self, name: str, load, *args):
+        """
+        Run `load(*args)` (a coroutine function, or a blocking function run
+        on a worker thread) and return its result, or None if it failed.
+        """
+        self._set(name, state="loading")
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(load):
+                result = await load(*args)
+            else:
+                result = await asyncio.to_thread(load, *args)
+        except Exception as e:
+            self._set(name, state="failed", seconds=round(time.perf_counter() - start, 3), error=str(e))
+            log.error("Component failed to load", component=name, error=str(e))
+            return None
+        seconds = round(time.perf_counter() - start, 3)
+        self._set(name, state="ready", seconds=seconds)
+        log.info("Component ready", component=name, seconds=seconds)
+        return result
+
+    def fail(self, name: str, error):
+        """Mark a component that was ready as failed, e.g. when its worker pool broke."""
+        self._set(name, state="failed", error=str(error))
+        log.error("Component failed", component=name, error=str(error))
+
+    def ready(self, name: str) -> bool:
+        return self._components.get(name, {}).get("state") == "ready"
+
+    @property
+    def serving(self) -> bool:
+        return all(self.ready(name) for name in self.required)
+
+    @property
+    def complete(self) -> bool:
+        return all(c["state"] == "ready" for c in self._components.values())
+
+    def snapshot(self) -> dict:
+        if not self.serving:
+            mode = "starting"
+        elif self.complete:
+            mode = "full"
+        else:
+            mode = "degraded"
+        return {
+            "ready": self.serving,
+            "mode": mode,
+            "uptime_seconds": round(time.perf_counter() - self.started, 3),
+            "components": {name: dict(c) for name, c in self._components.items()},
+        }
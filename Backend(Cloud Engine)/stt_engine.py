@@ -0,0 +1,102 @@
+# stt_engine.py
+import asyncio
+import queue
+import threading
+
+from google.cloud import speech
+
+STREAM_FRAME_MS = 100  # audio per StreamingRecognizeRequest, as recommended by Google
+
+_END_OF_AUDIO = object()
+
+
+class StreamingRecognizer:
+    """
+    Runs Google streaming recognition over a live PCM stream.
+
+    The gRPC call is a blocking iterator, so it runs on a worker thread; PCM
+    chunks are handed to it through a thread-safe queue and recognition
+    results are posted back onto the event loop, where `on_transcript` is
+    awaited for every interim and final result.
+    """
+
+    def __init__(self, client, rate: int, language_code: str = "en-US", on_transcript=None):
+        self.client = client
+        self.rate = rate
+        self.language_code = language_code
+        self.on_transcript = on_transcript
+        self.frame_bytes = rate * 2 * STREAM_FRAME_MS // 1000
+
+    def _streaming_config(self):
+        return speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=self.rate,
+                language_code=self.language_code,
+            ),
+            interim_results=True,
+        )
+
+    def _recognize_blocking(self, audio_queue, loop, results):
+        def requests():
+            while True:
+                chunk = audio_queue.get()
+                if chunk is _END_OF_AUDIO:
+                    return
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+        try:
+            responses = self.client.streaming_recognize(self._streaming_config(), requests())
+            for response in responses:
+                for result in response.results:
+                    if result.alternatives:
+                        item = (result.alternatives[0].transcript, result.is_final)
+                        loop.call_soon_threadsafe(results.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(results.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(results.put_nowait, None)
+
+    async def _pump_audio(self, pcm_chunks, audio_queue):
+        pending = bytearray()
+        try:
+            async for chunk in pcm_chunks:
+                pending.extend(chunk)
+                while len(pending) >= self.frame_bytes:
+                    audio_queue.put(bytes(pending[:self.frame_bytes]))
+                    del pending[:self.frame_bytes]
+            if pending:
+                audio_queue.put(bytes(pending))
+        finally:
+            audio_queue.put(_END_OF_AUDIO)
+
+    async def run(self, pcm_chunks) -> list:
+        """Consume an async iterator of PCM chunks and return the final transcripts."""
+        loop = asyncio.get_running_loop()
+        audio_queue = queue.Queue()
+        results = asyncio.Queue()
+        worker = threading.Thread(
+            target=self._recognize_blocking, args=(audio_queue, loop, results), daemon=True
+        )
+        worker.start()
+        pump = asyncio.create_task(self._pump_audio(pcm_chunks, audio_queue))
+
+        finals = []
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                transcript, is_final = item
+                if is_final:
+                    finals.append(transcript)
+                if self.on_transcript:
+                    text = " ".join(finals if is_final else finals + [transcript])
+                    await self.on_transcript(text.strip(), is_final)
+        finally:
+            if not pump.done():
+                pump.cancel()
+                audio_queue.put(_END_OF_AUDIO)
+        return finals
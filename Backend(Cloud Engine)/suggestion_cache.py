@@ -0,0 +1,105 @@
+# suggestion_cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+SUGGESTION_CACHE_TTL = 6 * 3600    # seconds; a fresh prompt is generated at least this often
+SUGGESTION_CACHE_MAX_USERS = 10000
+SUGGESTION_PREFETCH_DELAY = 5.0    # seconds to wait after a turn so a burst of turns prefetches once
+
+
+class SuggestionCache:
+    """
+    One journal suggestion per user, valid for the conversation version it
+    was generated from. Concurrent requests for the same user and version
+    share a single generation, whether they come from a page load or from
+    the prefetch that runs after a conversation turn.
+    """
+
+    def __init__(self, ttl: float = SUGGESTION_CACHE_TTL, max_users: int = SUGGESTION_CACHE_MAX_USERS,
+                 prefetch_delay: float = SUGGESTION_PREFETCH_DELAY):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.prefetch_delay = prefetch_delay
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.prefetches = 0
+        self._entries = OrderedDict()  # user_id -> (version, suggestion, created_at)
+        self._in_flight = {}           # (user_id, version) -> Future
+        self._lock = threading.Lock()  # invalidate() is called from whichever thread wrote the messages
+
+    def get(self, user_id: str, version: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or time.monotonic() - entry[2] > self.ttl:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id: str, version: int, suggestion: str):
+        with self._lock:
+            self._entries[user_id] = (version, suggestion, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    async def get_or_generate(self, user_id: str, version: int, generate) -> str:
+        """
+        The cached suggestion, or the result of `generate()` (a coroutine
+        function returning (suggestion, cacheable)).
+        """
+        cached = self.get(user_id, version)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        key = (user_id, version)
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.joined += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        return await asyncio.shield(self._start(user_id, version, generate))
+
+    async def prefetch(self, user_id: str, current_version, generate):
+        """
+        Generate the next suggestion in the background once the
+        conversation has been quiet for `prefetch_delay` seconds.
+        `current_version` is a function returning the user's version now.
+        """
+        version = current_version(user_id)
+        await asyncio.sleep(self.prefetch_delay)
+        if current_version(user_id) != version or self.get(user_id, version) is not None:
+            return
+        if (user_id, version) not in self._in_flight:
+            self.prefetches += 1
+            await self._start(user_id, version, generate)
+
+    def _start(self, user_id, version, generate) -> asyncio.Future:
+        key = (user_id, version)
+        pending = asyncio.ensure_future(self._generate(user_id, version, generate))
+        self._in_flight[key] = pending
+        pending.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return pending
+
+    async def _generate(self, user_id, version, generate) -> str:
+        suggestion, cacheable = await generate()
+        if cacheable:
+            self.put(user_id, version, suggestion)
+        return suggestion
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.joined
+        return {
+            "users": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "prefetches": self.prefetches,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
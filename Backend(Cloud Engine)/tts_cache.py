@@ -0,0 +1,74 @@
+# tts_cache.py
+import hashlib
+import json
+from collections import OrderedDict
+
+TTS_CACHE_MAX_BYTES = 32 * 1024 * 1024  # LINEAR16 at 16 kHz is ~32 KB per second of speech
+TTS_CACHE_MAX_TEXT_CHARS = 300          # long one-off replies are not worth caching
+
+
+class TtsCache:
+    """
+    In-process LRU of synthesized audio, bounded by total bytes rather than
+    entry count. Keys combine the whitespace-normalized text with the full voice and
+    audio configuration, so a voice change never serves stale audio.
+    """
+
+    def __init__(self, max_bytes: int = TTS_CACHE_MAX_BYTES, max_text_chars: int = TTS_CACHE_MAX_TEXT_CHARS):
+        self.max_bytes = max_bytes
+        self.max_text_chars = max_text_chars
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # Whitespace only: case can change pronunciation ("US" / "us")
+        return " ".join(text.split())
+
+    def key(self, text: str, voice_config: dict) -> str:
+        raw = self.normalize(text) + "\0" + json.dumps(voice_config, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def cacheable(self, text: str) -> bool:
+        return len(text) <= self.max_text_chars
+
+    def get(self, text: str, voice_config: dict):
+        if not self.cacheable(text):
+            return None
+        key = self.key(text, voice_config)
+        audio = self._entries.get(key)
+        if audio is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return audio
+
+    def put(self, text: str, voice_config: dict, audio: bytes):
+        if not audio or not self.cacheable(text) or len(audio) > self.max_bytes:
+            return
+        key = self.key(text, voice_config)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous)
+        self._entries[key] = audio
+        self.bytes += len(audio)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
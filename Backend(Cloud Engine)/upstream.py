@@ -0,0 +1,180 @@
+# upstream.py
+import asyncio
+import calendar
+import random
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from google.auth.transport.requests import Request as GoogleAuthRequest
+
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 50
+TOKEN_REFRESH_MARGIN = 300  # seconds before expiry at which the access token is refreshed
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Raised when an upstream call fails after all retries."""
+
+    def __init__(self, upstream: str, message: str, status_code: int = None):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.status_code = status_code
+
+
+class TokenCache:
+    """
+    Keeps a Google OAuth access token and refreshes it on a worker thread
+    shortly before it expires, so callers almost always get it for free.
+    """
+
+    def __init__(self, credentials, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.credentials = credentials
+        self.refresh_margin = refresh_margin
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        if not self.credentials.token:
+            return False
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        return calendar.timegm(expiry.utctimetuple()) - time.time() > self.refresh_margin
+
+    async def token(self) -> str:
+        if not self._fresh():
+            async with self._lock:
+                if not self._fresh():
+                    await asyncio.to_thread(self.credentials.refresh, GoogleAuthRequest())
+        return self.credentials.token
+
+
+class Upstream:
+    """One remote service: its own concurrency cap, timeout and retry policy over the shared pool."""
+
+    def __init__(self, name: str, http: httpx.AsyncClient, tokens: TokenCache = None,
+                 max_concurrency: int = 16, timeout: float = 30.0, max_retries: int = 3,
+                 base_delay: float = 0.5):
+        self.name = name
+        self.http = http
+        self.tokens = tokens
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.in_flight = 0
+        self._limit = asyncio.Semaphore(max_concurrency)
+
+    async def _headers(self) -> dict:
+        if self.tokens is None:
+            return {}
+        return {"Authorization": f"Bearer {await self.tokens.token()}"}
+
+    async def _backoff(self, attempt: int):
+        # Full jitter keeps retries from many turns from landing in lockstep
+        await asyncio.sleep(random.uniform(0, self.base_delay * (2 ** attempt)))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying transport errors and 429/5xx with exponential backoff."""
+        kwargs.setdefault("timeout", self.timeout)
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                async with self._limit:
+                    self.in_flight += 1
+                    try:
+                        resp = await self.http.request(method, url, headers=await self._headers(), **kwargs)
+                    finally:
+                        self.in_flight -= 1
+                if resp.status_code not in RETRY_STATUSES:
+                    if resp.is_error:
+                        raise UpstreamError(self.name, f"HTTP {resp.status_code}", resp.status_code)
+                    return resp
+                last_error = UpstreamError(self.name, f"HTTP {resp.status_code}", resp.status_code)
+            except httpx.TransportError as e:
+                last_error = UpstreamError(self.name, f"{type(e).__name__}: {e}")
+            if attempt < self.max_retries - 1:
+                await self._backoff(attempt)
+        raise last_error
+
+    async def post_json(self, url: str, payload: dict, **kwargs) -> dict:
+        resp = await self.request("POST", url, json=payload, **kwargs)
+        return resp.json()
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """
+        Open a streamed response. Connection failures and retryable statuses
+        are retried before the body is read; once streaming starts the
+        caller owns the response.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        last_error = None
+        for attempt in range(self.max_retries):
+            async with self._limit:
+                self.in_flight += 1
+                try:
+                    request = self.http.build_request(method, url, headers=await self._headers(), **kwargs)
+                    try:
+                        resp = await self.http.send(request, stream=True)
+                    except httpx.TransportError as e:
+                        last_error = UpstreamError(self.name, f"{type(e).__name__}: {e}")
+                        resp = None
+                    if resp is not None:
+                        try:
+                            if resp.status_code in RETRY_STATUSES:
+                                last_error = UpstreamError(self.name, f"HTTP {resp.status_code}", resp.status_code)
+                            elif resp.is_error:
+                                raise UpstreamError(self.name, f"HTTP {resp.status_code}", resp.status_code)
+                            else:
+                                yield resp
+                                return
+                        finally:
+                            await resp.aclose()
+                finally:
+                    self.in_flight -= 1
+            if attempt < self.max_retries - 1:
+                await self._backoff(attempt)
+        raise last_error
+
+
+class UpstreamClients:
+    """
+    The shared outbound HTTP layer: a single keep-alive connection pool
+    (HTTP/2 where the server supports it) and a cached access token, with
+    each upstream registered under its own limits.
+    """
+
+    def __init__(self, credentials=None, http2: bool = True,
+                 max_connections: int = MAX_CONNECTIONS,
+                 max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS):
+        self.http = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+        self.tokens = TokenCache(credentials) if credentials is not None else None
+        self.upstreams = {}
+        self._authenticated = []
+
+    def authenticate(self, credentials):
+        """Use `credentials` for the upstreams registered with `authenticated=True`, e.g. once loaded at startup."""
+        if self.tokens is None:
+            self.tokens = TokenCache(credentials)
+        else:
+            self.tokens.credentials = credentials
+        for upstream in self._authenticated:
+            upstream.tokens = self.tokens
+
+    def register(self, name: str, authenticated: bool = False, **options) -> Upstream:
+        upstream = Upstream(name, self.http, self.tokens if authenticated else None, **options)
+        if authenticated:
+            self._authenticated.append(upstream)
+        self.upstreams[name] = upstream
+        return upstream
+
+    async def aclose(self):
+        await self.http.aclose()
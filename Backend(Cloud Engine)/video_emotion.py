@@ -0,0 +1,139 @@
+# video_emotion.py
+import cv2
+import numpy as np
+
+MAX_FRAMES_PER_TURN = 12     # frame budget: at most this many frames are analysed per turn
+FRAME_DIFF_THRESHOLD = 4.0   # mean absolute grayscale difference (0-255) below which a frame is a near-duplicate
+FACE_REUSE_FRAMES = 4        # face boxes are reused for up to this many sampled frames...
+FACE_REDETECT_DIFF = 18.0    # ...unless the scene moved more than this since the last detection
+FACE_OFFSETS = (10, 10)      # margin FER adds around a detected face before classifying
+FACE_PADDING = 40            # black border FER puts around the frame, so margins past the edge are zeros
+EMOTION_INPUT_SIZE = (64, 64)
+
+
+class VideoEmotionEngine:
+    """
+    Turns the video frames of one turn into per-frame FER emotion scores
+    while doing as little work as possible:
+
+    - frames are first decoded as tiny grayscale thumbnails, near-duplicates
+      are dropped and the survivors are thinned to the per-turn frame budget
+    - MTCNN face detection runs on a sampled frame only when the cached face
+      boxes are stale, and the boxes are reused for nearby frames
+    - all face crops of the turn go through the emotion classifier in one
+      NumPy batch
+
+    `analyze` is synchronous and meant to run in a worker pool, off the event loop.
+    """
+
+    def __init__(
+        self,
+        detector,
+        max_frames: int = MAX_FRAMES_PER_TURN,
+        diff_threshold: float = FRAME_DIFF_THRESHOLD,
+        face_reuse_frames: int = FACE_REUSE_FRAMES,
+        redetect_diff: float = FACE_REDETECT_DIFF,
+    ):
+        self.detector = detector
+        self.max_frames = max_frames
+        self.diff_threshold = diff_threshold
+        self.face_reuse_frames = face_reuse_frames
+        self.redetect_diff = redetect_diff
+        self._labels = None
+
+    @property
+    def labels(self) -> dict:
+        if self._labels is None:
+            self._labels = self.detector._get_labels()
+        return self._labels
+
+    @staticmethod
+    def thumbnail(frame_bytes) -> np.ndarray:
+        """Decode a JPEG straight to a 1/8-scale grayscale image for cheap comparisons."""
+        buf = np.frombuffer(frame_bytes, np.uint8)
+        thumb = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        return None if thumb is None else thumb.astype(np.int16)
+
+    @staticmethod
+    def frame_diff(a: np.ndarray, b: np.ndarray) -> float:
+        if a is None or b is None or a.shape != b.shape:
+            return float("inf")
+        return float(np.abs(a - b).mean())
+
+    def select_frames(self, frames: list) -> list:
+        """Return (index, thumbnail) pairs for the frames worth analysing."""
+        kept = []
+        last = None
+        for index, frame_bytes in enumerate(frames):
+            thumb = self.thumbnail(frame_bytes)
+            if thumb is None:
+                continue
+            if last is not None and self.frame_diff(thumb, last) < self.diff_threshold:
+                continue
+            kept.append((index, thumb))
+            last = thumb
+
+        if len(kept) > self.max_frames:
+            picks = np.linspace(0, len(kept) - 1, self.max_frames).round().astype(int)
+            kept = [kept[i] for i in picks]
+        return kept
+
+    @staticmethod
+    def face_crop(gray: np.ndarray, box) -> np.ndarray:
+        """Square up and widen a face box the way FER does, then crop it from the padded frame and normalize it."""
+        x, y, w, h = (int(v) for v in box)
+        side = max(w, h)
+        x -= (side - w) // 2
+        y -= (side - h) // 2
+        x_off, y_off = FACE_OFFSETS
+        padded = cv2.copyMakeBorder(gray, FACE_PADDING, FACE_PADDING, FACE_PADDING, FACE_PADDING,
+                                    cv2.BORDER_CONSTANT, value=0)
+        x1, y1 = max(0, x - x_off + FACE_PADDING), max(0, y - y_off + FACE_PADDING)
+        x2, y2 = x + side + x_off + FACE_PADDING, y + side + y_off + FACE_PADDING
+        face = padded[y1:y2, x1:x2]
+        if face.size == 0:
+            return None
+        face = cv2.resize(face, EMOTION_INPUT_SIZE).astype(np.float32)
+        return (face / 255.0 - 0.5) * 2.0
+
+    def analyze(self, frames: list) -> list:
+        """Return one emotion-score dict per analysed frame that contains a face."""
+        crops = []
+        faces = None
+        detected_thumb = None
+        frames_since_detect = 0
+
+        for index, thumb in self.select_frames(frames):
+            frame = cv2.imdecode(np.frombuffer(frames[index], np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                continue
+
+            stale = (
+                faces is None
+                or frames_since_detect >= self.face_reuse_frames
+                or self.frame_diff(thumb, detected_thumb) > self.redetect_diff
+            )
+            if stale:
+                # MTCNN expects RGB; OpenCV decodes to BGR
+                faces = self.detector.find_faces(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), bgr=False)
+                detected_thumb = thumb
+                frames_since_detect = 0
+            frames_since_detect += 1
+
+            if len(faces) == 0:
+                continue
+            # Like the per-frame path, only the first face in each frame counts
+            crop = self.face_crop(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), faces[0])
+            if crop is not None:
+                crops.append(crop)
+
+        if not crops:
+            return []
+
+        batch = np.stack(crops)[..., np.newaxis]
+        predictions = self.detector._classify_emotions(batch)
+        labels = self.labels
+        return [
+            {labels[i]: round(float(score), 2) for i, score in enumerate(row)}
+            for row in np.asarray(predictions)
+        ]